@@ -12,6 +12,30 @@ const API_BASE_URL = window.location.hostname === 'localhost' || window.location
     ? 'http://localhost:5000/api' 
     : 'https://activegym.onrender.com/api';
 
+// Event streams are served by their own service in production (events_server.py)
+const EVENTS_BASE_URL = window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1'
+    ? API_BASE_URL
+    : 'https://activegym-events.onrender.com/api';
+
+// Every API request carries the session token issued at login; a 401 means
+// the session expired or was closed, so go back to the login page
+function authFetch(url, options = {}) {
+    const token = sessionStorage.getItem('token');
+    const headers = { ...(options.headers || {}) };
+    if (token) {
+        headers['Authorization'] = `Bearer ${token}`;
+    }
+    
+    return fetch(url, { ...options, headers: headers })
+        .then(response => {
+            if (response.status === 401) {
+                sessionStorage.clear();
+                window.location.href = '/';
+            }
+            return response;
+        });
+}
+
 // Utility functions
 function formatDate(dateString) {
     try {
@@ -174,66 +198,253 @@ function calculateEndDate(startDate, duration) {
     return end.toISOString().split('T')[0];
 }
 
-// Load sample data for demonstration
-function loadData() {
-    // Load real data from API
-    fetch('http://localhost:5000/api/clientes')
-        .then(response => response.json())
-        .then(data => {
-            if (data.error) {
-                console.error('Error loading data:', data.error);
-                loadSampleData(); // Fallback to sample data
-        } else {
-                members = data;
-        updateMembersTable();
-        updateDashboard();
-        updateStatistics();
+// Conditional GET: remember each URL's ETag and last body, send If-None-Match
+// and reuse the stored body when the server answers 304 Not Modified
+const responseCache = new Map();
+
+function fetchCached(url) {
+    const cached = responseCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    
+    return authFetch(url, { headers: headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304 && cached) {
+                return { data: cached.data, headers: cached.headers };
             }
-        })
-        .catch(error => {
-            console.error('Error connecting to API:', error);
-            loadSampleData(); // Fallback to sample data
+            return response.json().then(data => {
+                const etag = response.headers.get('ETag');
+                if (etag && response.ok) {
+                    responseCache.set(url, { etag: etag, data: data, headers: response.headers });
+                }
+                return { data: data, headers: response.headers };
+            });
         });
+}
+
+// Rows per request on the paginated list endpoints
+const PAGE_SIZE = 200;
+
+// Fetch a list endpoint one page at a time (keyset cursor in X-Next-Cursor).
+// onPage receives all rows loaded so far, so tables render after the first page.
+function fetchPages(path, onPage, params = {}) {
+    const rows = [];
+    
+    function fetchPage(cursor) {
+        const query = new URLSearchParams({ ...params, limit: PAGE_SIZE });
+        if (cursor) {
+            query.set('cursor', cursor);
+        }
+        
+        return fetchCached(`${API_BASE_URL}${path}?${query}`)
+            .then(({ data, headers }) => ({
+                data: data,
+                nextCursor: headers.get('X-Next-Cursor')
+            }))
+            .then(({ data, nextCursor }) => {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                rows.push(...data);
+                onPage(rows, !nextCursor);
+                return nextCursor ? fetchPage(nextCursor) : rows;
+            });
+    }
+    
+    return fetchPage(null);
+}
+
+// Load data from the API
+function loadData() {
+    loadMembers();
     
     // Load daily users and sales
     loadDailyUsers();
     loadSales();
 }
 
+function loadMembers() {
+    let firstPage = true;
+    
+    fetchPages('/clientes', data => {
+        members = data;
+        updateMembersTable();
+        if (firstPage) {
+            firstPage = false;
+            updateDashboard();
+            updateStatistics();
+        }
+    }).catch(error => {
+        console.error('Error loading data:', error);
+        loadSampleData(); // Fallback to sample data
+    });
+}
+
 function loadDailyUsers() {
-    fetch('http://localhost:5000/api/usuarios-diarios')
+    fetchPages('/usuarios-diarios', data => {
+        dailyUsers = data;
+        updateDailyUsersTable();
+    }).catch(error => {
+        console.error('Error loading daily users:', error);
+        dailyUsers = [];
+    });
+}
+
+function loadSales() {
+    fetchPages('/ventas', data => {
+        sales = data;
+        updateSalesTable();
+    }).catch(error => {
+        console.error('Error loading sales:', error);
+        sales = [];
+    });
+}
+
+// Incremental refresh: /api/sync returns what changed since syncCursor (the
+// current version of each changed row plus the ids deleted) and it is merged
+// into the arrays already loaded instead of downloading whole tables again
+let syncCursor = null;
+let syncInFlight = null;
+let syncAgain = false;
+
+// Sync every 30 seconds while the event stream is down
+const SYNC_INTERVAL = 30000;
+
+const SYNC_TABLES = {
+    clientes: {
+        rows: () => members,
+        replace: rows => { members = rows; },
+        reload: loadMembers,
+        render: () => { updateMembersTable(); updateStatistics(); }
+    },
+    usuarios_diarios: {
+        rows: () => dailyUsers,
+        replace: rows => { dailyUsers = rows; },
+        reload: loadDailyUsers,
+        render: updateDailyUsersTable
+    },
+    ventas: {
+        rows: () => sales,
+        replace: rows => { sales = rows; },
+        reload: loadSales,
+        render: updateSalesTable
+    },
+    egresos: {
+        rows: () => egresos,
+        replace: rows => { egresos = rows; },
+        reload: loadEgresos,
+        render: updateEgresosTable
+    }
+};
+
+// Live updates from /api/events: a write from any desk arrives as a cambio
+// event and is merged through syncChanges(); estadisticas brings the new
+// dashboard figures. While the stream is down the interval sync covers it.
+// EventSource cannot send headers, so the token goes in the query string.
+let eventSource = null;
+
+// Wait before opening the stream again after the server refused it
+const EVENTS_RETRY_DELAY = 30000;
+
+function startEvents() {
+    const token = sessionStorage.getItem('token');
+    if (!token || !window.EventSource) {
+        return;
+    }
+    
+    eventSource = new EventSource(`${EVENTS_BASE_URL}/events?token=${encodeURIComponent(token)}`);
+    eventSource.addEventListener('sincronizar', () => syncChanges());
+    eventSource.addEventListener('cambio', () => syncChanges());
+    eventSource.addEventListener('estadisticas', e => showDashboard(JSON.parse(e.data)));
+    eventSource.onerror = () => {
+        // Dropped connections are retried by the browser; a refused one is closed
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            setTimeout(startEvents, EVENTS_RETRY_DELAY);
+        }
+    };
+}
+
+function eventsConnected() {
+    return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+}
+
+// Take the first cursor before the initial load, so nothing written in
+// between is missed (a row seen twice is merged twice, same result)
+function startSync() {
+    return authFetch(`${API_BASE_URL}/sync`)
         .then(response => response.json())
         .then(data => {
             if (data.error) {
-                console.error('Error loading daily users:', data.error);
-                dailyUsers = [];
-            } else {
-                dailyUsers = data;
-                updateDailyUsersTable();
+                throw new Error(data.error);
             }
+            syncCursor = data.cursor;
         })
-        .catch(error => {
-            console.error('Error connecting to daily users API:', error);
-            dailyUsers = [];
+        .catch(error => console.error('Error starting sync:', error));
+}
+
+function mergeChanges(current, changedRows, deletedIds) {
+    const deleted = new Set(deletedIds);
+    const changed = new Map(changedRows.map(row => [row.id, row]));
+    const merged = current
+        .filter(row => !deleted.has(row.id))
+        .map(row => {
+            const updated = changed.get(row.id);
+            if (!updated) {
+                return row;
+            }
+            changed.delete(row.id);
+            return updated;
         });
+    // What is left was not loaded yet: new rows, newest first like the lists
+    return [...changed.values(), ...merged];
 }
 
-function loadSales() {
-    fetch('http://localhost:5000/api/ventas')
+function syncChanges() {
+    // A call while a sync is running (e.g. right after a write) runs once more after it
+    if (syncInFlight) {
+        syncAgain = true;
+        return syncInFlight;
+    }
+    
+    const url = syncCursor
+        ? `${API_BASE_URL}/sync?since=${encodeURIComponent(syncCursor)}`
+        : `${API_BASE_URL}/sync`;
+    
+    syncInFlight = authFetch(url)
         .then(response => response.json())
         .then(data => {
             if (data.error) {
-                console.error('Error loading sales:', data.error);
-                sales = [];
-            } else {
-                sales = data;
-                updateSalesTable();
+                throw new Error(data.error);
+            }
+            syncCursor = data.cursor;
+            
+            const tables = Object.keys(data.cambios).filter(table => SYNC_TABLES[table]);
+            tables.forEach(table => {
+                const handler = SYNC_TABLES[table];
+                const delta = data.cambios[table];
+                if (delta.recargar) {
+                    // Cursor expired or too many changes: load the table again
+                    handler.reload();
+                    return;
+                }
+                handler.replace(mergeChanges(handler.rows(), delta.filas, delta.borrados));
+                handler.render();
+            });
+            // With the event stream open the new figures arrive on their own
+            if (tables.length > 0 && !eventsConnected()) {
+                updateDashboard();
             }
         })
-        .catch(error => {
-            console.error('Error connecting to sales API:', error);
-            sales = [];
+        .catch(error => console.error('Error syncing changes:', error))
+        .finally(() => {
+            syncInFlight = null;
+            if (syncAgain) {
+                syncAgain = false;
+                syncChanges();
+            }
         });
+    
+    return syncInFlight;
 }
 
 // Load sample data for demonstration
@@ -260,7 +471,7 @@ function loadSampleData() {
 // Dashboard functions
 function updateDashboard() {
     // Load real statistics from API
-    fetch('http://localhost:5000/api/estadisticas')
+    authFetch('http://localhost:5000/api/estadisticas')
         .then(response => response.json())
         .then(data => {
             if (data.error) {
@@ -305,15 +516,20 @@ function updateStatisticsTab(data) {
 }
 
 // Members functions
+// Search results currently shown in the members table (null = show all members)
+let memberSearchResults = null;
+
 function updateMembersTable() {
     const tbody = document.getElementById('members-table-body');
+    const rows = memberSearchResults || members;
     
-    if (members.length === 0) {
-        tbody.innerHTML = '<tr><td colspan="4" class="text-center">No hay miembros registrados</td></tr>';
+    if (rows.length === 0) {
+        const message = memberSearchResults ? 'No se encontraron miembros' : 'No hay miembros registrados';
+        tbody.innerHTML = `<tr><td colspan="4" class="text-center">${message}</td></tr>`;
         return;
     }
     
-    tbody.innerHTML = members.map(member => `
+    tbody.innerHTML = rows.map(member => `
         <tr>
             <td><strong>${member.nombre} ${member.apellido}</strong></td>
             <td>${getStatusBadge(member.estado_mensualidad)}</td>
@@ -391,7 +607,7 @@ function addMember() {
         // Editing existing member
         const memberId = parseInt(editId);
         
-        fetch(`http://localhost:5000/api/clientes/${memberId}`, {
+        authFetch(`http://localhost:5000/api/clientes/${memberId}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
@@ -404,7 +620,7 @@ function addMember() {
                 showAlert(data.error, 'danger');
             } else {
                 showAlert('Cliente actualizado exitosamente');
-                loadData(); // Reload data from API
+                syncChanges(); // Merge the change from the API
             }
         })
         .catch(error => {
@@ -413,7 +629,7 @@ function addMember() {
         });
     } else {
         // Adding new member
-        fetch('http://localhost:5000/api/clientes', {
+        authFetch('http://localhost:5000/api/clientes', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -426,7 +642,7 @@ function addMember() {
                 showNotification('Error', data.error, 'error');
             } else {
                 showNotification('Cliente Registrado', 'El cliente ha sido registrado exitosamente', 'success');
-                loadData(); // Reload data from API
+                syncChanges(); // Merge the change from the API
             }
         })
         .catch(error => {
@@ -461,7 +677,7 @@ function deleteMember(memberId) {
     function confirmDelete() {
         const memberId = window.memberToDelete;
         
-        fetch(`http://localhost:5000/api/clientes/${memberId}`, {
+        authFetch(`http://localhost:5000/api/clientes/${memberId}`, {
             method: 'DELETE'
         })
         .then(response => response.json())
@@ -470,7 +686,7 @@ function deleteMember(memberId) {
                 showNotification('Error', data.error, 'error');
         } else {
                 showNotification('Cliente Eliminado', 'El cliente ha sido eliminado exitosamente', 'success');
-                loadData(); // Reload data from API
+                syncChanges(); // Merge the change from the API
             }
         })
         .catch(error => {
@@ -518,9 +734,8 @@ function limpiarCalculadora() {
 
 // Función para cargar el historial de estadísticas
 function loadHistorial() {
-    fetch('http://localhost:5000/api/estadisticas/historial')
-        .then(response => response.json())
-        .then(data => {
+    fetchCached(`${API_BASE_URL}/estadisticas/historial`)
+        .then(({ data }) => {
             updateHistorialTable(data);
         })
         .catch(error => {
@@ -572,7 +787,7 @@ function showMemberHistory(memberId) {
     }
     
         // Get member payments from API
-    fetch(`http://localhost:5000/api/clientes/${memberId}/pagos`)
+    authFetch(`http://localhost:5000/api/clientes/${memberId}/pagos`)
         .then(response => response.json())
         .then(data => {
             if (data.error) {
@@ -584,7 +799,7 @@ function showMemberHistory(memberId) {
             
             // Calculate total paid
             const totalPaid = memberPaymentsList.reduce((sum, payment) => {
-                const precio = parseFloat(payment.precio || 0);
+                const precio = parseFloat(payment.monto || 0);
                 return sum + precio;
             }, 0);
             
@@ -626,7 +841,7 @@ function showMemberHistory(memberId) {
                                 <tr>
                                     <td>${formatDate(payment.fecha_pago)}</td>
                                     <td>${payment.duracion} días</td>
-                                    <td>$${parseFloat(payment.precio || 0).toFixed(2)}</td>
+                                    <td>$${parseFloat(payment.monto || 0).toFixed(2)}</td>
                                     <td>${formatDate(payment.fecha_inicio)}</td>
                                     <td>${formatDate(payment.fecha_fin)}</td>
                                     <td>
@@ -727,7 +942,7 @@ function addDailyUser() {
         // Editing existing user
         const userId = parseInt(editId);
         
-        fetch(`http://localhost:5000/api/usuarios-diarios/${userId}`, {
+        authFetch(`http://localhost:5000/api/usuarios-diarios/${userId}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
@@ -740,7 +955,7 @@ function addDailyUser() {
                 showAlert(data.error, 'danger');
             } else {
                 showAlert('Usuario diario actualizado exitosamente');
-                loadDailyUsers(); // Reload data from API
+                syncChanges(); // Merge the change from the API
                 updateDashboard(); // Update dashboard statistics
             }
         })
@@ -750,7 +965,7 @@ function addDailyUser() {
         });
     } else {
         // Adding new user
-        fetch('http://localhost:5000/api/usuarios-diarios', {
+        authFetch('http://localhost:5000/api/usuarios-diarios', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -763,7 +978,7 @@ function addDailyUser() {
                 showNotification('Error', data.error, 'error');
             } else {
                 showNotification('Usuario Diario Registrado', 'El usuario diario ha sido registrado exitosamente', 'success');
-                loadDailyUsers(); // Reload data from API
+                syncChanges(); // Merge the change from the API
                 updateDashboard(); // Update dashboard statistics
             }
         })
@@ -904,7 +1119,7 @@ function addSale() {
         // Editing existing sale
         const saleId = parseInt(editId);
         
-        fetch(`http://localhost:5000/api/ventas/${saleId}`, {
+        authFetch(`http://localhost:5000/api/ventas/${saleId}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
@@ -917,7 +1132,7 @@ function addSale() {
                 showAlert(data.error, 'danger');
             } else {
                 showAlert('Venta actualizada exitosamente');
-                loadSales(); // Reload data from API
+                syncChanges(); // Merge the change from the API
                 updateDashboard(); // Update dashboard statistics
             }
         })
@@ -927,7 +1142,7 @@ function addSale() {
         });
     } else {
         // Adding new sale
-        fetch('http://localhost:5000/api/ventas', {
+        authFetch('http://localhost:5000/api/ventas', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -940,7 +1155,7 @@ function addSale() {
                 showNotification('Error', data.error, 'error');
             } else {
                 showNotification('Venta Registrada', 'La venta ha sido registrada exitosamente', 'success');
-                loadSales(); // Reload data from API
+                syncChanges(); // Merge the change from the API
                 updateDashboard(); // Update dashboard statistics
             }
         })
@@ -1021,14 +1236,40 @@ function setupSearch() {
     const searchDaily = document.getElementById('search-daily');
     
     if (searchMembers) {
+        // Members are searched on the server (indexed); debounce keystrokes
+        let searchTimer = null;
+        let searchRequest = 0;
+        
         searchMembers.addEventListener('input', function() {
-            const searchTerm = this.value.toLowerCase();
-            const rows = document.querySelectorAll('#members-table-body tr');
+            const searchTerm = this.value.trim();
+            clearTimeout(searchTimer);
             
-            rows.forEach(row => {
-                const text = row.textContent.toLowerCase();
-                row.style.display = text.includes(searchTerm) ? '' : 'none';
-            });
+            if (!searchTerm) {
+                memberSearchResults = null;
+                updateMembersTable();
+                return;
+            }
+            
+            searchTimer = setTimeout(() => {
+                const requestId = ++searchRequest;
+                authFetch(`${API_BASE_URL}/clientes/search?q=${encodeURIComponent(searchTerm)}&limit=50`)
+                    .then(response => response.json())
+                    .then(data => {
+                        // Ignore responses that arrive after a newer search
+                        if (requestId !== searchRequest || data.error) {
+                            return;
+                        }
+                        // Keep edit/renew lookups working for members not loaded yet
+                        data.forEach(result => {
+                            if (!members.some(m => m.id === result.id)) {
+                                members.push(result);
+                            }
+                        });
+                        memberSearchResults = data;
+                        updateMembersTable();
+                    })
+                    .catch(error => console.error('Error searching members:', error));
+            }, 200);
         });
     }
     
@@ -1060,9 +1301,6 @@ function setupSearch() {
 
 // Initialize application
 document.addEventListener('DOMContentLoaded', function() {
-    // Load data from API
-    loadData();
-    
     // Setup search functionality
     setupSearch();
     
@@ -1121,22 +1359,23 @@ document.addEventListener('DOMContentLoaded', function() {
     
 
     
-    // Reload data when switching tabs
+    // Bring the tables up to date when switching tabs
     document.querySelectorAll('[data-bs-toggle="tab"]').forEach(tab => {
         tab.addEventListener('shown.bs.tab', function(e) {
-            if (e.target.getAttribute('href') === '#daily-users') {
-                loadDailyUsers();
-            } else if (e.target.getAttribute('href') === '#sales') {
-                loadSales();
+            const target = e.target.getAttribute('href');
+            if (target === '#daily-users' || target === '#sales') {
+                syncChanges();
             }
         });
     });
     
-    // Auto-refresh dashboard every 5 minutes
+    // Auto-refresh: only the rows changed since the last sync, and only
+    // while the event stream is not pushing them
     setInterval(() => {
-        // In a real application, this would fetch fresh data from the server
-        console.log('Auto-refreshing dashboard...');
-    }, 300000);
+        if (!eventsConnected()) {
+            syncChanges();
+        }
+    }, SYNC_INTERVAL);
 });
 
 function editMember(memberId) {
@@ -1270,7 +1509,7 @@ function renewMember() {
         return;
     }
     
-    fetch(`http://localhost:5000/api/clientes/${memberId}/renovar`, {
+    authFetch(`http://localhost:5000/api/clientes/${memberId}/renovar`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -1283,7 +1522,7 @@ function renewMember() {
             showAlert(data.error, 'danger');
         } else {
             showAlert('Cliente renovado exitosamente');
-            loadData(); // Reload data from API
+            syncChanges(); // Merge the change from the API
             
             // Close modal
             const modal = bootstrap.Modal.getInstance(document.getElementById('renewMemberModal'));
@@ -1544,9 +1783,8 @@ function generateMealPlan() {
 let egresos = [];
 
 function loadEgresos() {
-    fetch(`${API_BASE_URL}/egresos`)
-        .then(response => response.json())
-        .then(data => {
+    fetchCached(`${API_BASE_URL}/egresos`)
+        .then(({ data }) => {
             egresos = data;
             updateEgresosTable();
         })
@@ -1604,7 +1842,7 @@ function addEgreso() {
         fecha: fecha
     };
     
-    fetch(`${API_BASE_URL}/egresos`, {
+    authFetch(`${API_BASE_URL}/egresos`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -1628,9 +1866,8 @@ function addEgreso() {
         document.getElementById('egreso-monto').value = '';
         document.getElementById('egreso-fecha').value = new Date().toISOString().split('T')[0];
         
-        // Reload data
-        loadEgresos();
-        updateDashboard();
+        // Merge the new expense
+        syncChanges();
     })
     .catch(error => {
         console.error('Error adding egreso:', error);
@@ -1640,26 +1877,28 @@ function addEgreso() {
 
 // Update dashboard to include expenses and balance
 function updateDashboard() {
-    fetch(`${API_BASE_URL}/estadisticas`)
-        .then(response => response.json())
-        .then(data => {
-            statistics = data;
-            
-            // Update dashboard metrics
-            document.getElementById('total-members').textContent = data.members.total_members;
-            document.getElementById('daily-users').textContent = data.daily_users;
-            document.getElementById('total-income').textContent = `$${data.income_today.toFixed(2)}`;
-            document.getElementById('expenses-today-dashboard').textContent = `$${data.expenses_today.toFixed(2)}`;
-            document.getElementById('balance-today').textContent = `$${data.profit_today.toFixed(2)}`;
-            
-            // Update statistics tab
-            updateStatisticsTab(data);
-        })
+    fetchCached(`${API_BASE_URL}/estadisticas`)
+        .then(({ data }) => showDashboard(data))
         .catch(error => {
             console.error('Error updating dashboard:', error);
         });
 }
 
+// Figures from /api/estadisticas, or pushed by /api/events
+function showDashboard(data) {
+    statistics = data;
+    
+    // Update dashboard metrics
+    document.getElementById('total-members').textContent = data.members.total_members;
+    document.getElementById('daily-users').textContent = data.daily_users;
+    document.getElementById('total-income').textContent = `$${data.income_today.toFixed(2)}`;
+    document.getElementById('expenses-today-dashboard').textContent = `$${data.expenses_today.toFixed(2)}`;
+    document.getElementById('balance-today').textContent = `$${data.profit_today.toFixed(2)}`;
+    
+    // Update statistics tab
+    updateStatisticsTab(data);
+}
+
 // Update statistics tab to include expenses and profit
 function updateStatisticsTab(data) {
     // Update income breakdown
@@ -1706,12 +1945,13 @@ function updateHistorialTable(historial) {
 
 // Event listeners
 document.addEventListener('DOMContentLoaded', function() {
-    // Load initial data
-    loadData();
-    loadDailyUsers();
-    loadSales();
-    loadEgresos();
-    updateDashboard();
+    // Load initial data, once the sync cursor is taken
+    startSync().then(() => {
+        loadData();
+        loadEgresos();
+        updateDashboard();
+        startEvents();
+    });
     
     // Setup search functionality
     setupSearch();
@@ -1767,9 +2007,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Cargar usuarios del sistema
 function loadSocios() {
-    fetch(`${API_BASE_URL}/usuarios`)
-        .then(response => response.json())
-        .then(data => {
+    fetchCached(`${API_BASE_URL}/usuarios`)
+        .then(({ data }) => {
             if (Array.isArray(data)) {
                 updateSociosTable(data);
             } else {
@@ -1846,7 +2085,7 @@ function addSocio() {
         return;
     }
     
-    fetch(`${API_BASE_URL}/usuarios`, {
+    authFetch(`${API_BASE_URL}/usuarios`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -1876,7 +2115,7 @@ function addSocio() {
 
 // Editar usuario del sistema
 function editSocio(socioId) {
-    fetch(`${API_BASE_URL}/usuarios/${socioId}`)
+    authFetch(`${API_BASE_URL}/usuarios/${socioId}`)
         .then(response => response.json())
         .then(socio => {
             document.getElementById('edit-socio-id').value = socio.id;
@@ -1915,7 +2154,7 @@ function updateSocio() {
         updateData.password = password;
     }
     
-    fetch(`${API_BASE_URL}/usuarios/${socioId}`, {
+    authFetch(`${API_BASE_URL}/usuarios/${socioId}`, {
         method: 'PUT',
         headers: {
             'Content-Type': 'application/json',
@@ -1941,7 +2180,7 @@ function updateSocio() {
 // Eliminar usuario del sistema
 function deleteSocio(socioId) {
     if (confirm('¿Estás seguro de que quieres eliminar este usuario del sistema?')) {
-        fetch(`${API_BASE_URL}/usuarios/${socioId}`, {
+        authFetch(`${API_BASE_URL}/usuarios/${socioId}`, {
             method: 'DELETE'
         })
         .then(response => response.json())
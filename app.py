@@ -1,29 +1,58 @@
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, has_request_context, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import psycopg2
 import psycopg2.extras
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import base64
+import hashlib
 import json
+import os
+
+import assets
+import auth
+import db
+import events
+import exports
+import importer
+import jobs
+import metrics
+import partitions
+import reports
+import schema
+import serialization
+import slow_queries
+import stats
+from db import get_db_connection
 
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:5500", "http://127.0.0.1:5500", "http://localhost:3000", "http://127.0.0.1:3000"])
+CORS(app, origins=["http://localhost:5500", "http://127.0.0.1:5500", "http://localhost:3000", "http://127.0.0.1:3000"],
+     expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Server-Timing"])
 
+# Dates and Decimals in rows are encoded by the JSON provider (see serialization.py)
+app.json = serialization.RowJSONProvider(app)
 
-# Database configuration using environment variables (for Render or local)
-import os
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=os.environ.get('DB_HOST', 'localhost'),
-        user=os.environ.get('DB_USER', 'postgres'),
-        password=os.environ.get('DB_PASSWORD', ''),
-        dbname=os.environ.get('DB_NAME', 'activeGym'),
-        port=os.environ.get('DB_PORT', 5432)
-    )
-    return conn
+# Database connections come from a per-worker pool (see db.py) and are
+# returned to it automatically when the request ends
+db.init_app(app)
+
+# Per-request DB/serialization timings: Server-Timing header and /metrics
+metrics.init_app(app)
+
+# The schema comes from migrations/ (python schema.py migrate); each worker
+# checks once that the database is up to date (see schema.py)
+schema.init_app(app)
+
+# Background job queue (see jobs.py); a worker thread per process unless
+# JOBS_IN_PROCESS=0 and `python worker.py` runs separately
+jobs.init_app(app)
+
+# Every /api/* route but the login needs a signed session token (see auth.py)
+auth.init_app(app)
 
 def calculate_end_date(start_date, duration):
-    start = datetime.strptime(start_date, '%Y-%m-%d')
+    start = datetime.fromisoformat(start_date)
     
     if duration == 30:
         # For 1 month, add exactly 1 month (same day next month)
@@ -43,62 +72,456 @@ def calculate_end_date(start_date, duration):
         # For weeks, add the specified days
         end_date = start + timedelta(days=duration-1)
     
-    return end_date.strftime('%Y-%m-%d')
+    return end_date.date().isoformat()
+
+# Row validation shared by the single-row handlers and the bulk importer.
+# Each returns the column values to store or raises ValueError.
+def parse_fecha(value, field):
+    # fromisoformat is much cheaper than strptime on bulk imports
+    if isinstance(value, str):
+        try:
+            if len(value) != 10:
+                raise ValueError
+            return date.fromisoformat(value).isoformat()
+        except ValueError:
+            raise ValueError(f'Fecha inválida en {field}, use YYYY-MM-DD')
+    return value.isoformat()
+
+def parse_number(value, field, integer=False):
+    try:
+        number = Decimal(str(value))
+    except ArithmeticError:
+        raise ValueError(f'Valor numérico inválido en {field}')
+    if not number.is_finite() or (integer and number != number.to_integral_value()):
+        raise ValueError(f'Valor numérico inválido en {field}')
+    if number <= 0:
+        raise ValueError(f'{field} debe ser mayor que cero')
+    return int(number) if integer else number
+
+def validate_periodo(data):
+    """Membership period fields shared by new members and renewals"""
+    required_fields = ['precio_mensualidad', 'fecha_inicio', 'duracion']
+    for field in required_fields:
+        if not data.get(field):
+            raise ValueError(f'Campo requerido: {field}')
+    
+    fecha_inicio = parse_fecha(data['fecha_inicio'], 'fecha_inicio')
+    duracion = parse_number(data['duracion'], 'duracion', integer=True)
+    fecha_fin = calculate_end_date(fecha_inicio, duracion)
+    
+    return {
+        'precio_mensualidad': parse_number(data['precio_mensualidad'], 'precio_mensualidad'),
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin_mensualidad': fecha_fin,
+        'duracion': duracion,
+        'estado_mensualidad': member_status(fecha_fin)
+    }
+
+def validate_cliente(data):
+    required_fields = ['nombre', 'apellido', 'telefono']
+    for field in required_fields:
+        if not data.get(field):
+            raise ValueError(f'Campo requerido: {field}')
+    
+    cliente = {
+        'nombre': data['nombre'],
+        'apellido': data['apellido'],
+        'peso': parse_number(data['peso'], 'peso') if data.get('peso') else None,
+        'telefono': str(data['telefono'])
+    }
+    cliente.update(validate_periodo(data))
+    return cliente
+
+def validate_venta(data):
+    required_fields = ['producto', 'cantidad', 'precio_unitario']
+    for field in required_fields:
+        if not data.get(field):
+            raise ValueError(f'Campo requerido: {field}')
+    
+    cantidad = parse_number(data['cantidad'], 'cantidad', integer=True)
+    precio_unitario = parse_number(data['precio_unitario'], 'precio_unitario')
+    
+    return {
+        'producto': data['producto'],
+        'cantidad': cantidad,
+        'precio_unitario': precio_unitario,
+        'total': cantidad * precio_unitario
+    }
+
+def validate_egreso(data):
+    if not data.get('descripcion') or not data.get('monto'):
+        raise ValueError('Descripción y monto son requeridos')
+    
+    return {
+        'fecha': parse_fecha(data.get('fecha') or datetime.now().date(), 'fecha'),
+        'descripcion': data['descripcion'],
+        'monto': parse_number(data['monto'], 'monto')
+    }
+
+# Payment ledger (pagos_miembros): one append-only row per sign-up or renewal,
+# written in the caller's transaction
+PAGO_INSERT_SQL = """
+INSERT INTO pagos_miembros (cliente_id, fecha_pago, monto, fecha_inicio, fecha_fin,
+                            duracion, tipo, metodo_pago)
+VALUES (%s, CURRENT_DATE, %s, %s, %s, %s, %s, %s)
+RETURNING id
+"""
 
-def update_member_status():
-    """Update member status based on current date"""
+def record_payment(cursor, cliente_id, periodo, tipo, metodo_pago=None):
+    cursor.execute(PAGO_INSERT_SQL, (
+        cliente_id,
+        periodo['precio_mensualidad'],
+        periodo['fecha_inicio'],
+        periodo['fecha_fin_mensualidad'],
+        periodo['duracion'],
+        tipo,
+        metodo_pago
+    ))
+    return cursor.fetchone()[0]
+
+# Membership status is a pure function of fecha_fin_mensualidad and today
+MEMBER_STATUS_SQL = """
+    CASE
+        WHEN fecha_fin_mensualidad < %(today)s THEN 'VENCIDO'
+        WHEN fecha_fin_mensualidad = %(today)s THEN 'VENCE HOY'
+        ELSE 'ACTIVO'
+    END
+"""
+MEMBER_STATUS_BATCH = int(os.environ.get('MEMBER_STATUS_BATCH', 5000))
+MEMBER_STATUS_LOCK_KEY = 720001
+
+def member_status(end_date, today=None):
+    """Status for a membership ending on end_date"""
+    today = today or datetime.now().date()
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+    if end_date < today:
+        return 'VENCIDO'
+    elif end_date == today:
+        return 'VENCE HOY'
+    return 'ACTIVO'
+
+def update_member_status(today=None):
+    """Rewrite the stored status of members whose status changed (daily job).
+
+    Only rows whose status actually changed are rewritten, in small batches
+    that skip rows locked by concurrent edits, so the front desk never waits
+    on the refresh. Reads compute the status themselves, so a skipped row is
+    only stale in the stored column until the next refresh.
+    """
+    today = today or datetime.now().date()
+    conn = get_db_connection()
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        
+        # Another worker is already refreshing; it will cover today
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (MEMBER_STATUS_LOCK_KEY,))
+        if not cursor.fetchone()[0]:
+            return
+        
+        try:
+            params = {'today': today, 'batch': MEMBER_STATUS_BATCH}
+            query = f"""
+                UPDATE clientes SET estado_mensualidad = {MEMBER_STATUS_SQL}
+                WHERE id IN (
+                    SELECT id FROM clientes
+                    WHERE estado_mensualidad IS DISTINCT FROM {MEMBER_STATUS_SQL}
+                    LIMIT %(batch)s
+                    FOR UPDATE SKIP LOCKED
+                )
+            """
+            while True:
+                cursor.execute(query, params)
+                if cursor.rowcount < MEMBER_STATUS_BATCH:
+                    break
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MEMBER_STATUS_LOCK_KEY,))
+        cursor.close()
+    finally:
+        conn.close()
+
+# List endpoints: keyset pagination on (created_at, id), projection and filters.
+# Without ?limit= or ?cursor= they keep returning the whole table as before.
+# created_at is NOT NULL on every listed table (0009_created_at_obligatorio.sql).
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+
+LIST_COLUMNS = {
+    'clientes': ['id', 'nombre', 'apellido', 'peso', 'telefono', 'email', 'fecha_inicio',
+                 'fecha_fin_mensualidad', 'estado_mensualidad', 'plan_mensualidad',
+                 'precio_mensualidad', 'duracion', 'observaciones', 'created_at', 'updated_at'],
+    'ventas': ['id', 'producto', 'cantidad', 'precio_unitario', 'total', 'fecha_venta',
+               'metodo_pago', 'observaciones', 'created_at', 'updated_at'],
+    'usuarios_diarios': ['id', 'nombre', 'telefono', 'fecha_entrada', 'hora_entrada',
+                         'cantidad_clientes', 'precio_por_cliente', 'total', 'metodo_pago',
+                         'observaciones', 'created_at', 'updated_at'],
+    'egresos': ['id', 'fecha', 'descripcion', 'monto', 'categoria', 'created_at'],
+    'usuarios': ['id', 'nombre', 'usuario', 'rol', 'activo', 'created_at'],
+    'pagos_miembros': ['id', 'cliente_id', 'fecha_pago', 'monto', 'fecha_inicio', 'fecha_fin',
+                       'duracion', 'tipo', 'metodo_pago', 'observaciones', 'created_at'],
+}
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(value, id) of encode_cursor; a date cursor (fecha_pago, fecha_fin_mensualidad) comes back as a date"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, row_id = raw.split('|')
+        parse = date.fromisoformat if len(value) == 10 else datetime.fromisoformat
+        return parse(value), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor inválido')
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Fecha inválida en {name}, use YYYY-MM-DD')
+
+def list_select(table, default='*', order_column='created_at'):
+    """SELECT list for ?fields=a,b (id and the order column are always included)"""
+    fields = request.args.get('fields')
+    if not fields:
+        return default
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in LIST_COLUMNS[table]]
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+    for column in ('id', order_column):
+        if column not in requested:
+            requested.append(column)
+    return ', '.join(requested)
+
+def fetch_list(cursor, table, conditions=None, params=None, date_column='created_at', default_select='*',
+               order_column='created_at'):
+    """Run a list query honoring limit/cursor/desde/hasta; returns (rows, next_cursor)"""
+    conditions = list(conditions or [])
+    params = list(params or [])
+    
+    # Half-open date range so the index on the column can be used
+    desde = parse_date_arg('desde')
+    hasta = parse_date_arg('hasta')
+    if desde:
+        conditions.append(f"{date_column} >= %s")
+        params.append(desde)
+    if hasta:
+        conditions.append(f"{date_column} < %s")
+        params.append(hasta + timedelta(days=1))
+    
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    if request.args.get('cursor'):
+        created_at, row_id = decode_cursor(request.args['cursor'])
+        conditions.append(f"({order_column}, id) < (%s, %s)")
+        params.extend([created_at, row_id])
+    
+    query = f"SELECT {list_select(table, default_select, order_column)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order_column} DESC, id DESC"
+    
+    limit = None
+    if paginated:
+        try:
+            limit = int(request.args.get('limit', LIST_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValueError('limit debe ser un número')
+        limit = max(1, min(limit, LIST_MAX_LIMIT))
+        # One extra row tells us whether there is a next page
+        query += " LIMIT %s"
+        params.append(limit + 1)
+    
+    # Plain tuple cursor on the same connection: rows are zipped against the
+    # column names once instead of building a RealDictRow per row
+    rows_cursor = cursor.connection.cursor()
+    rows_cursor.execute(query, params)
+    rows = serialization.fetch_dicts(rows_cursor)
+    rows_cursor.close()
+    
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][order_column], rows[-1]['id'])
+    return rows, next_cursor
+
+def list_response(rows, next_cursor):
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/clientes', methods=['GET'])
+def get_clientes():
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        # Get all members
-        cursor.execute("SELECT id, fecha_fin_mensualidad FROM clientes")
-        members = cursor.fetchall()
+        etag, last_modified = resource_validators(cursor, ['clientes'], datetime.now().date())
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
         
         today = datetime.now().date()
+        conditions = []
+        params = []
+        
+        # Status filter as a range on the end date (uses idx_clientes_fecha_fin)
+        estado = request.args.get('estado_mensualidad')
+        if estado:
+            operators = {'VENCIDO': '<', 'VENCE HOY': '=', 'ACTIVO': '>'}
+            if estado not in operators:
+                raise ValueError('estado_mensualidad inválido')
+            conditions.append(f"fecha_fin_mensualidad {operators[estado]} %s")
+            params.append(today)
+        
+        clientes, next_cursor = fetch_list(cursor, 'clientes', conditions, params)
+        
+        # Status as of today, whatever the stored value says
+        if clientes and 'estado_mensualidad' in clientes[0]:
+            for cliente in clientes:
+                if cliente['fecha_fin_mensualidad']:
+                    cliente['estado_mensualidad'] = member_status(cliente['fecha_fin_mensualidad'], today)
         
-        for member in members:
-            # Handle both string and date objects
-            if isinstance(member['fecha_fin_mensualidad'], str):
-                end_date = datetime.strptime(member['fecha_fin_mensualidad'], '%Y-%m-%d').date()
-            else:
-                end_date = member['fecha_fin_mensualidad']
-            
-            if end_date < today:
-                status = 'VENCIDO'
-            elif end_date == today:
-                status = 'VENCE HOY'
-            else:
-                status = 'ACTIVO'
-            
-            cursor.execute("UPDATE clientes SET estado_mensualidad = %s WHERE id = %s", (status, member['id']))
-        
-        conn.commit()
         cursor.close()
         conn.close()
+        
+        return add_validators(list_response(clientes, next_cursor), etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error updating member status: {e}")
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/api/clientes', methods=['GET'])
-def get_clientes():
+# Conditional GET: validators come from versiones_recursos (bumped by triggers
+# on every write), so a 304 costs one primary-key lookup and no row reads.
+def resource_validators(cursor, resources, *extra):
+    """(etag, last_modified) for the given tables; extra is mixed into the ETag"""
+    cursor.execute("""
+        SELECT COALESCE(SUM(version), 0) AS version, MAX(modificado) AS modificado
+        FROM versiones_recursos WHERE recurso = ANY(%s)
+    """, (list(resources),))
+    row = cursor.fetchone()
+    # Query args (limit, cursor, filters) pick a different page of the same version
+    args = sorted(request.args.items(multi=True)) if has_request_context() else []
+    stamp = ':'.join([','.join(resources), str(row['version'])] + [str(value) for value in extra]
+                     + [f'{key}={value}' for key, value in args])
+    etag = hashlib.sha1(stamp.encode()).hexdigest()[:20]
+    last_modified = row['modificado'].replace(tzinfo=timezone.utc) if row['modificado'] else None
+    return etag, last_modified
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def not_modified_response(etag, last_modified):
+    return add_validators(app.response_class(status=304), etag, last_modified)
+
+def add_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Cacheable, but always revalidated with the server
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Member search: prefix and fuzzy matching backed by pg_trgm / prefix indexes.
+# The expressions must match the indexes in migrations/0001_esquema_base.sql exactly.
+SEARCH_NAME_SQL = "lower(nombre || ' ' || coalesce(apellido, ''))"
+SEARCH_PHONE_SQL = "regexp_replace(coalesce(telefono, ''), '[^0-9]', '', 'g')"
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# pg_trgm is optional (see 0001_esquema_base.sql); without it the % operator
+# and similarity() do not exist, so names are only matched by prefix
+_has_trigrams = None
+
+def has_trigrams(cursor):
+    global _has_trigrams
+    if _has_trigrams is None:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        _has_trigrams = cursor.fetchone()[0]
+    return _has_trigrams
+
+@app.route('/api/clientes/search', methods=['GET'])
+def search_clientes():
     try:
-        update_member_status()
+        term = ' '.join(request.args.get('q', '').lower().split())
+        if not term:
+            return jsonify([])
+        
+        try:
+            limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'limit debe ser un número'}), 400
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
+        
+        columns = "id, nombre, apellido, telefono, fecha_inicio, fecha_fin_mensualidad, precio_mensualidad, duracion"
+        digits = ''.join(ch for ch in term if ch.isdigit())
+        
+        if digits and not any(ch.isalpha() for ch in term):
+            # Phone lookup on normalized digits, exact prefix ranked first
+            query = f"""
+                SELECT {columns},
+                       CASE WHEN {SEARCH_PHONE_SQL} LIKE %(prefix)s THEN 2 ELSE 1 END AS score
+                FROM clientes
+                WHERE {SEARCH_PHONE_SQL} LIKE %(contains)s
+                ORDER BY score DESC, nombre, apellido
+                LIMIT %(limit)s
+            """
+            params = {'prefix': escape_like(digits) + '%', 'contains': '%' + escape_like(digits) + '%', 'limit': limit}
+        elif len(term) < 3 or not has_trigrams(cursor):
+            # Too short for trigrams (or no pg_trgm): plain prefix on nombre / apellido
+            query = f"""
+                SELECT {columns}, 1 AS score
+                FROM clientes
+                WHERE lower(nombre) LIKE %(prefix)s OR lower(apellido) LIKE %(prefix)s
+                ORDER BY nombre, apellido
+                LIMIT %(limit)s
+            """
+            params = {'prefix': escape_like(term) + '%', 'limit': limit}
+        else:
+            # Substring or fuzzy match; prefixes and close matches rank highest
+            query = f"""
+                SELECT {columns},
+                       similarity({SEARCH_NAME_SQL}, %(term)s)
+                       + CASE WHEN {SEARCH_NAME_SQL} LIKE %(prefix)s
+                                OR lower(apellido) LIKE %(prefix)s THEN 1 ELSE 0 END AS score
+                FROM clientes
+                WHERE {SEARCH_NAME_SQL} LIKE %(contains)s
+                   OR {SEARCH_NAME_SQL} %% %(term)s
+                ORDER BY score DESC, nombre, apellido
+                LIMIT %(limit)s
+            """
+            params = {
+                'term': term,
+                'prefix': escape_like(term) + '%',
+                'contains': '%' + escape_like(term) + '%',
+                'limit': limit
+            }
         
-        cursor.execute("SELECT * FROM clientes ORDER BY created_at DESC")
-        clientes = cursor.fetchall()
+        cursor.execute(query, params)
+        clientes = serialization.fetch_dicts(cursor)
         
-        # Convert datetime objects to strings for JSON serialization
+        today = datetime.now().date()
         for cliente in clientes:
-            if cliente['created_at']:
-                cliente['created_at'] = cliente['created_at'].isoformat()
-            if cliente['updated_at']:
-                cliente['updated_at'] = cliente['updated_at'].isoformat()
-            if cliente['fecha_inicio']:
-                cliente['fecha_inicio'] = cliente['fecha_inicio'].strftime('%Y-%m-%d')
+            cliente['score'] = round(float(cliente['score']), 3)
             if cliente['fecha_fin_mensualidad']:
-                cliente['fecha_fin_mensualidad'] = cliente['fecha_fin_mensualidad'].strftime('%Y-%m-%d')
+                cliente['estado_mensualidad'] = member_status(cliente['fecha_fin_mensualidad'], today)
         
         cursor.close()
         conn.close()
@@ -107,19 +530,186 @@ def get_clientes():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Expiring memberships for the front desk: a range scan on idx_clientes_fecha_fin
+# (oldest first), with counts per bucket read from clientes_vencimientos
+VENCIMIENTOS_DEFAULT_DIAS = 7
+VENCIMIENTOS_MAX_DIAS = 90
+VENCIMIENTOS_GRUPOS = ('vencidos', 'hoy', 'semana', 'despues')
+VENCIMIENTOS_COLUMNS = ('id, nombre, apellido, telefono, fecha_inicio, fecha_fin_mensualidad, '
+                        'precio_mensualidad, duracion')
+
+def vencimientos_range(today, dias, grupo=None):
+    """[desde, hasta] of expiry dates for ?dias=N, narrowed to one bucket"""
+    desde, hasta = today - timedelta(days=dias), today + timedelta(days=dias)
+    semana = today + timedelta(days=7)
+    if grupo == 'vencidos':
+        hasta = today - timedelta(days=1)
+    elif grupo == 'hoy':
+        desde = hasta = today
+    elif grupo == 'semana':
+        desde, hasta = today + timedelta(days=1), min(hasta, semana)
+    elif grupo == 'despues':
+        desde = semana + timedelta(days=1)
+    return desde, hasta
+
+def add_vencimiento(row, today):
+    row['estado_mensualidad'] = member_status(row['fecha_fin_mensualidad'], today)
+    row['dias'] = (row['fecha_fin_mensualidad'] - today).days
+    return row
+
+@app.route('/api/clientes/vencimientos', methods=['GET'])
+def get_clientes_vencimientos():
+    try:
+        today = datetime.now().date()
+        try:
+            dias = int(request.args.get('dias', VENCIMIENTOS_DEFAULT_DIAS))
+        except ValueError:
+            raise ValueError('dias debe ser un número')
+        if not 0 <= dias <= VENCIMIENTOS_MAX_DIAS:
+            raise ValueError(f'dias debe estar entre 0 y {VENCIMIENTOS_MAX_DIAS}')
+        grupo = request.args.get('grupo')
+        if grupo is not None and grupo not in VENCIMIENTOS_GRUPOS:
+            raise ValueError(f"grupo debe ser uno de: {', '.join(VENCIMIENTOS_GRUPOS)}")
+        try:
+            limit = max(1, min(int(request.args.get('limit', LIST_DEFAULT_LIMIT)), LIST_MAX_LIMIT))
+        except ValueError:
+            raise ValueError('limit debe ser un número')
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        # The buckets move with the date, so it is part of the ETag
+        etag, last_modified = resource_validators(cursor, ['clientes'], today, dias, grupo)
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
+        
+        desde, hasta = vencimientos_range(today, dias)
+        cursor.execute("""
+            SELECT CASE WHEN fecha_fin_mensualidad < %(hoy)s THEN 'vencidos'
+                        WHEN fecha_fin_mensualidad = %(hoy)s THEN 'hoy'
+                        WHEN fecha_fin_mensualidad <= %(semana)s THEN 'semana'
+                        ELSE 'despues' END AS grupo,
+                   SUM(cantidad)::int AS cantidad
+            FROM clientes_vencimientos
+            WHERE fecha_fin_mensualidad BETWEEN %(desde)s AND %(hasta)s
+            GROUP BY 1
+        """, {'hoy': today, 'semana': today + timedelta(days=7), 'desde': desde, 'hasta': hasta})
+        conteos = dict.fromkeys(VENCIMIENTOS_GRUPOS, 0)
+        conteos.update({row['grupo']: row['cantidad'] for row in cursor.fetchall()})
+        
+        desde, hasta = vencimientos_range(today, dias, grupo)
+        conditions = ["fecha_fin_mensualidad BETWEEN %s AND %s"]
+        params = [desde, hasta]
+        if request.args.get('cursor'):
+            fecha_fin, row_id = decode_cursor(request.args['cursor'])
+            conditions.append("(fecha_fin_mensualidad, id) > (%s, %s)")
+            params.extend([fecha_fin, row_id])
+        params.append(limit + 1)
+        
+        rows_cursor = conn.cursor()
+        rows_cursor.execute(f"""
+            SELECT {VENCIMIENTOS_COLUMNS} FROM clientes
+            WHERE {' AND '.join(conditions)}
+            ORDER BY fecha_fin_mensualidad, id
+            LIMIT %s
+        """, params)
+        clientes = [add_vencimiento(row, today) for row in serialization.fetch_dicts(rows_cursor)]
+        rows_cursor.close()
+        cursor.close()
+        conn.close()
+        
+        next_cursor = None
+        if len(clientes) > limit:
+            clientes = clientes[:limit]
+            next_cursor = encode_cursor(clientes[-1]['fecha_fin_mensualidad'], clientes[-1]['id'])
+        
+        response = list_response({
+            'desde': desde,
+            'hasta': hasta,
+            'conteos': conteos,
+            'clientes': clientes
+        }, next_cursor)
+        return add_validators(response, etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Daily renewal work list: generated by the first request of the day (the
+# row in listas_renovacion makes every worker serve the same snapshot) and
+# kept in memory, already encoded, until the day or the clientes version changes
+LISTA_RENOVACION_DIAS_ATRAS = 7
+LISTA_RENOVACION_DIAS_ADELANTE = 3
+LISTA_RENOVACION_SQL = f"""
+    INSERT INTO listas_renovacion (fecha, version_clientes, clientes)
+    SELECT %(hoy)s, (SELECT version FROM versiones_recursos WHERE recurso = 'clientes'),
+           COALESCE(jsonb_agg(to_jsonb(c) ORDER BY c.fecha_fin_mensualidad, c.id), '[]')
+    FROM (
+        SELECT {VENCIMIENTOS_COLUMNS}, fecha_fin_mensualidad - %(hoy)s AS dias
+        FROM clientes
+        WHERE fecha_fin_mensualidad BETWEEN %(desde)s AND %(hasta)s
+    ) c
+    ON CONFLICT (fecha) DO UPDATE
+        SET clientes = EXCLUDED.clientes, version_clientes = EXCLUDED.version_clientes, generada_en = now()
+        WHERE listas_renovacion.version_clientes < EXCLUDED.version_clientes
+"""
+_renewal_list = None
+
+def build_renewal_list(cursor, today):
+    """Create or refresh today's list unless another worker already did, and cache it encoded"""
+    global _renewal_list
+    cursor.execute(LISTA_RENOVACION_SQL, {
+        'hoy': today,
+        'desde': today - timedelta(days=LISTA_RENOVACION_DIAS_ATRAS),
+        'hasta': today + timedelta(days=LISTA_RENOVACION_DIAS_ADELANTE)
+    })
+    cursor.execute("DELETE FROM listas_renovacion WHERE fecha < %s", (today - timedelta(days=30),))
+    cursor.execute("SELECT fecha, generada_en, version_clientes, clientes FROM listas_renovacion WHERE fecha = %s",
+                   (today,))
+    lista = cursor.fetchone()
+    cursor.connection.commit()
+    
+    for row in lista['clientes']:
+        row['estado_mensualidad'] = member_status(row['fecha_fin_mensualidad'], today)
+    body = serialization.dumps({
+        'fecha': lista['fecha'],
+        'generada_en': lista['generada_en'],
+        'total': len(lista['clientes']),
+        'clientes': lista['clientes']
+    })
+    etag = hashlib.sha1(f"lista:{today}:{lista['generada_en'].isoformat()}".encode()).hexdigest()[:20]
+    _renewal_list = (today, lista['version_clientes'], etag, body)
+
+@app.route('/api/clientes/vencimientos/lista', methods=['GET'])
+def get_lista_renovacion():
+    try:
+        today = datetime.now().date()
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        # Members signed up, renewed or deleted since the list was built refresh it
+        cursor.execute("SELECT version FROM versiones_recursos WHERE recurso = 'clientes'")
+        version = cursor.fetchone()['version']
+        if _renewal_list is None or _renewal_list[0] != today or _renewal_list[1] < version:
+            build_renewal_list(cursor, today)
+        cursor.close()
+        conn.close()
+        
+        _, _, etag, body = _renewal_list
+        if is_not_modified(etag, None):
+            return not_modified_response(etag, None)
+        return add_validators(app.response_class(body, mimetype='application/json'), etag, None)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/clientes', methods=['POST'])
 def add_cliente():
     try:
         data = request.json
         
-        # Validate required fields
-        required_fields = ['nombre', 'apellido', 'telefono', 'precio_mensualidad', 'fecha_inicio', 'duracion']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Campo requerido: {field}'}), 400
-        
-        # Calculate end date
-        fecha_fin = calculate_end_date(data['fecha_inicio'], data['duracion'])
+        # Validate required fields and calculate end date
+        cliente = validate_cliente(data)
         
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -127,28 +717,33 @@ def add_cliente():
         query = """
         INSERT INTO clientes (nombre, apellido, peso, telefono, precio_mensualidad, 
                              fecha_inicio, fecha_fin_mensualidad, duracion, estado_mensualidad)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'ACTIVO')
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
         """
         
         values = (
-            data['nombre'],
-            data['apellido'],
-            data.get('peso'),
-            data['telefono'],
-            data['precio_mensualidad'],
-            data['fecha_inicio'],
-            fecha_fin,
-            data['duracion']
+            cliente['nombre'],
+            cliente['apellido'],
+            cliente['peso'],
+            cliente['telefono'],
+            cliente['precio_mensualidad'],
+            cliente['fecha_inicio'],
+            cliente['fecha_fin_mensualidad'],
+            cliente['duracion'],
+            cliente['estado_mensualidad']
         )
         
         cursor.execute(query, values)
-        cliente_id = cursor.lastrowid
+        cliente_id = cursor.fetchone()[0]
+        record_payment(cursor, cliente_id, cliente, 'mensualidad', data.get('metodo_pago'))
         
         conn.commit()
         cursor.close()
         conn.close()
         
         return jsonify({'id': cliente_id, 'message': 'Cliente agregado exitosamente'})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -157,14 +752,8 @@ def update_cliente(cliente_id):
     try:
         data = request.json
         
-        # Validate required fields
-        required_fields = ['nombre', 'apellido', 'telefono', 'precio_mensualidad', 'fecha_inicio', 'duracion']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Campo requerido: {field}'}), 400
-        
-        # Calculate end date
-        fecha_fin = calculate_end_date(data['fecha_inicio'], data['duracion'])
+        # Validate required fields and calculate end date
+        cliente = validate_cliente(data)
         
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -173,19 +762,20 @@ def update_cliente(cliente_id):
         UPDATE clientes SET 
             nombre = %s, apellido = %s, peso = %s, telefono = %s, 
             precio_mensualidad = %s, fecha_inicio = %s, fecha_fin_mensualidad = %s, 
-            duracion = %s, updated_at = CURRENT_TIMESTAMP
+            duracion = %s, estado_mensualidad = %s, updated_at = CURRENT_TIMESTAMP
         WHERE id = %s
         """
         
         values = (
-            data['nombre'],
-            data['apellido'],
-            data.get('peso'),
-            data['telefono'],
-            data['precio_mensualidad'],
-            data['fecha_inicio'],
-            fecha_fin,
-            data['duracion'],
+            cliente['nombre'],
+            cliente['apellido'],
+            cliente['peso'],
+            cliente['telefono'],
+            cliente['precio_mensualidad'],
+            cliente['fecha_inicio'],
+            cliente['fecha_fin_mensualidad'],
+            cliente['duracion'],
+            cliente['estado_mensualidad'],
             cliente_id
         )
         
@@ -200,6 +790,8 @@ def update_cliente(cliente_id):
         conn.close()
         
         return jsonify({'message': 'Cliente actualizado exitosamente'})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -229,42 +821,30 @@ def get_cliente_pagos(cliente_id):
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        # Get client info
-        cursor.execute("SELECT * FROM clientes WHERE id = %s", (cliente_id,))
-        cliente = cursor.fetchone()
-        
-        if not cliente:
+        cursor.execute("SELECT id FROM clientes WHERE id = %s", (cliente_id,))
+        if not cursor.fetchone():
             cursor.close()
             conn.close()
             return jsonify({'error': 'Cliente no encontrado'}), 404
         
-        # Convert datetime objects to strings
-        if cliente['created_at']:
-            cliente['created_at'] = cliente['created_at'].isoformat()
-        if cliente['updated_at']:
-            cliente['updated_at'] = cliente['updated_at'].isoformat()
-        if cliente['fecha_inicio']:
-            cliente['fecha_inicio'] = cliente['fecha_inicio'].strftime('%Y-%m-%d')
-        if cliente['fecha_fin_mensualidad']:
-            cliente['fecha_fin_mensualidad'] = cliente['fecha_fin_mensualidad'].strftime('%Y-%m-%d')
+        etag, last_modified = resource_validators(cursor, ['pagos_miembros'])
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
         
-        # For now, return client info as payment history
-        # Later we can create a separate payments table
-        pagos = [{
-            'id': 1,
-            'member_id': cliente_id,
-            'fecha_inicio': cliente['fecha_inicio'],
-            'fecha_fin': cliente['fecha_fin_mensualidad'],
-            'duracion': cliente['duracion'],
-            'precio': cliente['precio_mensualidad'],
-            'fecha_pago': cliente['created_at'][:10],
-            'tipo': 'mensualidad'
-        }]
+        # Newest first; served by idx_pagos_miembros_cliente
+        pagos, next_cursor = fetch_list(
+            cursor, 'pagos_miembros', ["cliente_id = %s"], [cliente_id],
+            date_column='fecha_pago', order_column='fecha_pago'
+        )
         
         cursor.close()
         conn.close()
         
-        return jsonify(pagos)
+        return add_validators(list_response(pagos, next_cursor), etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -273,14 +853,8 @@ def renovar_cliente(cliente_id):
     try:
         data = request.json
         
-        # Validate required fields
-        required_fields = ['fecha_inicio', 'duracion', 'precio_mensualidad']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Campo requerido: {field}'}), 400
-        
-        # Calculate end date
-        fecha_fin = calculate_end_date(data['fecha_inicio'], data['duracion'])
+        # Validate required fields and calculate end date
+        periodo = validate_periodo(data)
         
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -288,30 +862,94 @@ def renovar_cliente(cliente_id):
         query = """
         UPDATE clientes SET 
             fecha_inicio = %s, fecha_fin_mensualidad = %s, duracion = %s,
-            precio_mensualidad = %s, estado_mensualidad = 'ACTIVO', 
+            precio_mensualidad = %s, estado_mensualidad = %s, 
             updated_at = CURRENT_TIMESTAMP
             WHERE id = %s
         """
         
         values = (
-            data['fecha_inicio'],
-            fecha_fin,
-            data['duracion'],
-            data['precio_mensualidad'],
+            periodo['fecha_inicio'],
+            periodo['fecha_fin_mensualidad'],
+            periodo['duracion'],
+            periodo['precio_mensualidad'],
+            periodo['estado_mensualidad'],
             cliente_id
         )
         
         cursor.execute(query, values)
         
         if cursor.rowcount == 0:
+            cursor.close()
             conn.close()
             return jsonify({'error': 'Cliente no encontrado'}), 404
         
+        # The renewal is recorded in the ledger so past payments are kept
+        pago_id = record_payment(cursor, cliente_id, periodo, 'renovacion', data.get('metodo_pago'))
+        # Its receipt is rendered in the background, only if the renewal commits
+        jobs.enqueue('recibo', {'pago_id': pago_id}, clave=f'recibo:{pago_id}', cursor=cursor)
+        
         conn.commit()
         cursor.close()
         conn.close()
         
-        return jsonify({'message': 'Cliente renovado exitosamente'})
+        return jsonify({'pago_id': pago_id, 'recibo': f'/api/pagos/{pago_id}/recibo',
+                        'message': 'Cliente renovado exitosamente'})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Membership revenue per period, straight from the payment ledger
+@app.route('/api/pagos/resumen', methods=['GET'])
+def get_pagos_resumen():
+    try:
+        hoy = datetime.now().date()
+        desde = parse_date_arg('desde') or hoy.replace(day=1)
+        hasta = parse_date_arg('hasta') or hoy
+        if hasta < desde:
+            return jsonify({'error': 'hasta debe ser posterior a desde'}), 400
+        
+        agrupar = request.args.get('agrupar', 'dia')
+        if agrupar not in stats.GRANULARIDADES:
+            return jsonify({'error': 'agrupar debe ser dia, semana, mes o anio'}), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        # The default range moves with the calendar, so it is part of the ETag
+        etag, last_modified = resource_validators(cursor, ['pagos_miembros'], desde, hasta)
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
+        
+        # Range scan over idx_pagos_miembros_fecha (index-only: it includes monto and tipo)
+        cursor.execute("""
+            SELECT date_trunc(%s, fecha_pago::timestamp)::date AS periodo,
+                   COUNT(*) AS pagos,
+                   COUNT(*) FILTER (WHERE tipo = 'renovacion') AS renovaciones,
+                   COALESCE(SUM(monto), 0) AS ingresos
+            FROM pagos_miembros
+            WHERE fecha_pago >= %s AND fecha_pago <= %s
+            GROUP BY 1
+            ORDER BY 1
+        """, (stats.GRANULARIDADES[agrupar], desde, hasta))
+        periodos = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        
+        response = jsonify({
+            'desde': desde,
+            'hasta': hasta,
+            'agrupar': agrupar,
+            'pagos': sum(periodo['pagos'] for periodo in periodos),
+            'ingresos': sum(periodo['ingresos'] for periodo in periodos),
+            'periodos': periodos
+        })
+        return add_validators(response, etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -322,18 +960,20 @@ def get_usuarios_diarios():
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        cursor.execute("SELECT * FROM usuarios_diarios ORDER BY created_at DESC")
-        usuarios = cursor.fetchall()
+        etag, last_modified = resource_validators(cursor, ['usuarios_diarios'])
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
         
-        # Convert datetime objects to strings
-        for usuario in usuarios:
-            if usuario['created_at']:
-                usuario['created_at'] = usuario['created_at'].isoformat()
+        usuarios, next_cursor = fetch_list(cursor, 'usuarios_diarios')
         
         cursor.close()
         conn.close()
         
-        return jsonify(usuarios)
+        return add_validators(list_response(usuarios, next_cursor), etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -357,6 +997,7 @@ def add_usuario_diario():
         query = """
         INSERT INTO usuarios_diarios (cantidad_clientes, precio_por_cliente, total)
         VALUES (%s, %s, %s)
+        RETURNING id
         """
         
         values = (
@@ -366,7 +1007,7 @@ def add_usuario_diario():
         )
         
         cursor.execute(query, values)
-        usuario_id = cursor.lastrowid
+        usuario_id = cursor.fetchone()[0]
         
         conn.commit()
         cursor.close()
@@ -447,18 +1088,27 @@ def get_ventas():
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        cursor.execute("SELECT * FROM ventas ORDER BY created_at DESC")
-        ventas = cursor.fetchall()
+        etag, last_modified = resource_validators(cursor, ['ventas'])
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
+        
+        conditions = []
+        params = []
+        producto = request.args.get('producto')
+        if producto:
+            conditions.append("producto = %s")
+            params.append(producto)
         
-        # Convert datetime objects to strings
-        for venta in ventas:
-            if venta['created_at']:
-                venta['created_at'] = venta['created_at'].isoformat()
+        ventas, next_cursor = fetch_list(cursor, 'ventas', conditions, params)
         
         cursor.close()
         conn.close()
         
-        return jsonify(ventas)
+        return add_validators(list_response(ventas, next_cursor), etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -467,14 +1117,8 @@ def add_venta():
     try:
         data = request.json
         
-        # Validate required fields
-        required_fields = ['producto', 'cantidad', 'precio_unitario']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Campo requerido: {field}'}), 400
-        
-        # Calculate total
-        total = data['cantidad'] * data['precio_unitario']
+        # Validate required fields and calculate total
+        venta = validate_venta(data)
         
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -482,23 +1126,79 @@ def add_venta():
         query = """
         INSERT INTO ventas (producto, cantidad, precio_unitario, total)
         VALUES (%s, %s, %s, %s)
+        RETURNING id
         """
         
         values = (
-            data['producto'],
-            data['cantidad'],
-            data['precio_unitario'],
-            total
+            venta['producto'],
+            venta['cantidad'],
+            venta['precio_unitario'],
+            venta['total']
         )
         
         cursor.execute(query, values)
-        venta_id = cursor.lastrowid
+        venta_id = cursor.fetchone()[0]
         
         conn.commit()
         cursor.close()
         conn.close()
         
         return jsonify({'id': venta_id, 'message': 'Venta registrada exitosamente'})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Multi-line counter sale: the whole cart is written in one statement and
+# one transaction, or rejected entirely if any line is invalid
+VENTA_BATCH_MAX_LINES = 200
+
+@app.route('/api/ventas/batch', methods=['POST'])
+def add_ventas_batch():
+    try:
+        data = request.json
+        
+        # Accept either a bare list of lines or {"productos": [...]}
+        lineas = data.get('productos') if isinstance(data, dict) else data
+        if not isinstance(lineas, list) or not lineas:
+            return jsonify({'error': 'Se requiere una lista de productos'}), 400
+        if len(lineas) > VENTA_BATCH_MAX_LINES:
+            return jsonify({'error': f'Máximo {VENTA_BATCH_MAX_LINES} productos por venta'}), 400
+        
+        ventas = []
+        errores = []
+        for i, linea in enumerate(lineas):
+            try:
+                if not isinstance(linea, dict):
+                    raise ValueError('Línea inválida')
+                ventas.append(validate_venta(linea))
+            except ValueError as e:
+                errores.append({'linea': i, 'error': str(e)})
+        
+        if errores:
+            return jsonify({'error': 'Venta rechazada', 'errores': errores}), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        rows = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO ventas (producto, cantidad, precio_unitario, total)
+            VALUES %s
+            RETURNING id
+        """, [
+            (venta['producto'], venta['cantidad'], venta['precio_unitario'], venta['total'])
+            for venta in ventas
+        ], page_size=len(ventas), fetch=True)
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        return jsonify({
+            'ids': [row[0] for row in rows],
+            'total': float(sum(venta['total'] for venta in ventas)),
+            'message': 'Venta registrada exitosamente'
+        }), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -507,14 +1207,8 @@ def update_venta(venta_id):
     try:
         data = request.json
         
-        # Validate required fields
-        required_fields = ['producto', 'cantidad', 'precio_unitario']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Campo requerido: {field}'}), 400
-        
-        # Calculate total
-        total = data['cantidad'] * data['precio_unitario']
+        # Validate required fields and calculate total
+        venta = validate_venta(data)
         
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -526,10 +1220,10 @@ def update_venta(venta_id):
         """
         
         values = (
-            data['producto'],
-            data['cantidad'],
-            data['precio_unitario'],
-            total,
+            venta['producto'],
+            venta['cantidad'],
+            venta['precio_unitario'],
+            venta['total'],
             venta_id
         )
         
@@ -544,6 +1238,8 @@ def update_venta(venta_id):
         conn.close()
         
         return jsonify({'message': 'Venta actualizada exitosamente'})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -568,99 +1264,63 @@ def delete_venta(venta_id):
         return jsonify({'error': str(e)}), 500
 
 # Dashboard Statistics API
+# estadisticas_diarias is maintained by triggers (migrations/0002_estadisticas.sql), so
+# the dashboard is a primary-key lookup plus the small expiry-count table.
+DASHBOARD_SQL = """
+SELECT v.total_members, v.expired_members,
+       COALESCE(e.nuevos_miembros, 0) AS today_members,
+       COALESCE(e.usuarios_diarios, 0) AS total_users_today,
+       COALESCE(e.ingresos_totales, 0) AS total_income_today,
+       COALESCE(e.egresos_totales, 0) AS today_expenses,
+       COALESCE(e.ganancias_diarias, 0) AS today_profit,
+       COALESCE(e.ingresos_miembros, 0) AS members_income,
+       COALESCE(e.ingresos_diarios, 0) AS daily_income,
+       COALESCE(e.ingresos_ventas, 0) AS sales_income
+FROM (SELECT COALESCE(SUM(cantidad), 0) AS total_members,
+             COALESCE(SUM(cantidad) FILTER (WHERE fecha_fin_mensualidad < %(today)s), 0) AS expired_members
+      FROM clientes_vencimientos) v
+LEFT JOIN estadisticas_diarias e ON e.fecha = %(today)s
+"""
+
+# Also pushed to the open event streams after every write (see events.py)
+@events.statistics
+def dashboard_statistics(cursor, today):
+    cursor.execute(DASHBOARD_SQL, {'today': today})
+    figures = cursor.fetchone()
+    
+    return {
+        'members': {
+            'total_members': int(figures['total_members']),
+            'expired_members': int(figures['expired_members'])
+        },
+        'daily_users': int(figures['total_users_today']),  # Total users registered today (members + daily users)
+        'income_today': float(figures['total_income_today']),
+        'expenses_today': float(figures['today_expenses']),
+        'profit_today': float(figures['today_profit']),
+        'members_income': float(figures['members_income']),
+        'daily_income': float(figures['daily_income']),
+        'sales_income': float(figures['sales_income'])
+    }
+
 @app.route('/api/estadisticas', methods=['GET'])
 def get_estadisticas():
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        # Get today's date
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # Check if we have statistics for today, if not create them
-        cursor.execute("SELECT * FROM estadisticas_diarias WHERE fecha = %s", (today,))
-        today_stats = cursor.fetchone()
-        
-        if not today_stats:
-            # Create new daily statistics record
-            cursor.execute("""
-                INSERT INTO estadisticas_diarias (fecha, total_miembros, usuarios_diarios, ventas, ingresos_totales)
-                VALUES (%s, 0, 0, 0, 0.00)
-            """, (today,))
-            conn.commit()
-            today_stats = {'total_miembros': 0, 'usuarios_diarios': 0, 'ventas': 0, 'ingresos_totales': 0.00}
-        
-        # Count total monthly members (only members with complete data)
-        cursor.execute("SELECT COUNT(*) as total FROM clientes")
-        total_members = cursor.fetchone()['total']
-        
-        # Count expired members
-        cursor.execute("SELECT COUNT(*) as total FROM clientes WHERE estado_mensualidad = 'VENCIDO'")
-        expired_members = cursor.fetchone()['total']
-        
-        # Count members registered today
-        cursor.execute("SELECT COUNT(*) as total FROM clientes WHERE DATE(created_at) = %s", (today,))
-        today_members = cursor.fetchone()['total']
-        
-        # Count daily users registered today (sum of cantidad_clientes)
-        cursor.execute("SELECT COALESCE(SUM(cantidad_clientes), 0) as total FROM usuarios_diarios WHERE DATE(created_at) = %s", (today,))
-        today_daily_users = cursor.fetchone()['total']
-        
-        # Count sales today
-        cursor.execute("SELECT COUNT(*) as total FROM ventas WHERE DATE(created_at) = %s", (today,))
-        today_sales = cursor.fetchone()['total']
-        
-        # Total users registered today (members + daily users)
-        total_users_today = today_members + today_daily_users
-        
-        # Calculate today's income from members registered today
-        cursor.execute("SELECT COALESCE(SUM(precio_mensualidad), 0) as total FROM clientes WHERE DATE(created_at) = %s", (today,))
-        members_income = cursor.fetchone()['total']
-        
-        # Calculate today's income from daily users
-        cursor.execute("SELECT COALESCE(SUM(total), 0) as total FROM usuarios_diarios WHERE DATE(created_at) = %s", (today,))
-        daily_income = cursor.fetchone()['total']
-        
-        # Calculate today's income from sales
-        cursor.execute("SELECT COALESCE(SUM(total), 0) as total FROM ventas WHERE DATE(created_at) = %s", (today,))
-        sales_income = cursor.fetchone()['total']
-        
-        # Calculate total income today (members + daily users + sales)
-        total_income_today = float(members_income) + float(daily_income) + float(sales_income)
-        
-        # Calculate today's expenses
-        cursor.execute("SELECT COALESCE(SUM(monto), 0) as total FROM egresos WHERE DATE(fecha) = %s", (today,))
-        today_expenses = cursor.fetchone()['total']
-        
-        # Calculate today's profit (income - expenses)
-        today_profit = total_income_today - float(today_expenses)
-        
-        # Update daily statistics
-        cursor.execute("""
-            UPDATE estadisticas_diarias 
-            SET total_miembros = %s, usuarios_diarios = %s, ventas = %s, ingresos_totales = %s, egresos_totales = %s, ganancias_diarias = %s
-            WHERE fecha = %s
-        """, (total_members, total_users_today, today_sales, total_income_today, today_expenses, today_profit, today))
-        conn.commit()
+        today = datetime.now().date()
+        etag, last_modified = resource_validators(cursor, ['estadisticas_diarias', 'clientes'], today)
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
         
-        statistics = {
-            'members': {
-                'total_members': total_members,
-                'expired_members': expired_members
-            },
-            'daily_users': total_users_today,  # Total users registered today (members + daily users)
-            'income_today': total_income_today,
-            'expenses_today': float(today_expenses),
-            'profit_today': today_profit,
-            'members_income': float(members_income),
-            'daily_income': float(daily_income),
-            'sales_income': float(sales_income)
-        }
+        statistics = dashboard_statistics(cursor, today)
         
         cursor.close()
         conn.close()
         
-        return jsonify(statistics)
+        return add_validators(jsonify(statistics), etag, last_modified)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -671,27 +1331,90 @@ def get_estadisticas_historial():
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        # Get last 30 days of statistics
+        today = datetime.now().date()
+        etag, last_modified = resource_validators(cursor, ['estadisticas_diarias'], today)
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
+        
+        # Last 30 calendar days; days without activity show zeros and the
+        # latest known member total instead of being left out
         cursor.execute("""
-            SELECT fecha, total_miembros, usuarios_diarios, ventas, ingresos_totales, egresos_totales, ganancias_diarias
-            FROM estadisticas_diarias 
-            ORDER BY fecha DESC 
-            LIMIT 30
-        """)
+            SELECT dias.fecha::date AS fecha,
+                   COALESCE(e.total_miembros, (
+                       SELECT p.total_miembros FROM estadisticas_diarias p
+                       WHERE p.fecha < dias.fecha ORDER BY p.fecha DESC LIMIT 1
+                   ), 0) AS total_miembros,
+                   COALESCE(e.usuarios_diarios, 0) AS usuarios_diarios,
+                   COALESCE(e.ventas, 0) AS ventas,
+                   COALESCE(e.ingresos_totales, 0) AS ingresos_totales,
+                   COALESCE(e.egresos_totales, 0) AS egresos_totales,
+                   COALESCE(e.ganancias_diarias, 0) AS ganancias_diarias
+            FROM generate_series(%(today)s::date - 29, %(today)s::date, interval '1 day') AS dias(fecha)
+            LEFT JOIN estadisticas_diarias e ON e.fecha = dias.fecha::date
+            ORDER BY dias.fecha DESC
+        """, {'today': today})
         
         historial = cursor.fetchall()
         
-        # Format dates for frontend
-        for stat in historial:
-            stat['fecha'] = stat['fecha'].strftime('%Y-%m-%d')
-            stat['ingresos_totales'] = float(stat['ingresos_totales'])
-            stat['egresos_totales'] = float(stat['egresos_totales'])
-            stat['ganancias_diarias'] = float(stat['ganancias_diarias'])
+        cursor.close()
+        conn.close()
+        
+        return add_validators(jsonify(historial), etag, last_modified)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Period report: income, expenses, profit, new members and daily visitors
+# per day/week/month/year. Months and years read the precomputed
+# estadisticas_mensuales rows, topped up from daily rows for partial months.
+RANGO_MAX_DIAS = 366 * 20
+
+@app.route('/api/estadisticas/rango', methods=['GET'])
+def get_estadisticas_rango():
+    try:
+        today = datetime.now().date()
+        hasta = parse_date_arg('hasta') or today
+        desde = parse_date_arg('desde') or hasta.replace(month=1, day=1)
+        if hasta < desde:
+            return jsonify({'error': 'hasta debe ser posterior a desde'}), 400
+        if (hasta - desde).days > RANGO_MAX_DIAS:
+            return jsonify({'error': 'El rango no puede superar 20 años'}), 400
+        
+        granularidad = request.args.get('granularidad', 'mes')
+        if granularidad not in stats.GRANULARIDADES:
+            return jsonify({'error': 'granularidad debe ser dia, semana, mes o anio'}), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        etag, last_modified = resource_validators(cursor, ['estadisticas_diarias'], today)
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
+        
+        periodos = stats.period_report(cursor, desde, hasta, granularidad, today)
         
         cursor.close()
         conn.close()
         
-        return jsonify(historial)
+        totales = {
+            field: sum(periodo[field] for periodo in periodos)
+            for field in ('nuevos_miembros', 'clientes_diarios', 'ventas', 'ingresos_miembros',
+                          'ingresos_diarios', 'ingresos_ventas', 'ingresos', 'egresos', 'ganancias')
+        }
+        
+        response = jsonify({
+            'desde': desde,
+            'hasta': hasta,
+            'granularidad': granularidad,
+            'totales': totales,
+            'periodos': periodos
+        })
+        return add_validators(response, etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -702,20 +1425,21 @@ def get_egresos():
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        cursor.execute("SELECT * FROM egresos ORDER BY created_at DESC")
-        egresos = cursor.fetchall()
+        etag, last_modified = resource_validators(cursor, ['egresos'])
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
         
-        # Convert datetime objects to strings for JSON serialization
-        for egreso in egresos:
-            if egreso['created_at']:
-                egreso['created_at'] = egreso['created_at'].isoformat()
-            if egreso['fecha']:
-                egreso['fecha'] = egreso['fecha'].strftime('%Y-%m-%d')
+        # Expenses are filtered by their business date, not by insertion time
+        egresos, next_cursor = fetch_list(cursor, 'egresos', date_column='fecha')
         
         cursor.close()
         conn.close()
         
-        return jsonify(egresos)
+        return add_validators(list_response(egresos, next_cursor), etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -724,12 +1448,7 @@ def add_egreso():
     try:
         data = request.get_json()
         
-        descripcion = data.get('descripcion')
-        monto = data.get('monto')
-        fecha = data.get('fecha', datetime.now().strftime('%Y-%m-%d'))
-        
-        if not descripcion or not monto:
-            return jsonify({'error': 'Descripción y monto son requeridos'}), 400
+        egreso = validate_egreso(data)
         
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -737,26 +1456,328 @@ def add_egreso():
         cursor.execute("""
             INSERT INTO egresos (fecha, descripcion, monto)
             VALUES (%s, %s, %s)
-        """, (fecha, descripcion, monto))
+            RETURNING id
+        """, (egreso['fecha'], egreso['descripcion'], egreso['monto']))
+        egreso_id = cursor.fetchone()[0]
         
         conn.commit()
         cursor.close()
         conn.close()
         
-        return jsonify({'message': 'Egreso agregado exitosamente'}), 201
+        return jsonify({'id': egreso_id, 'message': 'Egreso agregado exitosamente'}), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Incremental sync: rows changed since a cursor, read from the cambios log
+# (migrations/0004_cambios.sql). The cursor holds the xmin of the snapshot
+# the previous call read, so no committed change is skipped; a change seen
+# twice is merged twice with the same result.
+SYNC_TABLES = ('clientes', 'ventas', 'usuarios_diarios', 'egresos')
+SYNC_CURSOR_MAX_HOURS = int(os.environ.get('SYNC_CURSOR_MAX_HOURS', 24))
+# More changed rows than this in one table: the client reloads it instead
+SYNC_MAX_ROWS = int(os.environ.get('SYNC_MAX_ROWS', 1000))
+
+SYNC_CHANGES_SQL = """
+    SELECT tabla,
+           array_agg(DISTINCT registro_id) FILTER (WHERE registro_id IS NOT NULL) AS ids,
+           bool_or(operacion = 'T') AS recargar
+    FROM cambios
+    WHERE txid >= %s::xid8
+    GROUP BY tabla
+"""
+
+@app.route('/api/sync', methods=['GET'])
+def sync_changes():
+    try:
+        since = request.args.get('since')
+        issued_at, since_xmin = decode_cursor(since) if since else (None, None)
+        now = datetime.now()
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        # Taken before reading the log: every transaction below it has committed
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS xmin")
+        result = {'cursor': encode_cursor(now, cursor.fetchone()['xmin']), 'cambios': {}}
+        
+        if issued_at is None or issued_at < now - timedelta(hours=SYNC_CURSOR_MAX_HOURS):
+            # No cursor, or older than the log keeps: start from a full load
+            result['cambios'] = {table: {'filas': [], 'borrados': [], 'recargar': True} for table in SYNC_TABLES}
+            cursor.close()
+            conn.close()
+            return jsonify(result)
+        
+        cursor.execute(SYNC_CHANGES_SQL, (str(since_xmin),))
+        changed = cursor.fetchall()
+        
+        today = now.date()
+        rows_cursor = conn.cursor()
+        for change in changed:
+            table, ids = change['tabla'], change['ids'] or []
+            if change['recargar'] or len(ids) > SYNC_MAX_ROWS:
+                result['cambios'][table] = {'filas': [], 'borrados': [], 'recargar': True}
+                continue
+            # Current version of each row; the ones not found were deleted
+            rows_cursor.execute(f"SELECT * FROM {table} WHERE id = ANY(%s) ORDER BY created_at DESC, id DESC",
+                                (ids,))
+            rows = serialization.fetch_dicts(rows_cursor)
+            if table == 'clientes':
+                for cliente in rows:
+                    if cliente['fecha_fin_mensualidad']:
+                        cliente['estado_mensualidad'] = member_status(cliente['fecha_fin_mensualidad'], today)
+            found = {row['id'] for row in rows}
+            result['cambios'][table] = {
+                'filas': rows,
+                'borrados': sorted(set(ids) - found),
+                'recargar': False,
+            }
+        
+        rows_cursor.close()
+        cursor.close()
+        conn.close()
+        
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Live updates: one LISTEN connection and one thread per worker fan the
+# write notifications out to every open stream (see events.py). In
+# production they are served by events_server.py, not by these workers.
+@app.route('/api/events', methods=['GET'])
+def events_stream():
+    if not events.EVENTS_IN_PROCESS:
+        return jsonify({'error': 'Los eventos se sirven en el servicio de eventos'}), 404
+    hub = events.get_hub()
+    if hub.is_full():
+        return jsonify({'error': 'Demasiadas conexiones de eventos, intente más tarde'}), 503
+    # Kept by the hub to close the stream once the session is revoked
+    return events.EventStream(hub, auth.request_token())
+
+
+# Streaming exports for accounting (CSV / NDJSON)
+@app.route('/api/export/<table>', methods=['GET'])
+def export_table(table):
+    try:
+        table = table.replace('-', '_')
+        if table not in exports.EXPORT_TABLES:
+            return jsonify({'error': 'Tabla no exportable'}), 404
+        
+        fmt = request.args.get('formato', 'csv')
+        if fmt not in exports.EXPORT_FORMATS:
+            return jsonify({'error': 'Formato no soportado, use csv o ndjson'}), 400
+        
+        desde = parse_date_arg('desde')
+        hasta = parse_date_arg('hasta')
+        
+        conn = get_db_connection()
+        rows = exports.stream_export(conn, table, LIST_COLUMNS[table], fmt, desde, hasta)
+        
+        response = Response(stream_with_context(rows), mimetype=exports.EXPORT_FORMATS[fmt])
+        filename = f"{table}_{datetime.now().strftime('%Y-%m-%d')}.{fmt}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# PDF receipts and monthly reports, rendered on a process pool (see reports.py)
+REPORTE_MAX_MESES = 24
+
+def document_response(report_id, estado):
+    """202 while the PDF is rendered, 200 with its URL once it exists"""
+    response = jsonify({'id': report_id, 'estado': estado, 'url': f'/api/reportes/{report_id}'})
+    if estado == 'pendiente':
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/api/pagos/<int:pago_id>/recibo', methods=['GET'])
+def get_recibo(pago_id):
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        pago = reports.receipt_data(cursor, pago_id)
+        cursor.close()
+        conn.close()
+        
+        if pago is None:
+            return jsonify({'error': 'Pago no encontrado'}), 404
+        return document_response(*reports.request_document('recibo', f'recibo-{pago_id}', pago))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reportes/mensual', methods=['GET'])
+def get_reporte_mensual():
+    try:
+        today = datetime.now().date()
+        hasta = parse_date_arg('hasta') or today
+        try:
+            meses = int(request.args.get('meses', 12))
+        except ValueError:
+            raise ValueError('meses debe ser un número')
+        if not 1 <= meses <= REPORTE_MAX_MESES:
+            raise ValueError(f'meses debe estar entre 1 y {REPORTE_MAX_MESES}')
+        desde = stats.month_start(hasta)
+        for _ in range(meses - 1):
+            desde = stats.month_start(desde - timedelta(days=1))
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        data = reports.monthly_data(cursor, desde, hasta, today)
+        cursor.close()
+        conn.close()
+        
+        name = f"reporte-{desde.strftime('%Y-%m')}-{hasta.strftime('%Y-%m')}"
+        return document_response(*reports.request_document('reporte', name, data))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reportes/<report_id>', methods=['GET'])
+def get_reporte(report_id):
+    if not reports.REPORT_ID.match(report_id):
+        return jsonify({'error': 'Reporte no encontrado'}), 404
+    estado, value = reports.status(report_id)
+    if estado == 'listo':
+        return send_file(value, mimetype='application/pdf', download_name=reports.download_name(report_id),
+                         as_attachment=request.args.get('descargar') == '1', max_age=3600)
+    if estado == 'pendiente':
+        return document_response(report_id, estado)
+    if estado == 'error':
+        return jsonify({'id': report_id, 'estado': estado, 'error': value}), 500
+    # Unknown, or pruned from the cache: request the document again
+    return jsonify({'error': 'Reporte no encontrado'}), 404
+
+# Background jobs: housekeeping that used to run inside requests (see jobs.py)
+@jobs.handler('estado-miembros')
+def member_status_job(payload):
+    update_member_status()
+
+@jobs.handler('estadisticas-rollup')
+def statistics_rollup_job(payload):
+    """Rebuild yesterday's and today's rows from the base tables"""
+    today = datetime.now().date()
+    stats.rollup(today - timedelta(days=payload.get('dias', 1)), today)
+
+@jobs.handler('lista-renovacion')
+def renewal_list_job(payload):
+    conn = get_db_connection()
+    try:
+        build_renewal_list(conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor), datetime.now().date())
+    finally:
+        conn.close()
+
+def render_document(kind, name, data):
+    """Render through the PDF pool and wait for it (job threads only)"""
+    report_id, _ = reports.request_document(kind, name, data)
+    estado, value = reports.wait(report_id)
+    if estado == 'error':
+        raise RuntimeError(value)
+    if estado != 'listo':
+        raise RuntimeError(f'El documento {report_id} no se generó a tiempo')
+
+@jobs.handler('recibo')
+def receipt_job(payload):
+    conn = get_db_connection()
+    try:
+        pago = reports.receipt_data(conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor), payload['pago_id'])
+        conn.rollback()
+    finally:
+        conn.close()
+    if pago is None:
+        raise jobs.JobError('Pago no encontrado')
+    render_document('recibo', f"recibo-{payload['pago_id']}", pago)
+
+@jobs.handler('reporte-mensual')
+def monthly_report_job(payload):
+    """Pre-render the report of the last 12 months, as requested by default"""
+    today = datetime.now().date()
+    desde = stats.month_start(today)
+    for _ in range(11):
+        desde = stats.month_start(desde - timedelta(days=1))
+    conn = get_db_connection()
+    try:
+        data = reports.monthly_data(conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor), desde, today, today)
+        conn.rollback()
+    finally:
+        conn.close()
+    render_document('reporte', f"reporte-{desde.strftime('%Y-%m')}-{today.strftime('%Y-%m')}", data)
+
+@jobs.handler('particiones')
+def partitions_job(payload):
+    partitions.maintain(payload.get('meses', partitions.PARTITIONS_MONTHS_AHEAD))
+
+@jobs.handler('cambios-limpieza')
+def sync_log_cleanup_job(payload):
+    """Trim the sync log; twice the cursor lifetime, so a transaction that ran
+    for a while before a cursor was issued still finds its rows"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM cambios WHERE created_at < now() - make_interval(hours => %s)",
+                       (2 * SYNC_CURSOR_MAX_HOURS,))
+        conn.commit()
+    finally:
+        conn.close()
+
+# Run just after the day boundary, in this order
+jobs.schedule('estado-miembros', '0 0 * * *')
+jobs.schedule('lista-renovacion', '5 0 * * *')
+jobs.schedule('estadisticas-rollup', '15 0 * * *')
+jobs.schedule('reporte-mensual', '30 0 1 * *')
+jobs.schedule('particiones', '0 1 * * *')
+jobs.schedule('cambios-limpieza', '30 1 * * *')
+
+# Bulk CSV import (COPY into a staging table, merged in one transaction)
+IMPORT_VALIDATORS = {
+    'clientes': validate_cliente,
+    'ventas': validate_venta,
+    'egresos': validate_egreso,
+}
+IMPORT_MAX_REJECTED = 1000
+
+@app.route('/api/import/<table>', methods=['POST'])
+def import_table(table):
+    try:
+        if table not in IMPORT_VALIDATORS:
+            return jsonify({'error': 'Tabla no importable'}), 404
+        
+        # Multipart upload (campo "archivo") or the CSV as the raw body
+        upload = request.files.get('archivo')
+        source = upload.read() if upload else request.get_data()
+        if not source:
+            return jsonify({'error': 'Archivo CSV requerido'}), 400
+        
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'si')
+        
+        conn = get_db_connection()
+        report = importer.import_rows(conn, table, importer.read_csv(source),
+                                      IMPORT_VALIDATORS[table], dry_run)
+        conn.close()
+        
+        report['total_rechazados'] = len(report['rechazados'])
+        report['rechazados'] = report['rechazados'][:IMPORT_MAX_REJECTED]
+        return jsonify(report)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'El archivo debe estar codificado en UTF-8'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # Test endpoint to check environment variables
 @app.route('/api/test-db')
+@auth.role_required('admin')
 def test_db():
     try:
-        # Print environment variables for debugging
+        # Connection settings for debugging (never the password)
         db_config = {
             'host': os.environ.get('DB_HOST', 'NOT_SET'),
             'user': os.environ.get('DB_USER', 'NOT_SET'),
-            'password': os.environ.get('DB_PASSWORD', 'NOT_SET'),
             'dbname': os.environ.get('DB_NAME', 'NOT_SET'),
             'port': os.environ.get('DB_PORT', 'NOT_SET')
         }
@@ -782,12 +1803,41 @@ def test_db():
             'db_config': {
                 'host': os.environ.get('DB_HOST', 'NOT_SET'),
                 'user': os.environ.get('DB_USER', 'NOT_SET'),
-                'password': os.environ.get('DB_PASSWORD', 'NOT_SET'),
-                'dbname': os.environ.get('DB_NAME', 'NOT_SET'),
+                    'dbname': os.environ.get('DB_NAME', 'NOT_SET'),
                 'port': os.environ.get('DB_PORT', 'NOT_SET')
             }
         }), 500
 
+# Connection pool statistics for this worker
+@app.route('/api/db/pool')
+@auth.role_required('admin')
+def get_pool_stats():
+    return jsonify(db.pool_stats())
+
+# Prometheus metrics, summed over every worker process
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+# Recent slow queries of every worker, with their EXPLAIN plans
+@app.route('/api/admin/consultas-lentas')
+@auth.role_required('admin')
+def get_consultas_lentas():
+    try:
+        limit = int(request.args.get('limit', slow_queries.SLOW_QUERY_BUFFER))
+    except ValueError:
+        return jsonify({'error': 'limit debe ser un número'}), 400
+    return jsonify(slow_queries.collect(max(1, limit)))
+
+# Background job queue: counts per type and state, failures and schedules
+@app.route('/api/admin/trabajos')
+@auth.role_required('admin')
+def get_trabajos():
+    try:
+        return jsonify(jobs.queue_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Login API
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -805,13 +1855,19 @@ def login():
         cursor.execute("SELECT * FROM usuarios WHERE usuario = %s AND activo = true", (username,))
         user = cursor.fetchone()
         
-        cursor.close()
-        conn.close()
-        
-        if user and user['password'] == password:
+        if user and auth.check_password(user['password'], password):
+            # Plaintext (or outdated) hashes are replaced on the first good login
+            if auth.needs_rehash(user['password']):
+                cursor.execute("UPDATE usuarios SET password = %s WHERE id = %s",
+                               (auth.hash_password(password), user['id']))
+                conn.commit()
+            cursor.close()
+            conn.close()
             return jsonify({
                 'success': True,
                 'message': 'Login exitoso',
+                'token': auth.issue_token(user),
+                'expira_en': int(auth.AUTH_TOKEN_HOURS * 3600),
                 'user': {
                     'id': user['id'],
                     'nombre': user['nombre'],
@@ -820,34 +1876,59 @@ def login():
                 }
             })
         else:
+            if not user:
+                # Same work as a wrong password, so unknown users are not revealed by timing
+                auth.check_password(None, password)
+            cursor.close()
+            conn.close()
             return jsonify({'success': False, 'message': 'Credenciales incorrectas'}), 401
             
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Logout: every token of the user issued so far stops working
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        auth.revoke_sessions(cursor, g.user['id'])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return jsonify({'message': 'Sesión cerrada'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Usuarios/Socios APIs
 @app.route('/api/usuarios', methods=['GET'])
+@auth.role_required('admin')
 def get_usuarios():
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        cursor.execute("SELECT id, nombre, usuario, rol, activo, created_at FROM usuarios ORDER BY created_at DESC")
-        usuarios = cursor.fetchall()
+        etag, last_modified = resource_validators(cursor, ['usuarios'])
+        if is_not_modified(etag, last_modified):
+            cursor.close()
+            conn.close()
+            return not_modified_response(etag, last_modified)
         
-        # Convert datetime objects to strings
-        for usuario in usuarios:
-            if usuario['created_at']:
-                usuario['created_at'] = usuario['created_at'].isoformat()
+        # Never select the password column
+        usuarios, next_cursor = fetch_list(cursor, 'usuarios',
+                                           default_select=', '.join(LIST_COLUMNS['usuarios']))
         
         cursor.close()
         conn.close()
         
-        return jsonify(usuarios)
+        return add_validators(list_response(usuarios, next_cursor), etag, last_modified)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/usuarios', methods=['POST'])
+@auth.role_required('admin')
 def add_usuario():
     try:
         data = request.get_json()
@@ -866,22 +1947,27 @@ def add_usuario():
         # Verificar si el usuario ya existe
         cursor.execute("SELECT id FROM usuarios WHERE usuario = %s", (usuario,))
         if cursor.fetchone():
+            cursor.close()
+            conn.close()
             return jsonify({'error': 'El usuario ya existe'}), 400
         
         cursor.execute("""
             INSERT INTO usuarios (nombre, usuario, password, rol)
             VALUES (%s, %s, %s, %s)
-        """, (nombre, usuario, password, rol))
+            RETURNING id
+        """, (nombre, usuario, auth.hash_password(password), rol))
+        usuario_id = cursor.fetchone()[0]
         
         conn.commit()
         cursor.close()
         conn.close()
         
-        return jsonify({'message': 'Usuario agregado exitosamente'}), 201
+        return jsonify({'id': usuario_id, 'message': 'Usuario agregado exitosamente'}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/usuarios/<int:usuario_id>', methods=['PUT'])
+@auth.role_required('admin')
 def update_usuario(usuario_id):
     try:
         data = request.get_json()
@@ -898,6 +1984,8 @@ def update_usuario(usuario_id):
         # Verificar si el usuario existe
         cursor.execute("SELECT id FROM usuarios WHERE id = %s", (usuario_id,))
         if not cursor.fetchone():
+            cursor.close()
+            conn.close()
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
         # Construir query de actualización
@@ -911,8 +1999,10 @@ def update_usuario(usuario_id):
             update_fields.append("usuario = %s")
             values.append(usuario)
         if password is not None:
+            # A new password also ends the user's open sessions
             update_fields.append("password = %s")
-            values.append(password)
+            values.append(auth.hash_password(password))
+            update_fields.append(auth.REVOKE_SESSIONS_SQL)
         if rol is not None:
             update_fields.append("rol = %s")
             values.append(rol)
@@ -928,6 +2018,8 @@ def update_usuario(usuario_id):
             cursor.execute(query, values)
             
             conn.commit()
+            # rol / activo / sessions are re-read on the user's next request
+            auth.forget_user(usuario_id)
         
         cursor.close()
         conn.close()
@@ -937,6 +2029,7 @@ def update_usuario(usuario_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/usuarios/<int:usuario_id>', methods=['DELETE'])
+@auth.role_required('admin')
 def delete_usuario(usuario_id):
     try:
         conn = get_db_connection()
@@ -945,6 +2038,8 @@ def delete_usuario(usuario_id):
         # Verificar si el usuario existe
         cursor.execute("SELECT id FROM usuarios WHERE id = %s", (usuario_id,))
         if not cursor.fetchone():
+            cursor.close()
+            conn.close()
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
         # Eliminar usuario (o marcar como inactivo)
@@ -953,23 +2048,30 @@ def delete_usuario(usuario_id):
         conn.commit()
         cursor.close()
         conn.close()
+        auth.forget_user(usuario_id)
         
         return jsonify({'message': 'Usuario eliminado exitosamente'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Frontend routes
+# Static files: pages and unhashed names are revalidated, fingerprinted files
+# under /assets/ are immutable (see assets.py build)
 @app.route('/')
 def serve_index():
-    return send_from_directory('.', 'login.html')
+    return assets.send_page('login.html')
 
 @app.route('/dashboard')
 def serve_dashboard():
-    return send_from_directory('.', 'index.html')
+    return assets.send_page('index.html')
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    return assets.send_built_asset(filename)
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('.', filename)
+    return assets.send_public_file(filename)
 
 
 if __name__ == '__main__':
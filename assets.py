@@ -0,0 +1,203 @@
+"""Static assets: fingerprinted build with precompressed and resized variants.
+
+    python assets.py build
+
+Writes dist/ with content-hashed copies of app.js, style.css and active.jpg,
+their gzip (and brotli, when the module is installed) variants, WebP/JPEG
+sizes of active.jpg and the HTML pages rewritten to the hashed names.
+dist/manifest.json maps source names to built ones. Without a build the app
+serves the source files, revalidated on every request.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from flask import abort, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: image variants are skipped
+    Image = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(BASE_DIR, 'dist')
+MANIFEST_FILE = 'manifest.json'
+ASSET_PREFIX = '/assets/'
+
+# The only repository files the browser may request
+PAGES = ('login.html', 'index.html')
+FINGERPRINTED = ('app.js', 'style.css', 'active.jpg')
+PUBLIC_FILES = PAGES + FINGERPRINTED
+
+COMPRESSIBLE = ('.html', '.js', '.css', '.json', '.svg')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMAGE_WIDTHS = (480, 960, 1600)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def write_variants(name, data):
+    """Write a built file plus its compressed variants (kept only if smaller)"""
+    with open(os.path.join(DIST_DIR, name), 'wb') as f:
+        f.write(data)
+    if not name.endswith(COMPRESSIBLE):
+        return
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(os.path.join(DIST_DIR, name + suffix), 'wb') as f:
+                f.write(compressed)
+
+
+def build_images(name, data):
+    """Resized WebP and progressive JPEG copies, never upscaled"""
+    if Image is None:
+        print(f"⚠️  Pillow no está instalado, se omiten las variantes de {name}")
+        return []
+    stem = os.path.splitext(name)[0]
+    original = Image.open(io.BytesIO(data))
+    original.load()
+    widths = sorted({w for w in IMAGE_WIDTHS if w < original.width} | {original.width})
+
+    variants = []
+    for width in widths:
+        height = round(original.height * width / original.width)
+        image = original.convert('RGB').resize((width, height), Image.LANCZOS)
+        entry = {'width': width, 'height': height}
+        for fmt, ext, options in (('WEBP', '.webp', {'quality': 80, 'method': 6}),
+                                  ('JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True})):
+            buffer = io.BytesIO()
+            image.save(buffer, fmt, **options)
+            built = fingerprint(f"{stem}-{width}{ext}", buffer.getvalue())
+            write_variants(built, buffer.getvalue())
+            entry[ext.lstrip('.')] = ASSET_PREFIX + built
+        variants.append(entry)
+    return variants
+
+
+def build():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {'assets': {}, 'images': {}}
+    for name in FINGERPRINTED:
+        with open(os.path.join(BASE_DIR, name), 'rb') as f:
+            data = f.read()
+        built = fingerprint(name, data)
+        write_variants(built, data)
+        manifest['assets'][name] = ASSET_PREFIX + built
+        if mimetypes.guess_type(name)[0].startswith('image/'):
+            manifest['images'][name] = build_images(name, data)
+
+    # Pages keep their URLs (revalidated) and point at the hashed files
+    pattern = re.compile(r'(src|href)="(%s)"' % '|'.join(re.escape(n) for n in FINGERPRINTED))
+    for page in PAGES:
+        with open(os.path.join(BASE_DIR, page), encoding='utf-8') as f:
+            html = f.read()
+        html = pattern.sub(lambda m: f'{m.group(1)}="{manifest["assets"][m.group(2)]}"', html)
+        write_variants(page, html.encode('utf-8'))
+
+    with open(os.path.join(DIST_DIR, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+_manifest = None
+
+
+def load_manifest():
+    """Built manifest, or None when assets.py build has not been run"""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(DIST_DIR, MANIFEST_FILE), encoding='utf-8') as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            _manifest = {}
+    return _manifest or None
+
+
+def send_asset(directory, filename, cache_control=REVALIDATE):
+    """send_from_directory with encoding negotiation over the precompressed files.
+
+    Conditional requests (ETag / If-Modified-Since) are answered by Flask.
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def send_page(name):
+    """An HTML page, from the build when there is one"""
+    directory = DIST_DIR if load_manifest() else BASE_DIR
+    return send_asset(directory, name)
+
+
+def send_public_file(name):
+    """Unhashed URL of a public file; anything else in the repository is a 404"""
+    if name not in PUBLIC_FILES:
+        abort(404)
+    if name in PAGES:
+        return send_page(name)
+    manifest = load_manifest()
+    if manifest:
+        # Same bytes as the hashed copy, with its compressed variants
+        return send_asset(DIST_DIR, manifest['assets'][name][len(ASSET_PREFIX):])
+    return send_asset(BASE_DIR, name)
+
+
+def send_built_asset(name):
+    """A fingerprinted file from dist/; its name changes with its content"""
+    if not load_manifest() or name == MANIFEST_FILE or name in PAGES:
+        abort(404)
+    return send_asset(DIST_DIR, name, IMMUTABLE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recursos estáticos de ActiveGym')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='Generar dist/ con nombres con hash y variantes comprimidas')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        manifest = build()
+        files = len(os.listdir(DIST_DIR))
+        print(f"✅ {len(manifest['assets'])} recursos, {files} archivos en {DIST_DIR}")
+        if brotli is None:
+            print("⚠️  brotli no está instalado, solo se generaron variantes gzip")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
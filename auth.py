@@ -0,0 +1,311 @@
+"""Login passwords and signed session tokens.
+
+Passwords are stored as salted scrypt hashes (werkzeug.security); rows
+still holding a plaintext password are accepted once and rehashed on that
+login, or all at once with:
+
+    python auth.py hash-passwords
+
+A successful login returns a token signed with SECRET_KEY (itsdangerous;
+a random key kept in SECRET_KEY_FILE when it is unset) that carries the
+user's id, rol and sesiones_version and expires after AUTH_TOKEN_HOURS.
+Every /api/* request except the login sends it as "Authorization: Bearer
+<token>" (or ?token= on the event stream, see events.py) and is checked
+in memory: verified tokens and the state of their users (rol, activo,
+sesiones_version) are kept in small LRU caches, and a user's row is read
+again at most every AUTH_USER_CACHE_SECONDS. Logout or a password change
+bumps sesiones_version, which revokes every token issued before it; other
+workers see role changes, deactivations and revocations within that
+interval.
+"""
+import argparse
+import functools
+import hmac
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2.extras
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import db
+
+
+AUTH_TOKEN_HOURS = float(os.environ.get('AUTH_TOKEN_HOURS', 12))
+# Where the signing key is kept when SECRET_KEY is not set
+SECRET_KEY_FILE = os.environ.get('SECRET_KEY_FILE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.secret_key')
+# Seconds a user's rol/activo/sesiones_version is trusted before reading the row again
+AUTH_USER_CACHE_SECONDS = float(os.environ.get('AUTH_USER_CACHE_SECONDS', 30))
+
+HASH_METHOD = 'scrypt'
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+TOKEN_SALT = 'activegym-sesion'
+
+# Endpoints under /api/ that answer without a token
+PUBLIC_ENDPOINTS = {'login'}
+# EventSource cannot send headers: these also take the token as ?token=
+QUERY_TOKEN_ENDPOINTS = {'events_stream'}
+
+# SET clause that ends every session of a user
+REVOKE_SESSIONS_SQL = "sesiones_version = sesiones_version + 1, sesiones_desde = now()"
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Thread-safe dict that forgets its least recently used keys"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_tokens = LRUCache(1024)
+_users = LRUCache(256)
+
+
+def secret_key():
+    """SECRET_KEY, or a random key generated once and kept in SECRET_KEY_FILE.
+
+    Every worker on the host reads the same file, so tokens stay valid across
+    workers and restarts. Instances that do not share a disk need SECRET_KEY.
+    """
+    key = os.environ.get('SECRET_KEY')
+    if key:
+        return key
+    try:
+        with open(SECRET_KEY_FILE, encoding='utf-8') as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        key = create_key_file()
+    if not key:
+        raise RuntimeError(f'{SECRET_KEY_FILE} está vacío; bórrelo o defina SECRET_KEY')
+    return key
+
+
+def create_key_file():
+    """Write a random key readable only by this user; the first worker wins"""
+    tmp = f'{SECRET_KEY_FILE}.{os.getpid()}.tmp'
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(secrets.token_hex(32))
+    try:
+        # Fails if another worker created it first; then its key is used
+        os.link(tmp, SECRET_KEY_FILE)
+        print(f"⚠️  SECRET_KEY no está definida: clave de sesión nueva en {SECRET_KEY_FILE}")
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp)
+    with open(SECRET_KEY_FILE, encoding='utf-8') as f:
+        return f.read().strip()
+
+
+@functools.lru_cache(maxsize=1)
+def serializer():
+    return URLSafeTimedSerializer(secret_key(), salt=TOKEN_SALT)
+
+
+# Passwords
+
+def hash_password(password):
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES)
+
+
+# Checked against when the user does not exist, so both cases take as long
+_DUMMY_HASH = None
+
+
+def check_password(stored, password):
+    """Compare against a hash, or a legacy plaintext value in constant time"""
+    global _DUMMY_HASH
+    if stored is None:
+        if _DUMMY_HASH is None:
+            _DUMMY_HASH = hash_password('')
+        check_password_hash(_DUMMY_HASH, password)
+        return False
+    if is_hashed(stored):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+
+
+def needs_rehash(stored):
+    return not stored.startswith(HASH_METHOD + ':')
+
+
+# Tokens
+
+def issue_token(user):
+    return serializer().dumps({'id': user['id'], 'rol': user['rol'], 'v': user['sesiones_version']})
+
+
+def load_user(user_id):
+    """(rol, activo, sesiones_version) from the cache or one query"""
+    cached = _users.get(user_id)
+    now = time.monotonic()
+    if cached is not None and now - cached[3] < AUTH_USER_CACHE_SECONDS:
+        return cached
+    conn = db.get_db_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT rol, activo, sesiones_version FROM usuarios WHERE id = %s
+    """, (user_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    entry = (row['rol'], row['activo'], row['sesiones_version'], now) if row else (None, False, None, now)
+    _users.set(user_id, entry)
+    return entry
+
+
+def authenticate(token):
+    """{'id', 'rol'} of a valid token's user, or AuthError"""
+    verified = _tokens.get(token)
+    if verified is None:
+        try:
+            payload, issued = serializer().loads(token, max_age=AUTH_TOKEN_HOURS * 3600, return_timestamp=True)
+        except SignatureExpired:
+            raise AuthError('La sesión expiró, inicie sesión nuevamente')
+        except BadSignature:
+            raise AuthError('Token inválido')
+        # Tokens issued before sesiones_version existed count as version 0
+        verified = (payload['id'], issued.timestamp(), payload.get('v', 0))
+        _tokens.set(token, verified)
+    user_id, issued, version = verified
+    if time.time() - issued > AUTH_TOKEN_HOURS * 3600:
+        _tokens.pop(token)
+        raise AuthError('La sesión expiró, inicie sesión nuevamente')
+
+    rol, activo, sesiones_version, _ = load_user(user_id)
+    if not activo or version != sesiones_version:
+        _tokens.pop(token)
+        raise AuthError('La sesión ya no es válida, inicie sesión nuevamente')
+    # The current rol, not the one the token was issued with
+    return {'id': user_id, 'rol': rol}
+
+
+def revoke_sessions(cursor, user_id):
+    """Invalidate every token of the user issued up to now (caller commits)"""
+    cursor.execute(f"UPDATE usuarios SET {REVOKE_SESSIONS_SQL} WHERE id = %s", (user_id,))
+    forget_user(user_id)
+
+
+def forget_user(user_id):
+    """Re-read the user's row on its next request in this worker"""
+    _users.pop(user_id)
+
+
+# Flask integration
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else ''
+
+
+def request_token():
+    """The Bearer token, or ?token= on the endpoints that accept it"""
+    token = bearer_token()
+    if not token and request.endpoint in QUERY_TOKEN_ENDPOINTS:
+        token = request.args.get('token', '').strip()
+    return token
+
+
+def check_request():
+    """before_request: every /api/* route but the public ones needs a token"""
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+    if request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    token = request_token()
+    if not token:
+        return jsonify({'error': 'Autenticación requerida'}), 401
+    try:
+        g.user = authenticate(token)
+    except AuthError as e:
+        return jsonify({'error': str(e)}), e.status
+    return None
+
+
+def role_required(*roles):
+    """Restrict a view to users whose current rol is one of roles"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user = g.get('user')
+            if user is None or user['rol'] not in roles:
+                return jsonify({'error': 'No tiene permisos para esta acción'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    app.before_request(check_request)
+
+
+def hash_plaintext_passwords():
+    """Replace every remaining plaintext password with its hash"""
+    conn = db.connect_direct()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, password FROM usuarios FOR UPDATE")
+        rows = [(hash_password(password), user_id) for user_id, password in cursor.fetchall()
+                if not is_hashed(password)]
+        cursor.executemany("UPDATE usuarios SET password = %s WHERE id = %s", rows)
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Autenticación de ActiveGym')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('hash-passwords', help='Guardar con hash las contraseñas en texto plano')
+    args = parser.parse_args(argv)
+
+    if args.command == 'hash-passwords':
+        print(f"✅ {hash_plaintext_passwords()} contraseñas migradas a {HASH_METHOD}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Dashboard statistics: legacy per-figure queries vs the rollup lookup.
+
+Seeds large synthetic tables (optional) and times both versions:
+
+    python -m benchmarks.bench_estadisticas --seed 1000000 --iterations 50
+
+Seeding writes into the database configured through the DB_* variables;
+only point it at a local throwaway database.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import db
+import partitions
+from app import DASHBOARD_SQL, app
+from benchmarks.bench_pool import percentile
+
+
+SEED_SQL = [
+    """
+    INSERT INTO clientes (nombre, apellido, telefono, fecha_inicio, fecha_fin_mensualidad,
+                          estado_mensualidad, precio_mensualidad, duracion, created_at)
+    SELECT 'Cliente ' || g, 'Bench', '09' || g, d::date, d::date + 30, 'ACTIVO', 30, 30, d
+    FROM generate_series(1, %(clientes)s) g,
+         LATERAL (SELECT now() - (g %% 1825) * interval '1 day' AS d) t
+    """,
+    """
+    INSERT INTO ventas (producto, cantidad, precio_unitario, total, created_at)
+    SELECT 'Producto ' || (g %% 40), 1 + g %% 3, 2.50, 2.50 * (1 + g %% 3),
+           now() - (g %% 1825) * interval '1 day' - (g %% 86400) * interval '1 second'
+    FROM generate_series(1, %(rows)s) g
+    """,
+    """
+    INSERT INTO usuarios_diarios (cantidad_clientes, precio_por_cliente, total, created_at)
+    SELECT 1 + g %% 4, 2.00, 2.00 * (1 + g %% 4),
+           now() - (g %% 1825) * interval '1 day' - (g %% 86400) * interval '1 second'
+    FROM generate_series(1, %(rows)s) g
+    """,
+    """
+    INSERT INTO egresos (fecha, descripcion, monto)
+    SELECT current_date - (g %% 1825), 'Egreso ' || g, 5 + g %% 50
+    FROM generate_series(1, %(rows)s / 10) g
+    """,
+]
+
+# The queries get_estadisticas() used to run, one round trip each
+LEGACY_QUERIES = [
+    "SELECT * FROM estadisticas_diarias WHERE fecha = %(today)s",
+    "SELECT COUNT(*) as total FROM clientes",
+    "SELECT COUNT(*) as total FROM clientes WHERE estado_mensualidad = 'VENCIDO'",
+    "SELECT COUNT(*) as total FROM clientes WHERE DATE(created_at) = %(today)s",
+    "SELECT COALESCE(SUM(cantidad_clientes), 0) as total FROM usuarios_diarios WHERE DATE(created_at) = %(today)s",
+    "SELECT COUNT(*) as total FROM ventas WHERE DATE(created_at) = %(today)s",
+    "SELECT COALESCE(SUM(precio_mensualidad), 0) as total FROM clientes WHERE DATE(created_at) = %(today)s",
+    "SELECT COALESCE(SUM(total), 0) as total FROM usuarios_diarios WHERE DATE(created_at) = %(today)s",
+    "SELECT COALESCE(SUM(total), 0) as total FROM ventas WHERE DATE(created_at) = %(today)s",
+    "SELECT COALESCE(SUM(monto), 0) as total FROM egresos WHERE DATE(fecha) = %(today)s",
+]
+
+
+def seed(rows):
+    conn = db.connect_direct()
+    cursor = conn.cursor()
+    today = datetime.now().date()
+    partitions.ensure_range(cursor, today - timedelta(days=1825), today)
+    for query in SEED_SQL:
+        cursor.execute(query, {'rows': rows, 'clientes': max(1, rows // 20)})
+    cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def time_legacy(conn, iterations):
+    today = datetime.now().date()
+    cursor = conn.cursor()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for query in LEGACY_QUERIES:
+            cursor.execute(query, {'today': today})
+            cursor.fetchall()
+        conn.rollback()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def time_rollup(conn, iterations):
+    today = datetime.now().date()
+    cursor = conn.cursor()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        cursor.execute(DASHBOARD_SQL, {'today': today})
+        cursor.fetchall()
+        conn.commit()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def time_endpoint(iterations):
+    client = app.test_client()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get('/api/estadisticas')
+        assert response.status_code == 200, response.get_data(as_text=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<10} p50={percentile(samples, 50):8.2f}ms "
+          f"p95={percentile(samples, 95):8.2f}ms mean={statistics.mean(samples):8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=0, help='rows of ventas/usuarios_diarios to insert first')
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+
+    conn = db.connect_direct()
+    report('legacy', time_legacy(conn, args.iterations))
+    report('rollup', time_rollup(conn, args.iterations))
+    conn.close()
+    report('endpoint', time_endpoint(args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Fan-out of /api/events: many open streams, a few writes, delivery latency.
+
+Opens --clients event streams against a running server, creates --writes
+sales one by one and measures the time from each POST to every stream
+receiving its cambio event. It also times a plain GET while all the
+streams are open, to show the API workers are still free to answer
+requests. Run the API and the event service as in production:
+
+    EVENTS_IN_PROCESS=0 gunicorn -w 2 -k gthread --threads 32 -b 127.0.0.1:8000 wsgi:app
+    gunicorn -k gevent --worker-connections 1000 -w 1 -b 127.0.0.1:8001 events_server:app
+    python -m benchmarks.bench_eventos --url http://127.0.0.1:8000 --events-url http://127.0.0.1:8001 \
+        --clients 300 --writes 20
+
+Without --events-url the streams are opened on the API itself (the
+development mode, a thread per stream).
+
+The sales created are deleted at the end. Only point it at a local
+throwaway database.
+"""
+import argparse
+import json
+import os
+import random
+import selectors
+import socket
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from benchmarks.bench_pool import percentile
+from benchmarks.loadtest import Session, login, venta_body
+
+
+class Stream:
+    """One raw event-stream connection and the events parsed from it"""
+
+    def __init__(self, host, port, token):
+        self.sock = socket.create_connection((host, port))
+        self.sock.sendall((f"GET /api/events?token={quote(token)} HTTP/1.1\r\nHost: {host}\r\n"
+                           "Accept: text/event-stream\r\n\r\n").encode())
+        self.sock.setblocking(False)
+        self.buffer = b''
+        self.headers_done = False
+        self.status = None
+        self.events = []
+
+    def feed(self, data, now):
+        self.buffer += data
+        if not self.headers_done:
+            if b'\r\n\r\n' not in self.buffer:
+                return
+            head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+            self.status = int(head.split(b' ', 2)[1])
+            self.headers_done = True
+        while b'\n\n' in self.buffer:
+            block, self.buffer = self.buffer.split(b'\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.decode().split('\n') if ': ' in line)
+            if 'event' in fields:
+                self.events.append((now, fields['event'], json.loads(fields.get('data') or 'null')))
+
+
+def read_streams(streams, stop):
+    selector = selectors.DefaultSelector()
+    for stream in streams:
+        selector.register(stream.sock, selectors.EVENT_READ, stream)
+    while not stop.is_set():
+        for key, _ in selector.select(0.1):
+            try:
+                data = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                selector.unregister(key.fileobj)
+                continue
+            key.data.feed(data, time.perf_counter())
+
+
+def wait_for(predicate, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--events-url', help='servicio de eventos (por defecto --url)')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--writes', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5, help='segundos entre ventas')
+    parser.add_argument('--usuario', default=os.environ.get('LOADTEST_USUARIO', 'administradorprincipal'))
+    parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD'))
+    args = parser.parse_args()
+    if not args.password:
+        parser.error('se requiere --password o LOADTEST_PASSWORD de un usuario admin')
+
+    parts = urlsplit(args.events_url or args.url)
+    session = Session(args.url, {}, random.Random(7))
+    session.fixtures['token'] = login(session, args.usuario, args.password)
+
+    start = time.perf_counter()
+    streams = [Stream(parts.hostname, parts.port or 80, session.fixtures['token']) for _ in range(args.clients)]
+    stop = threading.Event()
+    reader = threading.Thread(target=read_streams, args=(streams, stop), daemon=True)
+    reader.start()
+    # Refused streams (503 past EVENTS_MAX_CLIENTS) are not waited for
+    connected = wait_for(lambda: all(s.status not in (None, 200) or any(e[1] == 'sincronizar' for e in s.events)
+                                     for s in streams), 30)
+    opened = sum(1 for s in streams if s.status == 200)
+    print(f"{opened}/{args.clients} streams abiertos en {time.perf_counter() - start:.2f}s"
+          + ('' if connected else ' (algunos sin evento sincronizar)'))
+
+    plain = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        session.request('GET', '/api/estadisticas')
+        plain.append((time.perf_counter() - t0) * 1000)
+    print(f"GET /api/estadisticas con los streams abiertos: p50={percentile(plain, 50):.2f}ms "
+          f"p95={percentile(plain, 95):.2f}ms")
+
+    sent = {}
+    for _ in range(args.writes):
+        t0 = time.perf_counter()
+        venta_id = session.create('/api/ventas', venta_body(session.rng))
+        sent[venta_id] = t0
+        time.sleep(args.interval)
+
+    def delivered():
+        return sum(1 for s in streams for _, event, data in s.events
+                   if event == 'cambio' and data['tabla'] == 'ventas' and data['operacion'] == 'I'
+                   and set(data['ids']) & set(sent))
+    wait_for(lambda: delivered() >= len(sent) * opened, 10)
+    stop.set()
+    reader.join()
+
+    latencies = []
+    for stream in streams:
+        for received, event, data in stream.events:
+            if event == 'cambio' and data['tabla'] == 'ventas' and data['operacion'] == 'I':
+                latencies.extend((received - sent[i]) * 1000 for i in data['ids'] if i in sent)
+    stats_events = [sum(1 for e in s.events if e[1] == 'estadisticas') for s in streams]
+    expected = len(sent) * opened
+    print(f"eventos cambio entregados: {len(latencies)}/{expected}")
+    if latencies:
+        print(f"POST -> evento: p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms "
+              f"max={max(latencies):.1f}ms mean={statistics.mean(latencies):.1f}ms")
+    print(f"eventos estadisticas por stream: {statistics.mean(stats_events):.1f} (de {len(sent)} ventas)")
+
+    for stream in streams:
+        stream.sock.close()
+    for venta_id in sent:
+        session.request('DELETE', f'/api/ventas/{venta_id}')
+    session.close()
+    return 0 if len(latencies) == expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Peak memory while streaming an export of a large ventas table.
+
+    LOADTEST_PASSWORD=... python -m benchmarks.bench_export --seed 1000000 --max-rss-mb 64
+
+Exits non-zero when resident memory grows by more than --max-rss-mb while
+the export streams, so it can be used as a regression check. test_exports.py
+runs it in a fresh process per format (the peak is a lifetime high-water
+mark) over a million seeded rows.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+import db
+from app import app
+
+
+SEED_SQL = """
+INSERT INTO ventas (producto, cantidad, precio_unitario, total, observaciones, created_at)
+SELECT 'Producto ' || (g %% 40), 1 + g %% 3, 2.50, 2.50 * (1 + g %% 3), 'Venta sintética ' || g,
+       %(hasta)s::timestamp - (g %% 1825) * interval '1 day'
+FROM generate_series(1, %(rows)s) g
+"""
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(rows, hasta=None):
+    """Insert rows synthetic ventas created over the five years before hasta (now)"""
+    conn = db.connect_direct()
+    cursor = conn.cursor()
+    cursor.execute(SEED_SQL, {'rows': rows, 'hasta': hasta or datetime.now()})
+    conn.commit()
+    conn.close()
+
+
+def login(client, username, password):
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['token']
+
+
+def run(fmt, token, desde=None, hasta=None):
+    client = app.test_client()
+    query = {'formato': fmt, 'desde': desde, 'hasta': hasta}
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    response = client.get('/api/export/ventas', query_string={k: v for k, v in query.items() if v},
+                          headers={'Authorization': f'Bearer {token}'}, buffered=False)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+    response.close()
+    elapsed = time.perf_counter() - start
+    growth = peak_rss_mb() - before
+    print(f"{fmt:<7} rows={lines:>9} size={size / 1e6:8.1f}MB time={elapsed:6.2f}s "
+          f"rate={lines / elapsed:9.0f} rows/s peak_rss_growth={growth:6.1f}MB")
+    return growth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=0, help='synthetic ventas rows to insert first')
+    parser.add_argument('--max-rss-mb', type=float, default=64)
+    parser.add_argument('--formato', choices=['csv', 'ndjson'], help='solo este formato (por defecto ambos)')
+    parser.add_argument('--desde', help='YYYY-MM-DD, sobre created_at')
+    parser.add_argument('--hasta', help='YYYY-MM-DD, sobre created_at')
+    parser.add_argument('--usuario', default=os.environ.get('LOADTEST_USUARIO', 'administradorprincipal'))
+    parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD'))
+    args = parser.parse_args()
+    if not args.password:
+        parser.error('se requiere --password o LOADTEST_PASSWORD de un usuario admin')
+
+    if args.seed:
+        seed(args.seed)
+
+    token = login(app.test_client(), args.usuario, args.password)
+    formats = [args.formato] if args.formato else ['csv', 'ndjson']
+    growth = max(run(fmt, token, args.desde, args.hasta) for fmt in formats)
+    if growth > args.max_rss_mb:
+        print(f"❌ peak RSS grew {growth:.1f}MB (limit {args.max_rss_mb}MB)")
+        return 1
+    print(f"✅ peak RSS growth within {args.max_rss_mb}MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Date-bounded queries on a plain ventas table vs one partitioned by month.
+
+Builds both copies of a synthetic multi-year dataset in a scratch schema
+(dropped at the end), times the statistics-style aggregates and the list
+pages on each, and prints how many partitions every query reads:
+
+    python -m benchmarks.bench_particiones --years 5 --rows 5000000 --iterations 20
+
+Only point it at a local throwaway database.
+"""
+import argparse
+import re
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import db
+from benchmarks.bench_pool import percentile
+from stats import month_start, next_month
+
+
+SCHEMA = 'bench_particiones'
+SCAN = re.compile(r'(?:Bitmap Index |Bitmap Heap |Index Only |Index |Seq )Scan (?:using \S+ )?on (\S+)')
+
+COLUMNS = """
+    id BIGINT NOT NULL, producto VARCHAR(100) NOT NULL, cantidad INTEGER NOT NULL,
+    total NUMERIC(10,2), fecha_venta DATE NOT NULL, created_at TIMESTAMP NOT NULL
+"""
+
+FILL_SQL = """
+    INSERT INTO {table}
+    SELECT g, 'Producto ' || (g %% 40), 1 + g %% 3, 2.50 * (1 + g %% 3), t::date, t
+    FROM generate_series(1, %(rows)s) g,
+         LATERAL (SELECT %(hasta)s::timestamp - (g::float8 / %(rows)s) * %(span)s * interval '1 second' AS t) x
+"""
+
+# name -> (query, parameters relative to the newest day)
+QUERIES = {
+    'dia': ("""SELECT COUNT(*), SUM(total) FROM {table}
+              WHERE created_at >= %(inicio)s AND created_at < %(fin)s""", 1),
+    'mes': ("""SELECT created_at::date, COUNT(*), SUM(total) FROM {table}
+              WHERE created_at >= %(inicio)s AND created_at < %(fin)s GROUP BY 1""", 30),
+    'trimestre': ("""SELECT created_at::date, COUNT(*), SUM(total) FROM {table}
+                    WHERE created_at >= %(inicio)s AND created_at < %(fin)s GROUP BY 1""", 91),
+    'anio': ("""SELECT date_trunc('month', created_at), COUNT(*), SUM(total) FROM {table}
+               WHERE created_at >= %(inicio)s AND created_at < %(fin)s GROUP BY 1""", 365),
+    'productos mes': ("""SELECT producto, SUM(cantidad) FROM {table}
+                        WHERE created_at >= %(inicio)s AND created_at < %(fin)s
+                        GROUP BY 1 ORDER BY 2 DESC LIMIT 10""", 30),
+    'pagina': ("""SELECT * FROM {table} ORDER BY created_at DESC, id DESC LIMIT 50""", None),
+    'pagina hace 2 anios': ("""SELECT * FROM {table} WHERE (created_at, id) < (%(fin)s, 0)
+                              ORDER BY created_at DESC, id DESC LIMIT 50""", 730),
+}
+
+
+def build(cursor, rows, years, hasta):
+    desde = hasta - timedelta(days=365 * years)
+    params = {'rows': rows, 'hasta': hasta, 'span': (hasta - desde).total_seconds()}
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    cursor.execute(f"CREATE TABLE {SCHEMA}.plana ({COLUMNS}, PRIMARY KEY (id))")
+    cursor.execute(FILL_SQL.format(table=f'{SCHEMA}.plana'), params)
+
+    cursor.execute(f"""CREATE TABLE {SCHEMA}.mensual ({COLUMNS}, PRIMARY KEY (id, created_at))
+                       PARTITION BY RANGE (created_at)""")
+    month = month_start(desde.date())
+    while month <= hasta.date():
+        cursor.execute(f"""CREATE TABLE {SCHEMA}.mensual_p{month:%Y_%m} PARTITION OF {SCHEMA}.mensual
+                           FOR VALUES FROM (%s) TO (%s)""", (month, next_month(month)))
+        month = next_month(month)
+    cursor.execute(FILL_SQL.format(table=f'{SCHEMA}.mensual'), params)
+
+    for table in ('plana', 'mensual'):
+        cursor.execute(f"CREATE INDEX ON {SCHEMA}.{table} (created_at DESC, id DESC)")
+        cursor.execute(f"CREATE INDEX ON {SCHEMA}.{table} (producto, created_at DESC, id DESC)")
+        cursor.execute(f"VACUUM ANALYZE {SCHEMA}.{table}")
+
+
+def bounds(hasta, days):
+    if days is None:
+        return {}
+    fin = hasta.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30)
+    return {'inicio': fin - timedelta(days=days), 'fin': fin}
+
+
+def scanned(cursor, query, params):
+    """(partitions or tables actually read, planning time in ms)"""
+    cursor.execute('EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF) ' + query, params)
+    lines = [line for (line,) in cursor.fetchall()]
+    read = {match[1] for line in lines if 'never executed' not in line for match in SCAN.finditer(line)
+            if not match[0].startswith('Bitmap Index')}
+    planning = next(float(line.split(':')[1].split()[0]) for line in lines if line.startswith('Planning Time'))
+    return len(read), planning
+
+
+def time_query(cursor, query, params, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema')
+    args = parser.parse_args()
+
+    hasta = datetime.now()
+    conn = db.connect_direct()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    build(cursor, args.rows, args.years, hasta)
+    print(f"{args.rows} filas en {args.years} años, construidas en {time.perf_counter() - start:.1f}s")
+    try:
+        for name, (query, days) in QUERIES.items():
+            params = bounds(hasta, days)
+            for table in ('plana', 'mensual'):
+                sql = query.format(table=f'{SCHEMA}.{table}')
+                samples = time_query(cursor, sql, params, args.iterations)
+                read, planning = scanned(cursor, sql, params)
+                print(f"{name:<20} {table:<8} p50={percentile(samples, 50):8.2f}ms "
+                      f"p95={percentile(samples, 95):8.2f}ms mean={statistics.mean(samples):8.2f}ms "
+                      f"plan={planning:5.2f}ms tablas leídas={read}")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
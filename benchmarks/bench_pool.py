@@ -0,0 +1,67 @@
+"""Connection latency with and without the pool.
+
+Usage (against a local Postgres configured through the DB_* variables):
+
+    python -m benchmarks.bench_pool --iterations 500
+"""
+import argparse
+import statistics
+import time
+
+import db
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_direct(iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        conn = db.connect_direct()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        conn.close()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_pooled(iterations):
+    pool = db.get_pool()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        conn = pool.acquire()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        conn.close()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<8} mean={statistics.mean(samples):8.3f}ms "
+          f"p50={percentile(samples, 50):8.3f}ms "
+          f"p95={percentile(samples, 95):8.3f}ms "
+          f"p99={percentile(samples, 99):8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    report('direct', run_direct(args.iterations))
+    report('pooled', run_pooled(args.iterations))
+    print('pool:', db.pool_stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Five-year period report: monthly aggregates vs summing daily rows.
+
+Uses whatever history estadisticas_diarias holds (run `python stats.py
+backfill` first) and times /api/estadisticas/rango's query both ways:
+
+    python -m benchmarks.bench_rango --years 5 --iterations 50
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+import psycopg2.extras
+
+import db
+import stats
+from benchmarks.bench_pool import percentile
+
+
+def time_report(conn, desde, hasta, granularidad, iterations, monthly=True):
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    unidad = stats.GRANULARIDADES[granularidad]
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        if monthly:
+            stats.period_report(cursor, desde, hasta, granularidad)
+        else:
+            # Same query with an empty month window: every bucket from daily rows
+            cursor.execute(stats.RANGE_SQL, {
+                'desde': desde, 'hasta': hasta, 'unidad': unidad,
+                'meses_desde': desde, 'meses_hasta': desde
+            })
+            cursor.fetchall()
+        conn.rollback()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<14} p50={percentile(samples, 50):8.2f}ms "
+          f"p95={percentile(samples, 95):8.2f}ms mean={statistics.mean(samples):8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    hasta = datetime.now().date()
+    desde = hasta.replace(year=hasta.year - args.years)
+
+    conn = db.connect_direct()
+    for granularidad in ('mes', 'anio'):
+        report(f'{granularidad} diario', time_report(conn, desde, hasta, granularidad, args.iterations, False))
+        report(f'{granularidad} mensual', time_report(conn, desde, hasta, granularidad, args.iterations))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
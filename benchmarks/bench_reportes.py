@@ -0,0 +1,75 @@
+"""Monthly PDF report: rendering it vs serving it from the disk cache.
+
+Times, against the statistics already in the database (run `python
+stats.py backfill` first), the three steps of /api/reportes/mensual:
+reading the figures, rendering the PDF (what the process pool does once
+per data change) and the cached path every other request takes (read the
+figures, hash them, find the file):
+
+    python -m benchmarks.bench_reportes --months 12 --iterations 20
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import psycopg2.extras
+
+import db
+import reports
+import stats
+from benchmarks.bench_pool import percentile
+
+
+def months_back(hasta, months):
+    desde = stats.month_start(hasta)
+    for _ in range(months - 1):
+        desde = stats.month_start(desde - timedelta(days=1))
+    return desde
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<14} p50={percentile(samples, 50):8.2f}ms "
+          f"p95={percentile(samples, 95):8.2f}ms mean={statistics.mean(samples):8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    hasta = datetime.now().date()
+    desde = months_back(hasta, args.months)
+    conn = db.connect_direct()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    def read():
+        data = reports.monthly_data(cursor, desde, hasta)
+        conn.rollback()
+        return data
+
+    data = read()
+    report('datos', timed(read, args.iterations))
+    report('render', timed(lambda: reports.render_monthly(data), args.iterations))
+
+    # Render once through the pool, then every request finds the file
+    report_id, _ = reports.request_document('reporte', 'bench', data)
+    start = time.perf_counter()
+    estado, _ = reports.wait(report_id)
+    print(f"primer render (pool) {estado} en {(time.perf_counter() - start) * 1000:.2f}ms")
+    report('cacheado', timed(lambda: reports.request_document('reporte', 'bench', read()), args.iterations))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
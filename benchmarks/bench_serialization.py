@@ -0,0 +1,106 @@
+"""JSON encoding of 50k rows: per-row conversion + jsonify vs serialization.py.
+
+Runs offline on synthetic ventas-shaped rows; --db also times fetching the
+same number of real rows through RealDictCursor vs a plain tuple cursor:
+
+    python -m benchmarks.bench_serialization --rows 50000 --iterations 5 [--db]
+"""
+import argparse
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import psycopg2.extras
+from flask import Flask
+
+import db
+import serialization
+from benchmarks.bench_pool import percentile
+
+
+COLUMNS = ['id', 'producto', 'cantidad', 'precio_unitario', 'total', 'fecha_venta',
+           'metodo_pago', 'observaciones', 'created_at', 'updated_at']
+
+
+def make_rows(count):
+    start = datetime(2026, 1, 1, 8, 30, 15, 123456)
+    rows = []
+    for i in range(count):
+        created = start + timedelta(minutes=i)
+        rows.append((i + 1, f'Producto {i % 40}', 1 + i % 3, Decimal('2.50'), Decimal('2.50') * (1 + i % 3),
+                     created.date(), 'efectivo', None, created, created))
+    return rows
+
+
+def legacy(app, rows):
+    """What the handlers did: RealDictRow-like dicts, rewritten field by field"""
+    dicts = [dict(zip(COLUMNS, row)) for row in rows]
+    for row in dicts:
+        if row['created_at']:
+            row['created_at'] = row['created_at'].isoformat()
+        if row['updated_at']:
+            row['updated_at'] = row['updated_at'].isoformat()
+        row['fecha_venta'] = row['fecha_venta'].strftime('%Y-%m-%d')
+        row['precio_unitario'] = float(row['precio_unitario'])
+        row['total'] = float(row['total'])
+    with app.app_context():
+        return app.json.response(dicts).get_data()
+
+
+def provider(app, rows):
+    dicts = [dict(zip(COLUMNS, row)) for row in rows]
+    with app.app_context():
+        return app.json.response(dicts).get_data()
+
+
+def timed(func, iterations, *args):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<22} p50={percentile(samples, 50):9.2f}ms "
+          f"p95={percentile(samples, 95):9.2f}ms mean={statistics.mean(samples):9.2f}ms")
+
+
+def fetch(cursor_factory, rows):
+    conn = db.connect_direct()
+    cursor = conn.cursor(cursor_factory=cursor_factory) if cursor_factory else conn.cursor()
+    cursor.execute(f"SELECT {', '.join(COLUMNS)} FROM ventas ORDER BY id LIMIT %s", (rows,))
+    result = cursor.fetchall() if cursor_factory else serialization.fetch_dicts(cursor)
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--db', action='store_true', help='also time fetching real ventas rows')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    legacy_app = Flask('legacy')
+    row_app = Flask('rows')
+    row_app.json = serialization.RowJSONProvider(row_app)
+
+    report('jsonify + conversión', timed(legacy, args.iterations, legacy_app, rows))
+    fast = serialization.orjson
+    if fast is not None:
+        report('provider (orjson)', timed(provider, args.iterations, row_app, rows))
+        serialization.orjson = None
+    report('provider (json)', timed(provider, args.iterations, row_app, rows))
+    serialization.orjson = fast
+
+    if args.db:
+        report('RealDictCursor', timed(fetch, args.iterations, psycopg2.extras.RealDictCursor, args.rows))
+        report('cursor + fetch_dicts', timed(fetch, args.iterations, None, args.rows))
+
+
+if __name__ == '__main__':
+    main()
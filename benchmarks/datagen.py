@@ -0,0 +1,233 @@
+"""Seeded synthetic data for load tests: members, payments, sales, visitors.
+
+Fills the database configured through the DB_* variables with realistic
+volumes spread over several years, loaded with COPY, then rebuilds the
+statistics rollup. The same --seed always produces the same rows:
+
+    python -m benchmarks.datagen --clientes 100000 --ventas 2000000 --years 5 --reset
+
+--reset TRUNCATEs every gym table first; only point it at a local
+throwaway database.
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import db
+import partitions
+import stats
+from app import calculate_end_date, member_status
+
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carlos', 'Lucía', 'Jorge', 'Sofía', 'Andrés', 'Valeria',
+           'Diego', 'Camila', 'Miguel', 'Daniela', 'Pedro', 'Gabriela', 'Juan', 'Paula', 'David', 'Elena',
+           'Fernando', 'Isabel', 'Ricardo', 'Carmen', 'Pablo', 'Natalia', 'Héctor', 'Rosa', 'Mateo', 'Andrea']
+APELLIDOS = ['García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez', 'Torres',
+             'Flores', 'Rivera', 'Gómez', 'Díaz', 'Cruz', 'Morales', 'Reyes', 'Ortiz', 'Gutiérrez', 'Chávez',
+             'Ramos', 'Vargas', 'Castillo', 'Jiménez', 'Moreno', 'Romero', 'Herrera', 'Medina', 'Aguilar',
+             'Vega', 'Paredes']
+# (producto, precio unitario, peso relativo)
+PRODUCTOS = [('Agua', '1.00', 30), ('Gatorade', '2.50', 20), ('Barra proteica', '1.75', 15),
+             ('Batido de proteína', '3.50', 12), ('Café', '1.25', 8), ('Creatina (porción)', '1.50', 5),
+             ('Toalla', '4.00', 3), ('Guantes', '12.00', 2), ('Shaker', '6.50', 3), ('Pre-entreno', '2.00', 2)]
+# (duración en días, precios posibles, peso relativo, probabilidad de renovar)
+PLANES = [(30, ['25.00', '30.00', '35.00'], 80, 0.85), (15, ['18.00'], 8, 0.5),
+          (7, ['10.00'], 7, 0.4), (1, ['3.00'], 5, 0.2)]
+METODOS_PAGO = ['efectivo', 'efectivo', 'efectivo', 'transferencia', 'tarjeta']
+EGRESOS = [('Luz', 40, 120), ('Agua potable', 15, 40), ('Internet', 30, 30), ('Limpieza', 10, 60),
+           ('Mantenimiento de máquinas', 50, 400), ('Productos para la venta', 80, 600), ('Arriendo', 800, 800)]
+
+GYM_TABLES = ['pagos_miembros', 'clientes', 'ventas', 'usuarios_diarios', 'egresos',
+              'estadisticas_diarias', 'estadisticas_mensuales', 'clientes_vencimientos']
+
+CHUNK_ROWS = 100000
+
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY rows into table in chunks; None is written as NULL"""
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            total += _copy_chunk(cursor, table, columns, chunk)
+            chunk = []
+    if chunk:
+        total += _copy_chunk(cursor, table, columns, chunk)
+    return total
+
+
+def _copy_chunk(cursor, table, columns, chunk):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(['\\N' if value is None else value for value in row] for row in chunk)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    return len(chunk)
+
+
+def random_moment(rng, day):
+    """A time of day during opening hours (06:00-22:00), busier after work"""
+    hour = min(21, max(6, int(rng.triangular(6, 22, 18))))
+    return datetime.combine(day, datetime.min.time()) + timedelta(
+        hours=hour, minutes=rng.randrange(60), seconds=rng.randrange(60), microseconds=rng.randrange(10 ** 6))
+
+
+def days_between(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def daily_counts(rng, total, start, end):
+    """Spread total events over the days, weekdays busier and growing over time"""
+    days = list(days_between(start, end))
+    weights = [(1.0 if day.weekday() < 5 else 0.6) * (0.5 + i / len(days)) for i, day in enumerate(days)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for i in rng.sample(range(len(days)), min(len(days), total - sum(counts))):
+        counts[i] += 1
+    return zip(days, counts)
+
+
+def generate_members(rng, count, start, today, first_id):
+    """(clientes rows, pagos_miembros rows): every period a member paid, ledger included"""
+    clientes = []
+    pagos = []
+    plan_weights = [plan[2] for plan in PLANES]
+    span = (today - start).days
+    for offset in range(count):
+        cliente_id = first_id + offset
+        duracion, precios, _, renueva = rng.choices(PLANES, plan_weights)[0]
+        precio = rng.choice(precios)
+        inicio = start + timedelta(days=rng.randrange(span + 1))
+        created_at = random_moment(rng, inicio)
+        metodo = rng.choice(METODOS_PAGO)
+
+        tipo = 'mensualidad'
+        while True:
+            fin = datetime.fromisoformat(calculate_end_date(inicio.isoformat(), duracion)).date()
+            pagos.append((cliente_id, inicio, precio, metodo, inicio, fin, duracion, tipo,
+                          random_moment(rng, inicio) if tipo == 'renovacion' else created_at))
+            siguiente = fin + timedelta(days=rng.choice([0, 0, 0, 1, 2, 5]))
+            if siguiente > today or rng.random() > renueva:
+                break
+            inicio, tipo = siguiente, 'renovacion'
+
+        nombre = rng.choice(NOMBRES)
+        apellido = f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        telefono = f"09{rng.randrange(10 ** 8):08d}"
+        peso = f"{rng.uniform(48, 115):.1f}" if rng.random() < 0.7 else None
+        clientes.append((cliente_id, nombre, apellido, peso, telefono, precio, inicio, fin, duracion,
+                         member_status(fin, today), created_at, pagos[-1][-1]))
+    return clientes, pagos
+
+
+def generate_ventas(rng, count, start, today):
+    productos = [(nombre, precio) for nombre, precio, _ in PRODUCTOS]
+    weights = [peso for _, _, peso in PRODUCTOS]
+    for day, n in daily_counts(rng, count, start, today):
+        for moment in sorted(random_moment(rng, day) for _ in range(n)):
+            producto, precio = rng.choices(productos, weights)[0]
+            cantidad = rng.choice([1, 1, 1, 2, 2, 3])
+            total = f"{float(precio) * cantidad:.2f}"
+            yield (producto, cantidad, precio, total, total, day, rng.choice(METODOS_PAGO), moment, moment)
+
+
+def generate_usuarios_diarios(rng, count, start, today):
+    for day, n in daily_counts(rng, count, start, today):
+        for moment in sorted(random_moment(rng, day) for _ in range(n)):
+            personas = rng.choice([1, 1, 1, 1, 2, 2, 3])
+            total = f"{2.0 * personas:.2f}"
+            yield ('Visitante', day, moment.time(), personas, '2.00', total, total, moment, moment)
+
+
+def generate_egresos(rng, start, today):
+    for day in days_between(start, today):
+        for descripcion, minimo, maximo in EGRESOS:
+            # Rent once a month, utilities a few times a month, the rest now and then
+            if descripcion == 'Arriendo' and day.day != 1:
+                continue
+            if descripcion != 'Arriendo' and rng.random() > 0.12:
+                continue
+            yield (day, descripcion, f"{rng.uniform(minimo, maximo):.2f}",
+                   'servicios' if minimo < 50 else 'operación', random_moment(rng, day))
+
+
+def seed(clientes, ventas, usuarios_diarios, years, seed_value=42, reset=False, today=None):
+    rng = random.Random(seed_value)
+    today = today or datetime.now().date()
+    start = today.replace(year=today.year - years)
+    conn = db.connect_direct()
+    cursor = conn.cursor()
+    counts = {}
+    try:
+        if reset:
+            cursor.execute(f"TRUNCATE {', '.join(GYM_TABLES)} RESTART IDENTITY")
+        # Months before the partitioned tables' first one
+        partitions.ensure_range(cursor, start, today)
+
+        # Reserve member ids up front so the ledger can reference them
+        cursor.execute("SELECT nextval(pg_get_serial_sequence('clientes', 'id')) FROM generate_series(1, %s)",
+                       (clientes,))
+        ids = [row[0] for row in cursor.fetchall()]
+        first_id = ids[0] if ids else 1
+        member_rows, pago_rows = generate_members(rng, clientes, start, today, first_id)
+        counts['clientes'] = copy_rows(cursor, 'clientes', [
+            'id', 'nombre', 'apellido', 'peso', 'telefono', 'precio_mensualidad', 'fecha_inicio',
+            'fecha_fin_mensualidad', 'duracion', 'estado_mensualidad', 'created_at', 'updated_at'
+        ], member_rows)
+        counts['pagos_miembros'] = copy_rows(cursor, 'pagos_miembros', [
+            'cliente_id', 'fecha_pago', 'monto', 'metodo_pago', 'fecha_inicio', 'fecha_fin',
+            'duracion', 'tipo', 'created_at'
+        ], pago_rows)
+        counts['ventas'] = copy_rows(cursor, 'ventas', [
+            'producto', 'cantidad', 'precio_unitario', 'precio_total', 'total', 'fecha_venta',
+            'metodo_pago', 'created_at', 'updated_at'
+        ], generate_ventas(rng, ventas, start, today))
+        counts['usuarios_diarios'] = copy_rows(cursor, 'usuarios_diarios', [
+            'nombre', 'fecha_entrada', 'hora_entrada', 'cantidad_clientes', 'precio_por_cliente',
+            'precio', 'total', 'created_at', 'updated_at'
+        ], generate_usuarios_diarios(rng, usuarios_diarios, start, today))
+        counts['egresos'] = copy_rows(cursor, 'egresos', [
+            'fecha', 'descripcion', 'monto', 'categoria', 'created_at'
+        ], generate_egresos(rng, start, today))
+        conn.commit()
+
+        # TRUNCATE bypasses the rollup triggers, so rebuild it from the base tables
+        counts['estadisticas_diarias'] = stats.backfill(start, today, conn)
+        cursor.execute("ANALYZE")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=100000)
+    parser.add_argument('--ventas', type=int, default=2000000)
+    parser.add_argument('--usuarios-diarios', type=int, default=500000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='TRUNCATE the gym tables first')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    counts = seed(args.clientes, args.ventas, args.usuarios_diarios, args.years, args.seed, args.reset)
+    for table, rows in counts.items():
+        print(f"{table:<22} {rows:>10,}")
+    print(f"✅ Datos generados en {time.perf_counter() - start:.1f}s (seed={args.seed})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
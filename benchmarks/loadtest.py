@@ -0,0 +1,384 @@
+"""HTTP load driver for every app.py endpoint, with a weighted mix.
+
+Drives a running server (--url) or starts app.py in-process (--serve) and
+writes a report that benchmarks.report can show and diff:
+
+    python -m benchmarks.loadtest --serve --concurrency 8 --duration 30 --output results/base.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --mix estadisticas=20,ventas_crear=0
+
+Every scenario has a default weight (see SCENARIOS); --mix overrides them
+by name and --solo-lectura drops everything that writes. Writes create
+their own rows (edits and deletes first create the row they act on, that
+setup request is not timed), so run it against a seeded throwaway
+database (benchmarks.datagen). Requests are sent with the token of an admin
+login (--usuario / --password or LOADTEST_PASSWORD). Only the standard
+library is used for the client: one keep-alive connection per thread.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+from benchmarks import report as reports
+from benchmarks.datagen import APELLIDOS, NOMBRES, PRODUCTOS
+
+
+class Session:
+    """One keep-alive connection plus the data the scenarios draw from"""
+
+    def __init__(self, url, fixtures, rng, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.fixtures = fixtures
+        self.rng = rng
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, body bytes); reconnects once when the server closed the connection"""
+        headers = dict(headers or {})
+        if self.fixtures.get('token'):
+            headers['Authorization'] = f"Bearer {self.fixtures['token']}"
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def create(self, path, body):
+        """Untimed setup request; returns the new row's id"""
+        status, data = self.request('POST', path, body)
+        if status >= 400:
+            raise RuntimeError(f'{path}: {status} {data[:200]!r}')
+        return json.loads(data)['id']
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# Request bodies
+
+def cliente_body(rng):
+    return {
+        'nombre': rng.choice(NOMBRES),
+        'apellido': f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+        'telefono': f"09{rng.randrange(10 ** 8):08d}",
+        'peso': round(rng.uniform(48, 115), 1),
+        'precio_mensualidad': 30,
+        'fecha_inicio': datetime.now().date().isoformat(),
+        'duracion': 30,
+    }
+
+
+def venta_body(rng):
+    producto, precio, _ = rng.choice(PRODUCTOS)
+    return {'producto': producto, 'cantidad': rng.randint(1, 3), 'precio_unitario': float(precio)}
+
+
+def usuario_diario_body(rng):
+    return {'cantidad_clientes': rng.randint(1, 3), 'precio_por_cliente': 2.0}
+
+
+def egreso_body(rng):
+    return {'descripcion': 'Limpieza', 'monto': round(rng.uniform(10, 60), 2), 'categoria': 'servicios'}
+
+
+def usuario_body(rng):
+    # Unique across runs: usernames are UNIQUE and created users are kept
+    suffix = uuid.uuid4().hex[:12]
+    return {'nombre': f'Carga {suffix}', 'usuario': f'carga{suffix}', 'password': f'clave{suffix}'}
+
+
+def import_csv(rng, lines=50):
+    rows = ['producto,cantidad,precio_unitario']
+    for _ in range(lines):
+        venta = venta_body(rng)
+        rows.append(f"{venta['producto']},{venta['cantidad']},{venta['precio_unitario']}")
+    return ('\n'.join(rows) + '\n').encode('utf-8')
+
+
+def days_ago(days):
+    return (datetime.now().date() - timedelta(days=days)).isoformat()
+
+
+# Scenarios: name -> (default weight, writes?, function(session) -> (method, path, body))
+
+def _renovar(s):
+    body = {'precio_mensualidad': 30, 'fecha_inicio': datetime.now().date().isoformat(), 'duracion': 30}
+    return 'POST', f"/api/clientes/{s.rng.choice(s.fixtures['clientes'])}/renovar", body
+
+
+def _editar_cliente(s):
+    cliente_id = s.create('/api/clientes', cliente_body(s.rng))
+    return 'PUT', f'/api/clientes/{cliente_id}', cliente_body(s.rng)
+
+
+def _eliminar_cliente(s):
+    return 'DELETE', f"/api/clientes/{s.create('/api/clientes', cliente_body(s.rng))}", None
+
+
+def _editar_usuario_diario(s):
+    usuario_id = s.create('/api/usuarios-diarios', usuario_diario_body(s.rng))
+    return 'PUT', f'/api/usuarios-diarios/{usuario_id}', usuario_diario_body(s.rng)
+
+
+def _eliminar_usuario_diario(s):
+    return 'DELETE', f"/api/usuarios-diarios/{s.create('/api/usuarios-diarios', usuario_diario_body(s.rng))}", None
+
+
+def _editar_venta(s):
+    return 'PUT', f"/api/ventas/{s.create('/api/ventas', venta_body(s.rng))}", venta_body(s.rng)
+
+
+def _eliminar_venta(s):
+    return 'DELETE', f"/api/ventas/{s.create('/api/ventas', venta_body(s.rng))}", None
+
+
+def _editar_usuario(s):
+    usuario_id = s.create('/api/usuarios', usuario_body(s.rng))
+    return 'PUT', f'/api/usuarios/{usuario_id}', {'nombre': 'Carga editado', 'activo': True}
+
+
+def _eliminar_usuario(s):
+    return 'DELETE', f"/api/usuarios/{s.create('/api/usuarios', usuario_body(s.rng))}", None
+
+
+SCENARIOS = {
+    # Reads
+    'clientes': (10, False, lambda s: ('GET', '/api/clientes?limit=50', None)),
+    'clientes_vencidos': (2, False, lambda s: ('GET', '/api/clientes?limit=50&estado_mensualidad=VENCIDO', None)),
+    'clientes_buscar': (8, False, lambda s: (
+        'GET', f"/api/clientes/search?q={quote(s.rng.choice(NOMBRES)[:3].lower())}", None)),
+    'clientes_pagos': (4, False, lambda s: (
+        'GET', f"/api/clientes/{s.rng.choice(s.fixtures['clientes'])}/pagos?limit=20", None)),
+    'pagos_resumen': (2, False, lambda s: (
+        'GET', f"/api/pagos/resumen?desde={days_ago(90)}&agrupar=semana", None)),
+    'usuarios_diarios': (6, False, lambda s: ('GET', '/api/usuarios-diarios?limit=50', None)),
+    'ventas': (6, False, lambda s: ('GET', '/api/ventas?limit=50', None)),
+    'ventas_producto': (2, False, lambda s: (
+        'GET', f"/api/ventas?limit=50&producto={quote(s.rng.choice(PRODUCTOS)[0])}", None)),
+    'estadisticas': (10, False, lambda s: ('GET', '/api/estadisticas', None)),
+    'estadisticas_historial': (3, False, lambda s: ('GET', '/api/estadisticas/historial', None)),
+    'estadisticas_rango': (3, False, lambda s: (
+        'GET', f"/api/estadisticas/rango?desde={days_ago(365)}&granularidad=mes", None)),
+    'egresos': (3, False, lambda s: ('GET', '/api/egresos?limit=50', None)),
+    'export_ventas': (0.5, False, lambda s: ('GET', f"/api/export/ventas?formato=ndjson&desde={days_ago(7)}", None)),
+    'usuarios': (1, False, lambda s: ('GET', '/api/usuarios', None)),
+    'test_db': (0.5, False, lambda s: ('GET', '/api/test-db', None)),
+    'db_pool': (0.5, False, lambda s: ('GET', '/api/db/pool', None)),
+    # Hashing the password makes every login deliberately expensive
+    'login': (0.5, False, lambda s: ('POST', '/api/login', s.fixtures['login'])),
+    'import_dry_run': (0.5, False, lambda s: ('POST', '/api/import/ventas?dry_run=1', import_csv(s.rng))),
+    'pagina_login': (2, False, lambda s: ('GET', '/', None)),
+    'pagina_dashboard': (2, False, lambda s: ('GET', '/dashboard', None)),
+    'estatico': (2, False, lambda s: ('GET', s.rng.choice(['/app.js', '/style.css']), None)),
+    # Writes
+    'clientes_crear': (1, True, lambda s: ('POST', '/api/clientes', cliente_body(s.rng))),
+    'clientes_editar': (0.5, True, _editar_cliente),
+    'clientes_eliminar': (0.2, True, _eliminar_cliente),
+    'clientes_renovar': (1, True, _renovar),
+    'usuarios_diarios_crear': (2, True, lambda s: ('POST', '/api/usuarios-diarios', usuario_diario_body(s.rng))),
+    'usuarios_diarios_editar': (0.2, True, _editar_usuario_diario),
+    'usuarios_diarios_eliminar': (0.2, True, _eliminar_usuario_diario),
+    'ventas_crear': (3, True, lambda s: ('POST', '/api/ventas', venta_body(s.rng))),
+    'ventas_batch': (1, True, lambda s: (
+        'POST', '/api/ventas/batch', {'productos': [venta_body(s.rng) for _ in range(s.rng.randint(2, 6))]})),
+    'ventas_editar': (0.2, True, _editar_venta),
+    'ventas_eliminar': (0.2, True, _eliminar_venta),
+    'egresos_crear': (0.5, True, lambda s: ('POST', '/api/egresos', egreso_body(s.rng))),
+    'usuarios_crear': (0.1, True, lambda s: ('POST', '/api/usuarios', usuario_body(s.rng))),
+    'usuarios_editar': (0.1, True, _editar_usuario),
+    'usuarios_eliminar': (0.1, True, _eliminar_usuario),
+}
+
+
+def parse_mix(value):
+    """'name=weight,name=weight' -> dict, names checked against SCENARIOS"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'Escenario desconocido: {name}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Peso inválido para {name}: {weight!r}')
+    return mix
+
+
+def build_mix(overrides, read_only=False):
+    weights = {name: weight for name, (weight, writes, _) in SCENARIOS.items()
+               if not (read_only and writes)}
+    weights.update({name: w for name, w in overrides.items() if not (read_only and SCENARIOS[name][1])})
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def login(session, username, password):
+    status, data = session.request('POST', '/api/login', {'username': username, 'password': password})
+    if status != 200:
+        raise RuntimeError(f'/api/login respondió {status}: {data[:200]!r}')
+    return json.loads(data)['token']
+
+
+def prepare(url, seed, username, password):
+    """Data every thread shares: an admin token, member ids to read from and a login to use"""
+    session = Session(url, {}, random.Random(seed))
+    session.fixtures['token'] = login(session, username, password)
+    status, data = session.request('GET', '/api/clientes?limit=500')
+    if status != 200:
+        raise RuntimeError(f'/api/clientes respondió {status}: {data[:200]!r}')
+    clientes = [row['id'] for row in json.loads(data)]
+    if not clientes:
+        clientes = [session.create('/api/clientes', cliente_body(session.rng))]
+
+    # A throwaway system user, so the login scenario needs no real credentials
+    usuario = usuario_body(session.rng)
+    usuario_id = session.create('/api/usuarios', usuario)
+    session.close()
+    fixtures = {'token': session.fixtures['token'], 'clientes': clientes,
+                'login': {'username': usuario['usuario'], 'password': usuario['password']}}
+    return fixtures, usuario_id
+
+
+def worker(url, fixtures, mix, seed, deadline, remaining, lock, samples, errors, warmup_until):
+    rng = random.Random(seed)
+    session = Session(url, fixtures, rng)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    local_samples = defaultdict(list)
+    local_errors = defaultdict(int)
+    try:
+        while time.monotonic() < deadline:
+            if remaining is not None:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            try:
+                method, path, body = SCENARIOS[name][2](session)
+                start = time.perf_counter()
+                status, _ = session.request(method, path, body)
+                elapsed = (time.perf_counter() - start) * 1000
+            except Exception:
+                session.close()
+                if time.monotonic() >= warmup_until:
+                    local_errors[name] += 1
+                continue
+            if time.monotonic() < warmup_until:
+                continue
+            local_samples[name].append(elapsed)
+            if status >= 400:
+                local_errors[name] += 1
+    finally:
+        session.close()
+        with lock:
+            for name, values in local_samples.items():
+                samples[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+
+def run(url, mix, username, password, concurrency=4, duration=30.0, requests=None, warmup=0.0, seed=42):
+    fixtures, usuario_id = prepare(url, seed, username, password)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    warmup_until = time.monotonic() + warmup
+    deadline = warmup_until + duration if requests is None else float('inf')
+    remaining = None if requests is None else [requests]
+    threads = [
+        threading.Thread(target=worker, args=(url, fixtures, mix, seed + i + 1, deadline, remaining, lock,
+                                              samples, errors, warmup_until), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(0.0, time.monotonic() - warmup_until)
+
+    cleanup = Session(url, fixtures, random.Random(seed))
+    cleanup.request('DELETE', f'/api/usuarios/{usuario_id}')
+    cleanup.close()
+    return samples, errors, elapsed
+
+
+def serve():
+    """Start app.py on a free local port in a background thread; returns its URL"""
+    from werkzeug.serving import make_server
+    from app import app
+
+    # One access log line per request would dominate the measurement
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://127.0.0.1:5000')
+    target.add_argument('--serve', action='store_true', help='arrancar app.py en este proceso')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=30.0, help='segundos de medición')
+    parser.add_argument('--requests', type=int, help='número fijo de requests en vez de --duration')
+    parser.add_argument('--warmup', type=float, default=2.0, help='segundos iniciales sin medir')
+    parser.add_argument('--mix', type=parse_mix, default={}, help='pesos por escenario: nombre=peso,...')
+    parser.add_argument('--solo-lectura', action='store_true', help='omitir los escenarios que escriben')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--usuario', default=os.environ.get('LOADTEST_USUARIO', 'administradorprincipal'),
+                        help='usuario admin con el que se inicia sesión')
+    parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD'),
+                        help='su contraseña (o LOADTEST_PASSWORD)')
+    parser.add_argument('--output', help='guardar el reporte JSON en esta ruta')
+    parser.add_argument('--list', action='store_true', help='listar escenarios y pesos por defecto')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (weight, writes, _) in SCENARIOS.items():
+            print(f"{name:<26} {weight:>5} {'escritura' if writes else ''}")
+        return 0
+
+    if not args.password:
+        parser.error('se requiere --password o LOADTEST_PASSWORD de un usuario admin')
+    url = serve() if args.serve else args.url
+    mix = build_mix(args.mix, args.solo_lectura)
+    samples, errors, elapsed = run(url, mix, args.usuario, args.password, args.concurrency, args.duration,
+                                   args.requests, 0.0 if args.requests else args.warmup, args.seed)
+    config = {
+        'url': None if args.serve else url, 'serve': args.serve, 'concurrency': args.concurrency,
+        'duration': args.duration, 'requests': args.requests, 'seed': args.seed, 'mix': mix,
+    }
+    result = reports.summarize(samples, errors, elapsed, config)
+    reports.print_report(result)
+    if args.output:
+        reports.save(result, args.output)
+        print(f"✅ Reporte guardado en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
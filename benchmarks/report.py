@@ -0,0 +1,163 @@
+"""Latency/throughput reports of a load test run, saved as JSON and diffed.
+
+    python -m benchmarks.report show results/base.json
+    python -m benchmarks.report diff results/base.json results/new.json [--threshold 5]
+
+A report holds, per endpoint and overall, the request count, errors,
+throughput and p50/p95/p99/max latency, plus the git commit and the load
+configuration it was taken with, so runs of two commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.bench_pool import percentile
+
+
+PERCENTILES = (50, 95, 99)
+# Metrics where a lower value is better; throughput is the other way round
+LOWER_IS_BETTER = ('p50', 'p95', 'p99', 'mean', 'max', 'errors')
+
+
+def git_revision():
+    """Short commit hash of the working tree, marked when it has local changes"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def summarize_samples(samples, errors, elapsed):
+    """Stats for one endpoint: samples are latencies in ms"""
+    summary = {'count': len(samples), 'errors': errors,
+               'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0}
+    if samples:
+        for p in PERCENTILES:
+            summary[f'p{p}'] = round(percentile(samples, p), 3)
+        summary['mean'] = round(statistics.mean(samples), 3)
+        summary['max'] = round(max(samples), 3)
+    return summary
+
+
+def summarize(samples, errors, elapsed, config=None):
+    """Build a report from {endpoint: [ms, ...]} and {endpoint: error count}"""
+    everything = [ms for values in samples.values() for ms in values]
+    return {
+        'meta': {
+            'commit': git_revision(),
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'config': config or {},
+        },
+        'elapsed_s': round(elapsed, 3),
+        'total': summarize_samples(everything, sum(errors.values()), elapsed),
+        'endpoints': {
+            name: summarize_samples(samples[name], errors.get(name, 0), elapsed)
+            for name in sorted(samples)
+        },
+    }
+
+
+def save(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _row(name, stats):
+    latencies = ' '.join(f"{key}={stats[key]:9.2f}ms" for key in ('p50', 'p95', 'p99') if key in stats)
+    return f"{name:<26} n={stats['count']:>7} err={stats['errors']:>5} {stats['rps']:>9.1f} req/s {latencies}"
+
+
+def print_report(report):
+    meta = report['meta']
+    print(f"commit {meta['commit'] or '?'}  {meta['fecha']}  {report['elapsed_s']:.1f}s")
+    for name, stats in report['endpoints'].items():
+        print(_row(name, stats))
+    print(_row('TOTAL', report['total']))
+
+
+def change(base, new):
+    """Relative change in %, None when there is nothing to compare against"""
+    if base is None or new is None:
+        return None
+    if base == 0:
+        return 0.0 if new == 0 else float('inf')
+    return (new - base) / base * 100
+
+
+def diff(base, new, threshold=5.0):
+    """Rows (endpoint, metric, base, new, % change, verdict) for two reports"""
+    rows = []
+    names = sorted(set(base['endpoints']) | set(new['endpoints'])) + ['TOTAL']
+    for name in names:
+        before = base['total'] if name == 'TOTAL' else base['endpoints'].get(name, {})
+        after = new['total'] if name == 'TOTAL' else new['endpoints'].get(name, {})
+        for metric in ('p50', 'p95', 'p99', 'rps', 'errors'):
+            delta = change(before.get(metric), after.get(metric))
+            verdict = ''
+            if delta is not None and abs(delta) >= threshold:
+                worse = delta > 0 if metric in LOWER_IS_BETTER else delta < 0
+                verdict = 'peor' if worse else 'mejor'
+            rows.append((name, metric, before.get(metric), after.get(metric), delta, verdict))
+    return rows
+
+
+def print_diff(base, new, threshold=5.0):
+    print(f"base  {base['meta']['commit'] or '?'}  {base['meta']['fecha']}")
+    print(f"nuevo {new['meta']['commit'] or '?'}  {new['meta']['fecha']}")
+    if base['meta'].get('config') != new['meta'].get('config'):
+        print("⚠️  Las dos corridas usaron configuraciones distintas")
+    regressions = 0
+    for name, metric, before, after, delta, verdict in diff(base, new, threshold):
+        if before is None and after is None:
+            continue
+        shown = '       -' if delta is None else f"{delta:+7.1f}%"
+        print(f"{name:<26} {metric:<6} {_value(before):>12} → {_value(after):>12} {shown} {verdict}")
+        regressions += verdict == 'peor'
+    return regressions
+
+
+def _value(value):
+    return '-' if value is None else f"{value:.2f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help='Mostrar un reporte guardado')
+    show.add_argument('report')
+    compare = commands.add_parser('diff', help='Comparar dos reportes')
+    compare.add_argument('base')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=5.0,
+                         help='cambio mínimo en %% para marcar mejor/peor')
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        print_report(load(args.report))
+        return 0
+    regressions = print_diff(load(args.base), load(args.new), args.threshold)
+    # Non-zero exit when something got worse, handy in scripts
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
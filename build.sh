@@ -4,4 +4,7 @@
 echo "Installing Python dependencies..."
 pip install -r requirements.txt
 
+echo "Building static assets..."
+python assets.py build
+
 echo "Build completed successfully!"
@@ -0,0 +1,51 @@
+"""Shared pytest fixtures.
+
+Unit tests need no database. The ones that take the `database` fixture run
+against the PostgreSQL of the DB_* variables (migrated with
+`python schema.py migrate`) and are skipped when it cannot be reached.
+"""
+import os
+
+import psycopg2
+import psycopg2.extras
+import pytest
+
+import auth
+import db
+
+
+@pytest.fixture(scope='session')
+def database():
+    try:
+        conn = db.connect_direct()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Sin base de datos: {e}')
+    conn.close()
+
+
+@pytest.fixture
+def admin(database):
+    """A throwaway admin user, its password and a session token for it"""
+    usuario, password = f'pytest-{os.getpid()}', os.urandom(16).hex()
+    conn = db.connect_direct()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        INSERT INTO usuarios (nombre, usuario, password, rol)
+        VALUES ('Pruebas', %s, %s, 'admin')
+        RETURNING id, rol, sesiones_version
+    """, (usuario, auth.hash_password(password)))
+    user = cursor.fetchone()
+    conn.commit()
+    try:
+        yield dict(user, usuario=usuario, password=password, token=auth.issue_token(user))
+    finally:
+        cursor.execute("DELETE FROM usuarios WHERE id = %s", (user['id'],))
+        conn.commit()
+        conn.close()
+        auth.forget_user(user['id'])
+
+
+@pytest.fixture
+def client(database):
+    from app import app
+    return app.test_client()
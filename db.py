@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+from flask import g
+
+import metrics
+
+
+# Pool sizing (per gunicorn worker process)
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+# Connections idle longer than this are pinged with SELECT 1 before reuse
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', 30))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+
+
+def get_db_config():
+    """Connection settings from environment variables (for Render or local)"""
+    return {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'user': os.environ.get('DB_USER', 'postgres'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+        'dbname': os.environ.get('DB_NAME', 'activeGym'),
+        'port': os.environ.get('DB_PORT', 5432)
+    }
+
+
+def connect_direct():
+    """Open a new, unpooled connection (scripts, benchmarks, LISTEN)"""
+    return psycopg2.connect(**get_db_config())
+
+
+class PooledConnection:
+    """Proxy around a pooled psycopg2 connection.
+
+    Behaves like the real connection except that close() hands it back to
+    the pool instead of tearing down the socket, so existing handlers keep
+    working unchanged.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        # Statements are timed for the request (see metrics.py)
+        return self._conn.cursor(*args, cursor_factory=metrics.timed_cursor(cursor_factory), **kwargs)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Thread-safe pool with liveness checks and usage counters
+
+    A checkout waits up to DB_POOL_TIMEOUT for one of the maxconn slots, so
+    psycopg2's own pool is never asked for more connections than it has.
+    """
+
+    def __init__(self, minconn, maxconn, **config):
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+        # Kept here rather than read from psycopg2's private lists; the
+        # connections it opened up front are checked out and back in to count them
+        self._in_use = 0
+        self._idle = set()
+        for conn in [self._pool.getconn() for _ in range(minconn)]:
+            self._putconn(conn, close=False)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pid = os.getpid()
+        self.stats = {
+            'checkouts': 0,
+            'returns': 0,
+            'discarded': 0,
+            'pings': 0,
+            'exhausted': 0,
+            'wait_ms_total': 0.0,
+        }
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+            return True
+        with self._lock:
+            self.stats['pings'] += 1
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _getconn(self):
+        conn = self._pool.getconn()
+        with self._lock:
+            self._idle.discard(id(conn))
+        return conn
+
+    def _putconn(self, conn, close):
+        # Under the lock so a thread that takes this connection right away
+        # cannot mark it in use before it is counted as idle
+        with self._lock:
+            self._pool.putconn(conn, close=close)
+            if not conn.closed:
+                self._idle.add(id(conn))
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            with self._lock:
+                self.stats['exhausted'] += 1
+            raise psycopg2.pool.PoolError(f'No hay conexiones libres tras esperar {DB_POOL_TIMEOUT:g}s')
+        try:
+            # A dead connection is discarded and replaced; bound the retries by
+            # the pool size so a database outage surfaces as an error.
+            for _ in range(self.maxconn + 1):
+                conn = self._getconn()
+                if self._is_alive(conn):
+                    break
+                with self._lock:
+                    self.stats['discarded'] += 1
+                    self._last_used.pop(id(conn), None)
+                self._putconn(conn, close=True)
+            else:
+                raise psycopg2.OperationalError('No se pudo obtener una conexión válida')
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self.stats['checkouts'] += 1
+            self.stats['wait_ms_total'] += (time.perf_counter() - start) * 1000
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        close = bool(conn.closed)
+        if not close:
+            try:
+                if conn.autocommit:
+                    conn.autocommit = False
+                # Never hand out a connection in the middle of a transaction
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        with self._lock:
+            self._in_use -= 1
+            self.stats['returns'] += 1
+            if close:
+                self.stats['discarded'] += 1
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._putconn(conn, close=close)
+        finally:
+            self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['in_use'] = self._in_use
+            data['idle'] = len(self._idle)
+        data['min'] = self.minconn
+        data['max'] = self.maxconn
+        data['pid'] = self.pid
+        return data
+
+    def closeall(self):
+        with self._lock:
+            self._pool.closeall()
+            self._idle.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool, creating it lazily after gunicorn forks"""
+    global _pool
+    pid = os.getpid()
+    if _pool is None or _pool.pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool.pid != pid:
+                # Sockets inherited from the parent must not be reused by the child
+                # Cursors opened straight on the raw connection are timed as well
+                _pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, cursor_factory=metrics.timed_cursor(),
+                                       **get_db_config())
+    return _pool
+
+
+def get_db_connection():
+    """Check out a pooled connection; it is returned at the end of the request"""
+    start = time.perf_counter()
+    conn = get_pool().acquire()
+    metrics.add('db_connect', (time.perf_counter() - start) * 1000)
+    try:
+        g.setdefault('db_connections', []).append(conn)
+    except RuntimeError:
+        # Outside a request context the caller is responsible for close()
+        pass
+    return conn
+
+
+def release_request_connections(exc=None):
+    """Return every connection the request checked out, even on early return"""
+    for conn in g.pop('db_connections', []):
+        conn.close()
+
+
+def pool_stats():
+    if _pool is None or _pool.pid != os.getpid():
+        return {'pid': os.getpid(), 'initialized': False}
+    data = _pool.snapshot()
+    data['initialized'] = True
+    return data
+
+
+def init_app(app):
+    app.teardown_appcontext(release_request_connections)
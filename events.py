@@ -0,0 +1,338 @@
+"""Server-Sent Events for the dashboard: GET /api/events?token=<token>.
+
+Every write to clientes, ventas, usuarios_diarios and egresos is logged in
+cambios (migrations/0004_cambios.sql), and a trigger on that table sends
+NOTIFY cambios with the table, operation, row count and first ids
+(migrations/0005_eventos.sql). Each worker process keeps one LISTEN
+connection and one hub thread that fans its notifications out to every
+open stream. The events are:
+
+    sincronizar    on connect and after the listener reconnects: call /api/sync
+    cambio         {"tabla", "operacion", "total", "ids"} per write statement
+    estadisticas   the /api/estadisticas figures, at most once per EVENTS_STATS_DELAY
+
+They are hints: rows still come from /api/sync, so a dropped stream or a
+missed notification only delays a refresh. Each stream is a queue the hub
+fills and the request drains. In production the streams are served by
+events_server.py, a separate service on gunicorn's gevent worker, where
+a stream costs a greenlet and a socket instead of a thread. The API
+workers (gthread) set EVENTS_IN_PROCESS=0 so no stream ever holds one of
+their threads. With the default EVENTS_IN_PROCESS=1 the API serves them
+itself, one thread each: for development and tests only.
+
+EventSource cannot send headers, so this endpoint also takes the session
+token as ?token= (auth.QUERY_TOKEN_ENDPOINTS). The hub checks every
+stream's token again each EVENTS_PING_SECONDS and closes the streams of
+revoked sessions (within AUTH_USER_CACHE_SECONDS for a logout served by
+another worker). Streams are also closed after EVENTS_MAX_SECONDS and the
+browser reconnects.
+"""
+import json
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+import psycopg2.extras
+from flask import Response
+
+import auth
+import db
+import metrics
+
+
+EVENTS_CHANNEL = 'cambios'
+# 0 on the API service: streams are served by events_server.py
+EVENTS_IN_PROCESS = os.environ.get('EVENTS_IN_PROCESS', '1').lower() in ('1', 'true', 'si')
+# Streams per process; events_server.py raises it (each one is a greenlet there)
+EVENTS_MAX_CLIENTS = int(os.environ.get('EVENTS_MAX_CLIENTS', 20))
+# Comment line sent to every stream so proxies keep idle connections open
+EVENTS_PING_SECONDS = float(os.environ.get('EVENTS_PING_SECONDS', 15))
+EVENTS_MAX_SECONDS = float(os.environ.get('EVENTS_MAX_SECONDS', 3600))
+# Writes closer together than this share one estadisticas event
+EVENTS_STATS_DELAY = float(os.environ.get('EVENTS_STATS_DELAY', 0.5))
+# A client with more events than this waiting to be written is dropped (it reconnects and syncs)
+EVENTS_MAX_QUEUE = int(os.environ.get('EVENTS_MAX_QUEUE', 256))
+# Milliseconds the browser waits before reconnecting
+EVENTS_RETRY_MS = 5000
+LISTEN_RETRY_SECONDS = 5
+
+PING = b': ping\n\n'
+
+_statistics = None
+
+
+def statistics(fn):
+    """Register fn(cursor, today) -> the figures sent as the estadisticas event"""
+    global _statistics
+    _statistics = fn
+    return fn
+
+
+def format_event(event, data):
+    payload = json.dumps(data, separators=(',', ':'), default=str)
+    return f'event: {event}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+class QueueClient:
+    """One open stream: the hub fills its queue, the request (greenlet or thread) drains it"""
+
+    def __init__(self, token):
+        self.token = token
+        self.queue = queue.Queue(maxsize=EVENTS_MAX_QUEUE)
+        self.closed = threading.Event()
+        self.opened = time.monotonic()
+
+    def send(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            return False
+        return True
+
+    def close(self):
+        self.closed.set()
+        try:
+            # Wakes the request up; with a full queue it sees closed on its next get
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def stream(self, hub):
+        try:
+            while True:
+                data = self.queue.get()
+                if data is None or self.closed.is_set():
+                    break
+                yield data
+        finally:
+            hub.remove(self)
+
+
+class Hub:
+    """This process's LISTEN connection and open streams, served by one thread"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.selector = selectors.DefaultSelector()
+        self.clients = set()
+        # Streams added or open, counted as soon as they are handed over
+        self.size = 0
+        self.lock = threading.Lock()
+        self.commands = []
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, 'wake')
+        self.listener = None
+        self.listen_fd = None
+        self.listen_retry = 0.0
+        self.stats_due = None
+        self.next_ping = time.monotonic() + EVENTS_PING_SECONDS
+        self.thread = threading.Thread(target=self.run, name='events', daemon=True)
+        self.thread.start()
+
+    # Called from request threads
+
+    def add(self, client):
+        with self.lock:
+            self.size += 1
+        self._command('add', client)
+
+    def remove(self, client):
+        self._command('remove', client)
+
+    def is_full(self):
+        return self.size >= EVENTS_MAX_CLIENTS
+
+    def _command(self, action, client):
+        with self.lock:
+            self.commands.append((action, client))
+        try:
+            self.wake_w.send(b'.')
+        except OSError:
+            # Buffer full: the hub is already due to wake up
+            pass
+
+    # Hub thread
+
+    def run(self):
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                print(f"Error en el hub de eventos: {e}")
+                time.sleep(1)
+
+    def step(self):
+        now = time.monotonic()
+        if self.listener is None and now >= self.listen_retry:
+            self.listen()
+        timeout = self.next_ping - now
+        if self.stats_due is not None:
+            timeout = min(timeout, self.stats_due - now)
+        if self.listener is None:
+            timeout = min(timeout, self.listen_retry - now)
+
+        for key, _ in self.selector.select(max(timeout, 0)):
+            if key.data == 'wake':
+                self.run_commands()
+            elif key.data == 'listen':
+                self.read_notifications()
+
+        now = time.monotonic()
+        if self.stats_due is not None and now >= self.stats_due:
+            self.stats_due = None
+            self.push_statistics()
+        if now >= self.next_ping:
+            self.next_ping = now + EVENTS_PING_SECONDS
+            for client in [c for c in self.clients if now - c.opened > EVENTS_MAX_SECONDS]:
+                self.drop(client, 'expirada')
+            for client in [c for c in self.clients if self.is_revoked(c)]:
+                self.drop(client, 'revocada')
+            self.broadcast(PING, 'ping')
+
+    def run_commands(self):
+        try:
+            while self.wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            commands, self.commands = self.commands, []
+        hello = f'retry: {EVENTS_RETRY_MS}\n\n'.encode('utf-8') + format_event('sincronizar', {})
+        for action, client in commands:
+            if action == 'remove':
+                self.drop(client, 'cerrada')
+                continue
+            self.clients.add(client)
+            metrics.get_registry().inc('events_connections_total', ('abierta',))
+            self.deliver(client, hello)
+
+    def deliver(self, client, data):
+        if not client.send(data):
+            self.drop(client, 'descartada')
+
+    def is_revoked(self, client):
+        try:
+            auth.authenticate(client.token)
+        except auth.AuthError:
+            return True
+        except psycopg2.Error:
+            # The database is unreachable: keep the stream, check again later
+            return False
+        return False
+
+    def drop(self, client, reason):
+        if client not in self.clients:
+            client.close()
+            return
+        self.clients.discard(client)
+        with self.lock:
+            self.size -= 1
+        client.close()
+        metrics.get_registry().inc('events_connections_total', (reason,))
+
+    def broadcast(self, data, event):
+        if not self.clients:
+            return
+        metrics.get_registry().inc('events_sent_total', (event,), len(self.clients))
+        for client in list(self.clients):
+            self.deliver(client, data)
+
+    def listen(self):
+        try:
+            conn = db.connect_direct()
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {EVENTS_CHANNEL}")
+        except psycopg2.Error as e:
+            print(f"⚠️  No se pudo escuchar {EVENTS_CHANNEL}: {e}")
+            self.listen_retry = time.monotonic() + LISTEN_RETRY_SECONDS
+            return
+        self.listener = conn
+        # By descriptor: a connection the server closed no longer has a fileno()
+        self.listen_fd = conn.fileno()
+        self.selector.register(self.listen_fd, selectors.EVENT_READ, 'listen')
+        # Anything written while nobody listened is picked up by /api/sync
+        self.broadcast(format_event('sincronizar', {}), 'sincronizar')
+
+    def read_notifications(self):
+        try:
+            self.listener.poll()
+        except psycopg2.Error as e:
+            print(f"⚠️  Se perdió la conexión LISTEN: {e}")
+            self.selector.unregister(self.listen_fd)
+            try:
+                self.listener.close()
+            except psycopg2.Error:
+                pass
+            self.listener = None
+            self.listen_retry = time.monotonic() + LISTEN_RETRY_SECONDS
+            return
+        notifies = self.listener.notifies[:]
+        del self.listener.notifies[:]
+        for notify in notifies:
+            try:
+                change = json.loads(notify.payload)
+            except ValueError:
+                continue
+            self.broadcast(format_event('cambio', change), 'cambio')
+        if notifies and self.clients and _statistics is not None and self.stats_due is None:
+            self.stats_due = time.monotonic() + EVENTS_STATS_DELAY
+
+    def push_statistics(self):
+        """One query for every stream of this process"""
+        if not self.clients:
+            return
+        conn = None
+        try:
+            conn = db.get_db_connection()
+            figures = _statistics(conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor),
+                                  datetime.now().date())
+            conn.rollback()
+        except psycopg2.Error as e:
+            print(f"⚠️  No se pudieron calcular las estadísticas: {e}")
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+        self.broadcast(format_event('estadisticas', figures), 'estadisticas')
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """This process's hub, started on the first stream after gunicorn forks"""
+    global _hub
+    pid = os.getpid()
+    if _hub is None or _hub.pid != pid:
+        with _hub_lock:
+            if _hub is None or _hub.pid != pid:
+                _hub = Hub()
+    return _hub
+
+
+class EventStream(Response):
+    """text/event-stream response fed by the hub through a QueueClient"""
+
+    def __init__(self, hub, token):
+        super().__init__(mimetype='text/event-stream')
+        self.hub = hub
+        self.token = token
+        self.headers['Cache-Control'] = 'no-cache'
+        # Reverse proxies (nginx, Render) must not buffer the stream
+        self.headers['X-Accel-Buffering'] = 'no'
+
+    def __call__(self, environ, start_response):
+        # Registered only once the response is served, so the hub never
+        # holds a client whose request was abandoned before that
+        client = QueueClient(self.token)
+        self.response = client.stream(self.hub)
+        self.hub.add(client)
+        return super().__call__(environ, start_response)
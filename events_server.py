@@ -0,0 +1,61 @@
+"""Event-stream service: /api/events on gunicorn's gevent worker.
+
+    gunicorn --worker-class gevent --worker-connections 1000 --workers 1 \
+        --bind 0.0.0.0:$PORT events_server:app
+
+Serves only GET /api/events (see events.py) with the API's own handler,
+authentication and hub. Under gevent every open stream is a greenlet
+waiting on its queue, so one process holds EVENTS_MAX_CLIENTS streams
+without a thread each, and psycopg2 is made cooperative (psycogreen) so a
+query never blocks the other streams. The API keeps the gthread worker,
+where COPY (bulk import, archiving) still works, with EVENTS_IN_PROCESS=0.
+
+The dashboard connects here from the API's origin, so that origin must be
+listed in EVENTS_CORS_ORIGINS, and both services need the same SECRET_KEY.
+"""
+import json
+import os
+
+from gevent import monkey
+
+if not monkey.is_module_patched('socket'):
+    raise RuntimeError('events_server.py se ejecuta con gunicorn --worker-class gevent')
+
+from psycogreen.gevent import patch_psycopg
+
+patch_psycopg()
+
+# Before app is imported: this process serves the streams and nothing else
+os.environ['EVENTS_IN_PROCESS'] = '1'
+os.environ.setdefault('EVENTS_MAX_CLIENTS', '1000')
+os.environ.setdefault('JOBS_IN_PROCESS', '0')
+
+from app import app as api
+
+
+EVENTS_CORS_ORIGINS = {origin.strip() for origin in os.environ.get(
+    'EVENTS_CORS_ORIGINS', 'https://activegym.onrender.com').split(',') if origin.strip()}
+
+NOT_FOUND = json.dumps({'error': 'Este servicio solo sirve /api/events'}).encode('utf-8')
+HEALTHY = json.dumps({'status': 'healthy'}).encode('utf-8')
+
+
+def app(environ, start_response):
+    path = environ.get('PATH_INFO', '')
+    if path == '/health':
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [HEALTHY]
+    if path != '/api/events':
+        start_response('404 NOT FOUND', [('Content-Type', 'application/json')])
+        return [NOT_FOUND]
+
+    origin = environ.get('HTTP_ORIGIN')
+    if origin not in EVENTS_CORS_ORIGINS:
+        return api(environ, start_response)
+
+    def cors_start_response(status, headers, exc_info=None):
+        if not any(name.lower() == 'access-control-allow-origin' for name, _ in headers):
+            headers = headers + [('Access-Control-Allow-Origin', origin), ('Vary', 'Origin')]
+        return start_response(status, headers, exc_info)
+
+    return api(environ, cors_start_response)
@@ -0,0 +1,85 @@
+"""Streaming CSV / NDJSON exports read through named server-side cursors.
+
+Rows are pulled from Postgres in fixed-size batches and written out as
+they arrive, so worker memory stays flat regardless of table size.
+"""
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+
+import serialization
+
+
+EXPORT_BATCH_SIZE = 5000
+
+# Exportable tables and the column their date range applies to
+EXPORT_TABLES = {
+    'clientes': 'created_at',
+    'ventas': 'created_at',
+    'usuarios_diarios': 'created_at',
+    'egresos': 'fecha',
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def export_query(table, columns, desde=None, hasta=None):
+    """SELECT for an export; hasta is inclusive (half-open on the next day)"""
+    date_column = EXPORT_TABLES[table]
+    conditions = []
+    params = []
+    if desde:
+        conditions.append(f"{date_column} >= %s")
+        params.append(desde)
+    if hasta:
+        conditions.append(f"{date_column} < %s")
+        params.append(hasta + timedelta(days=1))
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+    return query, params
+
+
+def stream_export(conn, table, columns, fmt='csv', desde=None, hasta=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the export in chunks of one batch each; closes conn when done"""
+    query, params = export_query(table, columns, desde, hasta)
+    cursor = conn.cursor(name=f'export_{table}')
+    cursor.itersize = batch_size
+    try:
+        cursor.execute(query, params)
+
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([to_text(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield b''.join(serialization.dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,193 @@
+"""Bulk CSV import for clientes, ventas and egresos.
+
+Rows are validated with the same rules as the single-row handlers, the
+valid ones are loaded with COPY into a temporary staging table and merged
+into the real table with one INSERT ... SELECT in a single transaction.
+Rejected rows come back in the report with their line number:
+
+    python importer.py clientes socios.csv [--dry-run]
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import date, datetime
+
+import db
+
+
+# Columns written per table, in COPY order (the validators return these keys)
+IMPORT_COLUMNS = {
+    'clientes': [
+        'nombre', 'apellido', 'peso', 'telefono', 'precio_mensualidad',
+        'fecha_inicio', 'fecha_fin_mensualidad', 'duracion', 'estado_mensualidad'
+    ],
+    'ventas': ['producto', 'cantidad', 'precio_unitario', 'total'],
+    'egresos': ['fecha', 'descripcion', 'monto'],
+}
+
+# Written from the rows just inserted, in the same statement: imported
+# members get their first payment in the ledger like add_cliente does
+IMPORT_LEDGER = {
+    'clientes': """
+        INSERT INTO pagos_miembros (cliente_id, fecha_pago, monto, fecha_inicio, fecha_fin, duracion)
+        SELECT id, created_at::date, precio_mensualidad, fecha_inicio, fecha_fin_mensualidad, duracion
+        FROM nuevos
+    """,
+}
+
+# A member already registered with the same name and phone is rejected
+DUPLICATE_KEYS = {
+    'clientes': ['nombre', 'apellido', 'telefono'],
+}
+
+
+def read_csv(source):
+    """Yield (line number, row dict) from a CSV file or text with a header row"""
+    if isinstance(source, bytes):
+        source = source.decode('utf-8-sig')
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    reader = csv.DictReader(source)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        # Line numbers count the header, matching what a spreadsheet shows
+        yield reader.line_num, {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in row.items() if key
+        }
+
+
+def to_copy(value):
+    # COPY reads \N as NULL; an empty field would be an empty string
+    if value is None:
+        return '\\N'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def validate_rows(table, rows, validator):
+    """Split rows into a COPY buffer of valid rows and a rejection list"""
+    columns = IMPORT_COLUMNS[table]
+    keys = DUPLICATE_KEYS.get(table)
+    seen = set()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    valid = 0
+    rejected = []
+
+    for fila, data in rows:
+        try:
+            values = validator(data)
+        except (ValueError, TypeError) as e:
+            rejected.append({'fila': fila, 'error': str(e)})
+            continue
+
+        if keys:
+            key = tuple(str(values[column]).lower() for column in keys)
+            if key in seen:
+                rejected.append({'fila': fila, 'error': 'Registro duplicado en el archivo'})
+                continue
+            seen.add(key)
+
+        writer.writerow([fila] + [to_copy(values[column]) for column in columns])
+        valid += 1
+
+    buffer.seek(0)
+    return buffer, valid, rejected
+
+
+def import_rows(conn, table, rows, validator, dry_run=False):
+    """Validate, COPY and merge rows into table; returns the import report"""
+    columns = IMPORT_COLUMNS[table]
+    column_list = ', '.join(columns)
+    buffer, valid, rejected = validate_rows(table, rows, validator)
+    total = valid + len(rejected)
+    imported = 0
+
+    try:
+        cursor = conn.cursor()
+        if valid:
+            staging = f"import_{table}"
+            cursor.execute(f"""
+                CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+                SELECT 0 AS fila, {column_list} FROM {table} WITH NO DATA
+            """)
+            cursor.copy_expert(
+                f"COPY {staging} (fila, {column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+
+            duplicate = "FALSE"
+            keys = DUPLICATE_KEYS.get(table)
+            if keys:
+                duplicate = f"""EXISTS (
+                    SELECT 1 FROM {table} t
+                    WHERE {' AND '.join(f"lower(t.{k}) = lower(s.{k})" for k in keys)}
+                )"""
+                cursor.execute(f"SELECT fila FROM {staging} s WHERE {duplicate} ORDER BY fila")
+                rejected.extend(
+                    {'fila': fila, 'error': 'Registro ya existente'}
+                    for (fila,) in cursor.fetchall()
+                )
+
+            query = f"""
+                INSERT INTO {table} ({column_list})
+                SELECT {column_list} FROM {staging} s
+                WHERE NOT {duplicate}
+                ORDER BY fila
+            """
+            if table in IMPORT_LEDGER:
+                query = f"WITH nuevos AS ({query} RETURNING *) {IMPORT_LEDGER[table]}"
+            cursor.execute(query)
+            imported = cursor.rowcount
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+
+    rejected.sort(key=lambda item: item['fila'])
+    return {
+        'tabla': table,
+        'total': total,
+        'importados': 0 if dry_run else imported,
+        'validos': imported,
+        'rechazados': rejected,
+        'dry_run': dry_run,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importación masiva de ActiveGym')
+    parser.add_argument('tabla', choices=sorted(IMPORT_COLUMNS), help='Tabla destino')
+    parser.add_argument('archivo', help='Archivo CSV con encabezados')
+    parser.add_argument('--dry-run', action='store_true', help='Validar sin guardar cambios')
+    args = parser.parse_args(argv)
+
+    # Imported here so the validators stay defined next to the handlers
+    from app import IMPORT_VALIDATORS
+
+    conn = db.connect_direct()
+    try:
+        with open(args.archivo, newline='', encoding='utf-8-sig') as source:
+            report = import_rows(conn, args.tabla, read_csv(source),
+                                 IMPORT_VALIDATORS[args.tabla], args.dry_run)
+    finally:
+        conn.close()
+
+    for item in report['rechazados']:
+        print(f"Fila {item['fila']}: {item['error']}")
+    action = 'validados' if args.dry_run else 'importados'
+    print(f"✅ {report['validos']} registros {action}, {len(report['rechazados'])} rechazados ({args.tabla})")
+    return 1 if report['rechazados'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,416 @@
+"""Background jobs kept in Postgres (trabajos), so housekeeping leaves the requests.
+
+Jobs are rows in the trabajos table (migrations/0003_trabajos.sql). Workers
+claim the next due one with FOR UPDATE SKIP LOCKED, mark it en_curso and run its
+handler outside that transaction. A failed job is retried with exponential
+backoff up to max_intentos and then left as fallido; a job whose worker died
+goes back to the queue once its lease (JOBS_LEASE_SECONDS) runs out, so
+handlers must be safe to run twice.
+
+Handlers are registered with @jobs.handler('tipo') and periodic jobs with
+jobs.schedule('nombre', '0 0 * * *', 'tipo') (cron syntax, server local
+time). Each scheduled run is enqueued once however many workers are up:
+the one that moves trabajos_programados.proxima forward enqueues it.
+
+Workers run either as a separate process (python worker.py) or as one
+thread inside every web worker (JOBS_IN_PROCESS=1, the default). Queue
+wait, run time and outcome of every job go to /metrics.
+"""
+import json
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import psycopg2
+import psycopg2.extras
+
+import db
+import metrics
+
+
+JOBS_IN_PROCESS = os.environ.get('JOBS_IN_PROCESS', '1').lower() in ('1', 'true', 'si')
+# Seconds an idle worker waits before looking for due jobs again
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+# First retry delay in seconds; doubles on every attempt up to JOBS_BACKOFF_MAX
+JOBS_BACKOFF_SECONDS = float(os.environ.get('JOBS_BACKOFF_SECONDS', 10))
+JOBS_BACKOFF_MAX = float(os.environ.get('JOBS_BACKOFF_MAX', 3600))
+# A job en_curso for longer than this is assumed abandoned and run again
+JOBS_LEASE_SECONDS = float(os.environ.get('JOBS_LEASE_SECONDS', 600))
+JOBS_RETENTION_DAYS = float(os.environ.get('JOBS_RETENTION_DAYS', 7))
+
+ENQUEUE_SQL = """
+INSERT INTO trabajos (tipo, payload, clave, ejecutar_en, max_intentos)
+VALUES (%(tipo)s, %(payload)s, %(clave)s, COALESCE(%(ejecutar_en)s, now()), %(max_intentos)s)
+ON CONFLICT (clave) WHERE estado IN ('pendiente', 'en_curso') DO NOTHING
+RETURNING id
+"""
+
+CLAIM_SQL = """
+UPDATE trabajos SET estado = 'en_curso', intentos = intentos + 1, iniciado_en = now(), error = NULL
+WHERE id = (
+    SELECT id FROM trabajos
+    WHERE estado = 'pendiente' AND ejecutar_en <= now()
+    ORDER BY ejecutar_en, id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, tipo, payload, intentos, max_intentos,
+          EXTRACT(EPOCH FROM iniciado_en - ejecutar_en)::float8 AS espera
+"""
+
+REAP_SQL = """
+UPDATE trabajos SET estado = 'pendiente', ejecutar_en = now(),
+       error = 'El worker no terminó el trabajo a tiempo'
+WHERE id IN (
+    SELECT id FROM trabajos
+    WHERE estado = 'en_curso' AND iniciado_en < now() - %s * interval '1 second'
+    FOR UPDATE SKIP LOCKED
+)
+"""
+
+
+class JobError(Exception):
+    """Raised by a handler to fail the job without retrying it"""
+
+
+# Handlers and schedules
+
+HANDLERS = {}
+SCHEDULES = {}
+
+
+def handler(tipo):
+    """Register fn(payload) as the handler of a job type"""
+    def decorator(fn):
+        HANDLERS[tipo] = fn
+        return fn
+    return decorator
+
+
+def schedule(nombre, expresion, tipo=None, payload=None):
+    """Run a job type periodically; expresion is 'min hour day month weekday'"""
+    SCHEDULES[nombre] = (CronExpression(expresion), tipo or nombre, payload or {})
+
+
+class CronExpression:
+    """Five-field cron expression: *, */n, a-b, a-b/n and comma lists"""
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, text):
+        self.text = text
+        fields = text.split()
+        if len(fields) != 5:
+            raise ValueError(f'Expresión cron inválida: {text}')
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES))
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _parse(self, field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < low or end > high or start > end:
+                raise ValueError(f'Expresión cron inválida: {self.text}')
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment):
+        # cron weekdays start on Sunday (0); Python's on Monday
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        """First matching minute strictly after moment (naive local time)"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=28) + timedelta(days=4)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f'La expresión cron nunca se cumple: {self.text}')
+
+
+# Queue
+
+def enqueue(tipo, payload=None, clave=None, ejecutar_en=None, max_intentos=None, cursor=None):
+    """Add a job; returns its id, or None when one with the same clave is pending.
+
+    With cursor the job is inserted in the caller's transaction, so it only
+    exists if that transaction commits.
+    """
+    params = {
+        'tipo': tipo,
+        'payload': psycopg2.extras.Json(payload or {}),
+        'clave': clave,
+        'ejecutar_en': ejecutar_en,
+        'max_intentos': max_intentos or JOBS_MAX_ATTEMPTS,
+    }
+    if cursor is not None:
+        cursor.execute(ENQUEUE_SQL, params)
+        row = cursor.fetchone()
+    else:
+        conn = db.get_db_connection()
+        try:
+            with conn:
+                job_cursor = conn.cursor()
+                job_cursor.execute(ENQUEUE_SQL, params)
+                row = job_cursor.fetchone()
+        finally:
+            conn.close()
+    if row is None:
+        return None
+    return row['id'] if isinstance(row, dict) else row[0]
+
+
+def backoff(intentos):
+    """Delay before retry number intentos, with jitter so retries spread out"""
+    delay = min(JOBS_BACKOFF_MAX, JOBS_BACKOFF_SECONDS * 2 ** (intentos - 1))
+    return delay * random.uniform(0.9, 1.1)
+
+
+def register_schedules(cursor, now=None):
+    """Create or update the trabajos_programados rows of SCHEDULES.
+
+    New schedules (and ones whose expression changed) first run at their
+    next occurrence, so a deploy in the middle of the day does not start
+    the nightly jobs at peak hours.
+    """
+    now = now or datetime.now().astimezone()
+    for nombre, (cron, _, _) in SCHEDULES.items():
+        following = cron.next_after(now.replace(tzinfo=None)).astimezone()
+        cursor.execute("""
+            INSERT INTO trabajos_programados (nombre, expresion, proxima) VALUES (%s, %s, %s)
+            ON CONFLICT (nombre) DO UPDATE SET expresion = EXCLUDED.expresion, proxima = EXCLUDED.proxima
+            WHERE trabajos_programados.expresion <> EXCLUDED.expresion
+        """, (nombre, cron.text, following))
+
+
+def enqueue_due(cursor, now=None):
+    """Enqueue every scheduled run that is due; returns how many"""
+    now = now or datetime.now().astimezone()
+    enqueued = 0
+    for nombre, (cron, tipo, payload) in SCHEDULES.items():
+        following = cron.next_after(now.replace(tzinfo=None)).astimezone()
+        # Only the worker whose UPDATE matches enqueues this run
+        cursor.execute("""
+            UPDATE trabajos_programados SET proxima = %s, ultima = %s
+            WHERE nombre = %s AND proxima <= %s
+            RETURNING proxima
+        """, (following, now, nombre, now))
+        if cursor.fetchone() is None:
+            continue
+        enqueue(tipo, payload, clave=f'programado:{nombre}', cursor=cursor)
+        enqueued += 1
+    return enqueued
+
+
+# Workers
+
+class Worker:
+    """Claims and runs due jobs on a dedicated connection"""
+
+    def __init__(self, poll_interval=JOBS_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.pid = os.getpid()
+        self.stopping = threading.Event()
+        self.conn = None
+        self._last_maintenance = 0.0
+
+    def connection(self):
+        """The worker's connection; `with` it for one transaction"""
+        if self.conn is None or self.conn.closed:
+            self.conn = db.connect_direct()
+        return self.conn
+
+    def cursor(self):
+        return self.connection().cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    def maintenance(self):
+        """Scheduled runs and abandoned jobs, at most once per poll interval"""
+        if time.monotonic() - self._last_maintenance < self.poll_interval:
+            return
+        self._last_maintenance = time.monotonic()
+        with self.connection():
+            cursor = self.cursor()
+            enqueue_due(cursor)
+            cursor.execute(REAP_SQL, (JOBS_LEASE_SECONDS,))
+            if cursor.rowcount:
+                print(f"⚠️  {cursor.rowcount} trabajos abandonados vuelven a la cola")
+
+    def claim(self):
+        with self.connection():
+            cursor = self.cursor()
+            cursor.execute(CLAIM_SQL)
+            return cursor.fetchone()
+
+    def finish(self, job, error=None, retry=True):
+        with self.connection():
+            self._finish(self.cursor(), job, error, retry)
+
+    def _finish(self, cursor, job, error, retry):
+        if error is None:
+            cursor.execute("UPDATE trabajos SET estado = 'hecho', terminado_en = now() WHERE id = %s", (job['id'],))
+        elif retry and job['intentos'] < job['max_intentos']:
+            cursor.execute("""
+                UPDATE trabajos SET estado = 'pendiente', error = %s,
+                       ejecutar_en = now() + %s * interval '1 second'
+                WHERE id = %s
+            """, (error, backoff(job['intentos']), job['id']))
+        else:
+            cursor.execute("""
+                UPDATE trabajos SET estado = 'fallido', error = %s, terminado_en = now() WHERE id = %s
+            """, (error, job['id']))
+
+    def run_job(self, job):
+        tipo = job['tipo']
+        metrics.get_registry().observe('job_wait_seconds', (tipo,), max(0.0, job['espera']))
+        start = time.perf_counter()
+        fn = HANDLERS.get(tipo)
+        try:
+            if fn is None:
+                raise JobError(f'Tipo de trabajo desconocido: {tipo}')
+            fn(job['payload'])
+        except JobError as e:
+            self.finish(job, str(e), retry=False)
+            resultado = 'fallido'
+        except Exception as e:
+            print(f"Error en el trabajo {job['id']} ({tipo}): {e}")
+            self.finish(job, ''.join(traceback.format_exception_only(type(e), e)).strip())
+            resultado = 'reintento' if job['intentos'] < job['max_intentos'] else 'fallido'
+        else:
+            self.finish(job)
+            resultado = 'hecho'
+        registry = metrics.get_registry()
+        registry.observe('job_duration_seconds', (tipo,), time.perf_counter() - start)
+        registry.inc('jobs_total', (tipo, resultado))
+        return resultado
+
+    def run_pending(self, limit=None):
+        """Run due jobs until none is left (or limit); returns how many ran"""
+        ran = 0
+        while limit is None or ran < limit:
+            job = self.claim()
+            if job is None:
+                break
+            self.run_job(job)
+            ran += 1
+        return ran
+
+    def run_forever(self):
+        with self.connection():
+            register_schedules(self.cursor())
+        while not self.stopping.is_set():
+            try:
+                self.maintenance()
+                if not self.run_pending():
+                    self.stopping.wait(self.poll_interval)
+            except psycopg2.Error as e:
+                # Database restarted or unreachable: reconnect after a pause
+                print(f"Error en la cola de trabajos: {e}")
+                self.close()
+                self.stopping.wait(max(self.poll_interval, 5))
+        self.close()
+
+    def stop(self):
+        self.stopping.set()
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except psycopg2.Error:
+                pass
+            self.conn = None
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_thread():
+    """Run a Worker in a daemon thread of this process (once per pid)"""
+    global _worker
+    pid = os.getpid()
+    if _worker is None or _worker.pid != pid:
+        with _worker_lock:
+            if _worker is None or _worker.pid != pid:
+                _worker = Worker()
+                threading.Thread(target=_worker.run_forever, name='jobs', daemon=True).start()
+
+
+def init_app(app):
+    if JOBS_IN_PROCESS:
+        # Started on the first request, after gunicorn has forked the worker
+        app.before_request(start_thread)
+
+
+def queue_stats():
+    """Jobs per type and state, plus the latest failures"""
+    conn = db.get_db_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT tipo, estado, COUNT(*) AS cantidad,
+               MIN(ejecutar_en) FILTER (WHERE estado = 'pendiente') AS proximo
+        FROM trabajos GROUP BY 1, 2 ORDER BY 1, 2
+    """)
+    tipos = cursor.fetchall()
+    cursor.execute("""
+        SELECT id, tipo, payload, intentos, error, terminado_en FROM trabajos
+        WHERE estado = 'fallido' ORDER BY terminado_en DESC LIMIT 20
+    """)
+    fallidos = cursor.fetchall()
+    cursor.execute("SELECT nombre, expresion, proxima, ultima FROM trabajos_programados ORDER BY nombre")
+    programados = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return {'tipos': tipos, 'fallidos': fallidos, 'programados': programados}
+
+
+@handler('trabajos-limpieza')
+def purge(payload):
+    """Delete finished jobs older than JOBS_RETENTION_DAYS"""
+    conn = db.get_db_connection()
+    try:
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM trabajos
+                WHERE estado IN ('hecho', 'fallido') AND terminado_en < now() - %s * interval '1 day'
+            """, (payload.get('dias', JOBS_RETENTION_DAYS),))
+    finally:
+        conn.close()
+
+
+schedule('trabajos-limpieza', '30 3 * * *')
+
+
+def parse_payload(text):
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        raise ValueError('El payload debe ser JSON')
+    if not isinstance(payload, dict):
+        raise ValueError('El payload debe ser un objeto JSON')
+    return payload
@@ -0,0 +1,375 @@
+"""Per-request instrumentation: DB and serialization time, Server-Timing, /metrics.
+
+Every request records how long it waited for a pooled connection, how many
+queries it ran and for how long, and how long the JSON encoding took. The
+numbers go back to the browser in a Server-Timing header and into
+per-endpoint counters and histograms served in the Prometheus text format.
+
+gunicorn workers are separate processes, so each one periodically writes
+its totals to METRICS_DIR/worker-<pid>.json and /metrics adds up every
+file. Files of workers that are gone are removed when a new worker starts;
+Prometheus sees that as a counter reset, which rate() already handles.
+Bodies streamed after the response started (exports) are not included.
+
+/metrics has no authentication, like most Prometheus targets: restrict it
+at the proxy if the endpoint names and request counts should stay private.
+The job metrics of a separate `python worker.py run` service only reach
+the web /metrics if both share METRICS_DIR (same host); on Render each
+service has its own disk, so the worker serves them on WORKER_METRICS_PORT.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import wsgiref.simple_server
+
+import psycopg2.extensions
+from flask import g, request
+
+import slow_queries
+
+
+METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'activegym-metrics')
+# Seconds between writes of this worker's totals to METRICS_DIR
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'activegym_'
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Background jobs wait and run for much longer than requests
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+# name -> (type, help, label names, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests answered', ('endpoint', 'method', 'status'), None),
+    'http_request_duration_seconds': ('histogram', 'Time from the first hook to the response',
+                                      ('endpoint', 'method'), SECONDS_BUCKETS),
+    'db_time_seconds': ('histogram', 'Time spent in queries per request', ('endpoint',), SECONDS_BUCKETS),
+    'db_queries': ('histogram', 'Queries run per request', ('endpoint',), QUERY_BUCKETS),
+    'db_connect_seconds_total': ('counter', 'Time spent waiting for a pooled connection', ('endpoint',), None),
+    'serialize_seconds_total': ('counter', 'Time spent encoding JSON responses', ('endpoint',), None),
+    'jobs_total': ('counter', 'Background jobs run, by outcome', ('tipo', 'resultado'), None),
+    'job_wait_seconds': ('histogram', 'Time a job waited in the queue after it was due', ('tipo',), JOB_BUCKETS),
+    'job_duration_seconds': ('histogram', 'Time a job took to run', ('tipo',), JOB_BUCKETS),
+    'events_connections_total': ('counter', 'Event streams opened and how they ended', ('resultado',), None),
+    'events_sent_total': ('counter', 'Server-Sent Events written, per stream', ('evento',), None),
+}
+
+# Timings shown in Server-Timing, in this order
+SERVER_TIMINGS = (('db_connect', 'db-connect'), ('db', 'db'), ('serialize', 'serialize'))
+
+
+def add(name, ms, count=1):
+    """Accumulate a timing for the current request (no-op outside one)"""
+    try:
+        timings = g.get('timings')
+    except RuntimeError:
+        return
+    if timings is None:
+        return
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [ms, count]
+    else:
+        entry[0] += ms
+        entry[1] += count
+
+
+class Timer:
+    """with Timer('serialize'): ... adds the block's duration to the request"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        add(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+class TimedCursorMixin:
+    """Adds the duration of every statement to the request's 'db' timing.
+
+    Statements over SLOW_QUERY_MS also go to the slow-query log.
+    """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            add('db', ms)
+            if ms >= slow_queries.SLOW_QUERY_MS:
+                slow_queries.record(self, query, vars, ms)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            add('db', ms)
+            if ms >= slow_queries.SLOW_QUERY_MS:
+                slow_queries.record(self, query, None, ms)
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            add('db', (time.perf_counter() - start) * 1000)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        # Named (server-side) cursors go back to the server for every batch
+        if not self.name:
+            return super().fetchmany(size)
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size)
+        finally:
+            add('db', (time.perf_counter() - start) * 1000, count=0)
+
+
+_cursor_classes = {}
+
+
+def timed_cursor(base=None):
+    """Timed subclass of a cursor class (plain cursor when base is None)"""
+    base = base or psycopg2.extensions.cursor
+    if issubclass(base, TimedCursorMixin):
+        return base
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        cls = _cursor_classes[base] = type(f'Timed{base.__name__}', (TimedCursorMixin, base), {})
+    return cls
+
+
+class Registry:
+    """This worker's counters and histograms, written to METRICS_DIR"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.values = {}
+        self.dirty = False
+        self.path = os.path.join(METRICS_DIR, f'worker-{self.pid}.json')
+        self._flusher = None
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+            self.dirty = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][3]
+        key = (name, labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                # One count per bucket plus +Inf, then sum and count
+                series = self.values[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(buckets)] += 1
+            series[-2] += value
+            series[-1] += 1
+            self.dirty = True
+
+    def start_flusher(self):
+        if self._flusher is None:
+            remove_dead_workers()
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = [[name, list(labels), list(value) if isinstance(value, list) else value]
+                    for (name, labels), value in self.values.items()]
+            self.dirty = False
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+def remove_dead_workers(prefix='worker-'):
+    """Delete the prefix<pid>.json files of processes that no longer exist"""
+    try:
+        names = os.listdir(METRICS_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not (name.startswith(prefix) and name.endswith('.json')):
+            continue
+        pid = name[len(prefix):-len('.json')]
+        # Not a worker file (e.g. a copy someone left in the folder)
+        if not pid.isdigit():
+            continue
+        pid = int(pid)
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            try:
+                os.remove(os.path.join(METRICS_DIR, name))
+            except FileNotFoundError:
+                pass
+        except PermissionError:
+            pass
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """This process's registry, created lazily after gunicorn forks"""
+    global _registry
+    pid = os.getpid()
+    if _registry is None or _registry.pid != pid:
+        with _registry_lock:
+            if _registry is None or _registry.pid != pid:
+                _registry = Registry()
+                _registry.start_flusher()
+    return _registry
+
+
+def start_request():
+    g.timings = {}
+    g.request_start = time.perf_counter()
+
+
+def finish_request(response):
+    """Record the request and answer with its Server-Timing header"""
+    timings = g.pop('timings', None)
+    if timings is None:
+        return response
+    total = (time.perf_counter() - g.pop('request_start')) * 1000
+
+    parts = []
+    for name, metric in SERVER_TIMINGS:
+        ms, count = timings.get(name, (0.0, 0))
+        if name == 'db':
+            parts.append(f'{metric};desc="{count} consultas";dur={ms:.2f}')
+        elif ms:
+            parts.append(f'{metric};dur={ms:.2f}')
+    parts.append(f'total;dur={total:.2f}')
+    response.headers['Server-Timing'] = ', '.join(parts)
+
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    registry = get_registry()
+    db_ms, queries = timings.get('db', (0.0, 0))
+    registry.inc('http_requests_total', (endpoint, request.method, str(response.status_code)))
+    registry.observe('http_request_duration_seconds', (endpoint, request.method), total / 1000)
+    registry.observe('db_time_seconds', (endpoint,), db_ms / 1000)
+    registry.observe('db_queries', (endpoint,), queries)
+    if 'db_connect' in timings:
+        registry.inc('db_connect_seconds_total', (endpoint,), timings['db_connect'][0] / 1000)
+    if 'serialize' in timings:
+        registry.inc('serialize_seconds_total', (endpoint,), timings['serialize'][0] / 1000)
+    return response
+
+
+def collect():
+    """Totals of every worker: {(name, labels): value}"""
+    get_registry().flush()
+    merged = {}
+    try:
+        names = sorted(os.listdir(METRICS_DIR))
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not (name.startswith('worker-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Removed or being replaced by its worker right now
+            continue
+        for metric, labels, value in data:
+            key = (metric, tuple(labels))
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+    return merged
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Prometheus text exposition of collect()"""
+    merged = collect()
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+        full = PREFIX + name
+        lines.append(f'# HELP {full} {help_text}')
+        lines.append(f'# TYPE {full} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{full}{_labels(label_names, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{full}_bucket{_labels(label_names, labels, ("le", str(le)))} {cumulative}')
+            lines.append(f'{full}_sum{_labels(label_names, labels)} {_number(value[-2])}')
+            lines.append(f'{full}_count{_labels(label_names, labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    app.before_request(start_request)
+    app.after_request(finish_request)
+
+
+class _QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port):
+    """Serve render() on its own port from a daemon thread (python worker.py run)"""
+    def application(environ, start_response):
+        start_response('200 OK', [('Content-Type', CONTENT_TYPE)])
+        return [render().encode('utf-8')]
+
+    server = wsgiref.simple_server.make_server('', port, application, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
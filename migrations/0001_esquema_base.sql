@@ -0,0 +1,261 @@
+-- ActiveGym - Esquema base
+-- Aplicar con `python schema.py migrate` (ver schema.py). Es idempotente: sobre
+-- una base creada con los antiguos database_setup.sql / users_setup.sql agrega
+-- lo que falte sin tocar los datos.
+
+-- Tabla de clientes/miembros
+CREATE TABLE IF NOT EXISTS clientes (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100),
+    peso DECIMAL(6,2),
+    telefono VARCHAR(20),
+    email VARCHAR(100),
+    fecha_inicio DATE NOT NULL,
+    fecha_fin_mensualidad DATE NOT NULL,
+    duracion INTEGER,
+    estado_mensualidad VARCHAR(20) DEFAULT 'ACTIVO',
+    plan_mensualidad VARCHAR(50),
+    precio_mensualidad DECIMAL(10,2),
+    observaciones TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Columnas que app.py usa y el script original no creaba
+ALTER TABLE clientes
+    ADD COLUMN IF NOT EXISTS apellido VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS peso DECIMAL(6,2),
+    ADD COLUMN IF NOT EXISTS duracion INTEGER;
+
+-- Libro de pagos de miembros: una fila por alta o renovación, solo inserción.
+-- Lo escriben add_cliente y renovar_cliente en la misma transacción que clientes.
+CREATE TABLE IF NOT EXISTS pagos_miembros (
+    id SERIAL PRIMARY KEY,
+    cliente_id INTEGER REFERENCES clientes(id) ON DELETE CASCADE,
+    fecha_pago DATE NOT NULL,
+    monto DECIMAL(10,2) NOT NULL,
+    metodo_pago VARCHAR(50),
+    observaciones TEXT,
+    fecha_inicio DATE,
+    fecha_fin DATE,
+    duracion INTEGER,
+    tipo VARCHAR(20) NOT NULL DEFAULT 'mensualidad',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE pagos_miembros
+    ADD COLUMN IF NOT EXISTS fecha_inicio DATE,
+    ADD COLUMN IF NOT EXISTS fecha_fin DATE,
+    ADD COLUMN IF NOT EXISTS duracion INTEGER,
+    ADD COLUMN IF NOT EXISTS tipo VARCHAR(20) NOT NULL DEFAULT 'mensualidad';
+
+-- Tabla de usuarios diarios: la app registra grupos (cantidad × precio por
+-- cliente); nombre y precio solo los llenan las importaciones antiguas
+CREATE TABLE IF NOT EXISTS usuarios_diarios (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(100),
+    telefono VARCHAR(20),
+    fecha_entrada DATE NOT NULL DEFAULT CURRENT_DATE,
+    hora_entrada TIME,
+    precio DECIMAL(10,2),
+    cantidad_clientes INTEGER,
+    precio_por_cliente DECIMAL(10,2),
+    total DECIMAL(10,2),
+    metodo_pago VARCHAR(50),
+    observaciones TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE usuarios_diarios
+    ADD COLUMN IF NOT EXISTS cantidad_clientes INTEGER,
+    ADD COLUMN IF NOT EXISTS precio_por_cliente DECIMAL(10,2),
+    ADD COLUMN IF NOT EXISTS total DECIMAL(10,2),
+    ALTER COLUMN nombre DROP NOT NULL,
+    ALTER COLUMN precio DROP NOT NULL,
+    ALTER COLUMN fecha_entrada SET DEFAULT CURRENT_DATE;
+
+-- Tabla de ventas/productos (la app guarda el total en `total`)
+CREATE TABLE IF NOT EXISTS ventas (
+    id SERIAL PRIMARY KEY,
+    producto VARCHAR(100) NOT NULL,
+    cantidad INTEGER NOT NULL,
+    precio_unitario DECIMAL(10,2) NOT NULL,
+    precio_total DECIMAL(10,2),
+    total DECIMAL(10,2),
+    fecha_venta DATE NOT NULL DEFAULT CURRENT_DATE,
+    metodo_pago VARCHAR(50),
+    observaciones TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE ventas
+    ADD COLUMN IF NOT EXISTS total DECIMAL(10,2),
+    ALTER COLUMN precio_total DROP NOT NULL,
+    ALTER COLUMN fecha_venta SET DEFAULT CURRENT_DATE;
+
+-- Tabla de egresos
+CREATE TABLE IF NOT EXISTS egresos (
+    id SERIAL PRIMARY KEY,
+    fecha DATE NOT NULL,
+    descripcion VARCHAR(200) NOT NULL,
+    monto DECIMAL(10,2) NOT NULL,
+    categoria VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de estadísticas diarias (el desglose por origen está en 0002_estadisticas.sql)
+CREATE TABLE IF NOT EXISTS estadisticas_diarias (
+    id SERIAL PRIMARY KEY,
+    fecha DATE UNIQUE NOT NULL,
+    total_miembros INTEGER DEFAULT 0,
+    usuarios_diarios INTEGER DEFAULT 0,
+    ventas INTEGER DEFAULT 0,
+    ingresos_totales DECIMAL(10,2) DEFAULT 0,
+    egresos_totales DECIMAL(10,2) DEFAULT 0,
+    ganancias_diarias DECIMAL(10,2) DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de usuarios/socios del SISTEMA (acceso al panel de administración).
+-- Los miembros del gimnasio están en 'clientes' y NO tienen acceso al sistema.
+CREATE TABLE IF NOT EXISTS usuarios (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    usuario VARCHAR(50) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    rol VARCHAR(20) DEFAULT 'socio',
+    activo BOOLEAN DEFAULT true,
+    sesiones_desde TIMESTAMPTZ NOT NULL DEFAULT 'epoch',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Los tokens de sesión emitidos antes de esta fecha ya no son válidos (logout / cambio de contraseña)
+ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS sesiones_desde TIMESTAMPTZ NOT NULL DEFAULT 'epoch';
+
+-- Insertar el administrador principal del SISTEMA
+-- (contraseña con hash scrypt; las contraseñas en texto plano que queden se
+-- migran al iniciar sesión o con: python auth.py hash-passwords)
+INSERT INTO usuarios (nombre, usuario, password, rol)
+VALUES ('Administrador Principal', 'administradorprincipal',
+        'scrypt:32768:8:1$tBVolP7QVnrtKR9G$81a6dd06bbe915f3fe5abbcacb9122eaffdcdbb2c93e689d2039b7d777d6b781fa7a94ca2abeaa0b52e85b20321d72a2ad54a96006e1d4654d7ddc9df16eaee5',
+        'admin')
+ON CONFLICT (usuario) DO NOTHING;
+
+-- Índices, uno por cada consulta de app.py que los necesita.
+-- Listados paginados (ORDER BY created_at DESC, id DESC), los rangos por día
+-- de las estadísticas (created_at >= inicio AND created_at < fin) y las
+-- exportaciones
+CREATE INDEX IF NOT EXISTS idx_clientes_created ON clientes(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_usuarios_diarios_created ON usuarios_diarios(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_ventas_created ON ventas(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_egresos_created ON egresos(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_usuarios_created ON usuarios(created_at DESC, id DESC);
+-- /api/ventas?producto=
+CREATE INDEX IF NOT EXISTS idx_ventas_producto_created ON ventas(producto, created_at DESC, id DESC);
+-- Filtros por fecha del registro
+CREATE INDEX IF NOT EXISTS idx_usuarios_diarios_fecha ON usuarios_diarios(fecha_entrada);
+CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha_venta);
+CREATE INDEX IF NOT EXISTS idx_egresos_fecha ON egresos(fecha);
+-- Vencimientos (/api/clientes/vencimientos pagina por (fecha_fin_mensualidad, id),
+-- la lista de renovación y el filtro por estado); reemplaza al índice de una columna
+CREATE INDEX IF NOT EXISTS idx_clientes_fecha_fin_id ON clientes(fecha_fin_mensualidad, id);
+DROP INDEX IF EXISTS idx_clientes_fecha_fin;
+-- Historial por miembro y sumas por período (index-only scan sobre fecha_pago)
+CREATE INDEX IF NOT EXISTS idx_pagos_miembros_cliente ON pagos_miembros(cliente_id, fecha_pago DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pagos_miembros_fecha ON pagos_miembros(fecha_pago) INCLUDE (monto, tipo);
+CREATE INDEX IF NOT EXISTS idx_usuarios_rol ON usuarios(rol);
+-- Duplicaban el índice de la restricción UNIQUE de la misma columna
+DROP INDEX IF EXISTS idx_estadisticas_fecha;
+DROP INDEX IF EXISTS idx_usuarios_usuario;
+
+-- Búsqueda de miembros (/api/clientes/search): trigramas y prefijos.
+-- Las expresiones deben coincidir con SEARCH_NAME_SQL / SEARCH_PHONE_SQL en app.py
+CREATE INDEX IF NOT EXISTS idx_clientes_nombre_prefix ON clientes (lower(nombre) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_clientes_apellido_prefix ON clientes (lower(apellido) text_pattern_ops);
+-- pg_trgm viene con PostgreSQL en Render; en un servidor local sin las
+-- extensiones contrib solo falla la búsqueda por subcadena
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        RAISE WARNING 'pg_trgm no está disponible: /api/clientes/search solo funcionará por prefijo';
+        RETURN;
+    END IF;
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_clientes_nombre_trgm
+        ON clientes USING gin ((lower(nombre || ' ' || coalesce(apellido, ''))) gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_clientes_telefono_digits
+        ON clientes USING gin ((regexp_replace(coalesce(telefono, ''), '[^0-9]', '', 'g')) gin_trgm_ops);
+END;
+$$;
+
+-- Versión por recurso para ETag / Last-Modified (GET condicionales, en UTC).
+-- Un trigger por sentencia incrementa la versión en cada escritura.
+CREATE TABLE IF NOT EXISTS versiones_recursos (
+    recurso VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    modificado TIMESTAMP NOT NULL DEFAULT date_trunc('second', now() AT TIME ZONE 'UTC')
+);
+
+INSERT INTO versiones_recursos (recurso)
+VALUES ('clientes'), ('usuarios_diarios'), ('ventas'), ('egresos'), ('estadisticas_diarias'), ('usuarios'),
+       ('pagos_miembros')
+ON CONFLICT (recurso) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION versiones_incrementar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO versiones_recursos AS v (recurso, version, modificado)
+    VALUES (TG_TABLE_NAME, 1, date_trunc('second', now() AT TIME ZONE 'UTC'))
+    ON CONFLICT (recurso) DO UPDATE
+        SET version = v.version + 1, modificado = EXCLUDED.modificado;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS versiones_clientes ON clientes;
+CREATE TRIGGER versiones_clientes AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON clientes
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+DROP TRIGGER IF EXISTS versiones_usuarios_diarios ON usuarios_diarios;
+CREATE TRIGGER versiones_usuarios_diarios AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON usuarios_diarios
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+DROP TRIGGER IF EXISTS versiones_ventas ON ventas;
+CREATE TRIGGER versiones_ventas AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ventas
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+DROP TRIGGER IF EXISTS versiones_egresos ON egresos;
+CREATE TRIGGER versiones_egresos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON egresos
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+DROP TRIGGER IF EXISTS versiones_estadisticas_diarias ON estadisticas_diarias;
+CREATE TRIGGER versiones_estadisticas_diarias AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON estadisticas_diarias
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+DROP TRIGGER IF EXISTS versiones_usuarios ON usuarios;
+CREATE TRIGGER versiones_usuarios AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON usuarios
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+DROP TRIGGER IF EXISTS versiones_pagos_miembros ON pagos_miembros;
+CREATE TRIGGER versiones_pagos_miembros AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pagos_miembros
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_incrementar();
+
+-- El libro de pagos no admite modificaciones
+CREATE OR REPLACE FUNCTION pagos_miembros_inmutable() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'pagos_miembros es de solo inserción; registre un pago de ajuste';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pagos_miembros_sin_update ON pagos_miembros;
+CREATE TRIGGER pagos_miembros_sin_update BEFORE UPDATE ON pagos_miembros
+    FOR EACH STATEMENT EXECUTE FUNCTION pagos_miembros_inmutable();
+
+-- Miembros anteriores al libro: se registra su período actual una sola vez.
+-- Si fue renovado, el pago se fecha al inicio del período (sin pasar de la
+-- última modificación); si no, el día del alta.
+INSERT INTO pagos_miembros (cliente_id, fecha_pago, monto, fecha_inicio, fecha_fin, duracion)
+SELECT c.id,
+       LEAST(GREATEST(c.created_at::date, c.fecha_inicio), COALESCE(c.updated_at, c.created_at)::date),
+       c.precio_mensualidad, c.fecha_inicio, c.fecha_fin_mensualidad, c.duracion
+FROM clientes c
+WHERE c.precio_mensualidad IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM pagos_miembros p WHERE p.cliente_id = c.id)
+ORDER BY c.id;
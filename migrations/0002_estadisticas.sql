@@ -0,0 +1,372 @@
+-- ActiveGym - Estadísticas diarias mantenidas de forma incremental
+-- Se aplica después de 0001_esquema_base.sql. Luego reconstruir el historial con:
+--   python stats.py backfill <desde> <hasta>
+--
+-- Cada INSERT/UPDATE/DELETE sobre clientes, pagos_miembros, usuarios_diarios,
+-- ventas y egresos aplica un delta a la fila del día en estadisticas_diarias
+-- (triggers por sentencia con tablas de transición, así una carga masiva hace
+-- una sola actualización por día). El dashboard solo lee la fila de hoy; los reportes
+-- por mes o año leen estadisticas_mensuales (al final de este archivo).
+
+-- Desglose por origen; las columnas existentes se mantienen como totales derivados
+ALTER TABLE estadisticas_diarias
+    ADD COLUMN IF NOT EXISTS nuevos_miembros INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS ingresos_miembros DECIMAL(12,2) DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS clientes_diarios INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS ingresos_diarios DECIMAL(12,2) DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS ingresos_ventas DECIMAL(12,2) DEFAULT 0;
+
+-- Miembros por fecha de vencimiento: total y vencidos sin recorrer clientes
+CREATE TABLE IF NOT EXISTS clientes_vencimientos (
+    fecha_fin_mensualidad DATE PRIMARY KEY,
+    cantidad INTEGER NOT NULL DEFAULT 0
+);
+
+-- Lista diaria de renovaciones: una foto por día de los miembros a llamar
+-- (vencidos hace poco o por vencer), generada por la primera consulta del día
+CREATE TABLE IF NOT EXISTS listas_renovacion (
+    fecha DATE PRIMARY KEY,
+    generada_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+    clientes JSONB NOT NULL
+);
+
+-- Suma un delta a la fila de un día (la crea si no existe)
+CREATE OR REPLACE FUNCTION estadisticas_sumar(
+    p_fecha DATE,
+    p_nuevos_miembros INTEGER DEFAULT 0,
+    p_ingresos_miembros NUMERIC DEFAULT 0,
+    p_clientes_diarios INTEGER DEFAULT 0,
+    p_ingresos_diarios NUMERIC DEFAULT 0,
+    p_ventas INTEGER DEFAULT 0,
+    p_ingresos_ventas NUMERIC DEFAULT 0,
+    p_egresos NUMERIC DEFAULT 0
+) RETURNS void AS $$
+    INSERT INTO estadisticas_diarias AS s (
+        fecha, total_miembros, nuevos_miembros, ingresos_miembros, clientes_diarios,
+        ingresos_diarios, ventas, ingresos_ventas, egresos_totales,
+        usuarios_diarios, ingresos_totales, ganancias_diarias
+    )
+    VALUES (
+        p_fecha,
+        (SELECT COALESCE(SUM(cantidad), 0) FROM clientes_vencimientos),
+        p_nuevos_miembros, p_ingresos_miembros, p_clientes_diarios,
+        p_ingresos_diarios, p_ventas, p_ingresos_ventas, p_egresos,
+        p_nuevos_miembros + p_clientes_diarios,
+        p_ingresos_miembros + p_ingresos_diarios + p_ingresos_ventas,
+        p_ingresos_miembros + p_ingresos_diarios + p_ingresos_ventas - p_egresos
+    )
+    ON CONFLICT (fecha) DO UPDATE SET
+        nuevos_miembros = s.nuevos_miembros + EXCLUDED.nuevos_miembros,
+        ingresos_miembros = s.ingresos_miembros + EXCLUDED.ingresos_miembros,
+        clientes_diarios = s.clientes_diarios + EXCLUDED.clientes_diarios,
+        ingresos_diarios = s.ingresos_diarios + EXCLUDED.ingresos_diarios,
+        ventas = s.ventas + EXCLUDED.ventas,
+        ingresos_ventas = s.ingresos_ventas + EXCLUDED.ingresos_ventas,
+        egresos_totales = s.egresos_totales + EXCLUDED.egresos_totales,
+        usuarios_diarios = s.usuarios_diarios + EXCLUDED.usuarios_diarios,
+        ingresos_totales = s.ingresos_totales + EXCLUDED.ingresos_totales,
+        ganancias_diarias = s.ganancias_diarias + EXCLUDED.ganancias_diarias;
+$$ LANGUAGE sql;
+
+-- Ventas: cantidad e ingresos por día de created_at
+CREATE OR REPLACE FUNCTION estadisticas_ventas_cambio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_ventas => d.n, p_ingresos_ventas => d.total)
+        FROM (SELECT created_at::date AS fecha, COUNT(*)::int AS n, COALESCE(SUM(total), 0) AS total
+              FROM nuevas GROUP BY 1 ORDER BY 1) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_ventas => -d.n, p_ingresos_ventas => -d.total)
+        FROM (SELECT created_at::date AS fecha, COUNT(*)::int AS n, COALESCE(SUM(total), 0) AS total
+              FROM anteriores GROUP BY 1 ORDER BY 1) d;
+    ELSE
+        PERFORM estadisticas_sumar(d.fecha, p_ventas => d.n, p_ingresos_ventas => d.total)
+        FROM (SELECT fecha, SUM(n)::int AS n, SUM(total) AS total
+              FROM (SELECT a.created_at::date AS fecha, -1 AS n, -COALESCE(a.total, 0) AS total
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE (a.created_at, a.total) IS DISTINCT FROM (n.created_at, n.total)
+                    UNION ALL
+                    SELECT n.created_at::date, 1, COALESCE(n.total, 0)
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE (a.created_at, a.total) IS DISTINCT FROM (n.created_at, n.total)) c
+              GROUP BY 1 ORDER BY 1) d;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Usuarios diarios: personas e ingresos por día de created_at
+CREATE OR REPLACE FUNCTION estadisticas_usuarios_diarios_cambio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_clientes_diarios => d.n, p_ingresos_diarios => d.total)
+        FROM (SELECT created_at::date AS fecha, COALESCE(SUM(cantidad_clientes), 0)::int AS n,
+                     COALESCE(SUM(total), 0) AS total
+              FROM nuevas GROUP BY 1 ORDER BY 1) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_clientes_diarios => -d.n, p_ingresos_diarios => -d.total)
+        FROM (SELECT created_at::date AS fecha, COALESCE(SUM(cantidad_clientes), 0)::int AS n,
+                     COALESCE(SUM(total), 0) AS total
+              FROM anteriores GROUP BY 1 ORDER BY 1) d;
+    ELSE
+        PERFORM estadisticas_sumar(d.fecha, p_clientes_diarios => d.n, p_ingresos_diarios => d.total)
+        FROM (SELECT fecha, SUM(n)::int AS n, SUM(total) AS total
+              FROM (SELECT a.created_at::date AS fecha, -COALESCE(a.cantidad_clientes, 0) AS n,
+                           -COALESCE(a.total, 0) AS total
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE (a.created_at, a.cantidad_clientes, a.total)
+                          IS DISTINCT FROM (n.created_at, n.cantidad_clientes, n.total)
+                    UNION ALL
+                    SELECT n.created_at::date, COALESCE(n.cantidad_clientes, 0), COALESCE(n.total, 0)
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE (a.created_at, a.cantidad_clientes, a.total)
+                          IS DISTINCT FROM (n.created_at, n.cantidad_clientes, n.total)) c
+              GROUP BY 1 ORDER BY 1) d;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Egresos: monto por fecha del egreso
+CREATE OR REPLACE FUNCTION estadisticas_egresos_cambio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_egresos => d.monto)
+        FROM (SELECT fecha, COALESCE(SUM(monto), 0) AS monto FROM nuevas GROUP BY 1 ORDER BY 1) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_egresos => -d.monto)
+        FROM (SELECT fecha, COALESCE(SUM(monto), 0) AS monto FROM anteriores GROUP BY 1 ORDER BY 1) d;
+    ELSE
+        PERFORM estadisticas_sumar(d.fecha, p_egresos => d.monto)
+        FROM (SELECT fecha, SUM(monto) AS monto
+              FROM (SELECT a.fecha, -a.monto AS monto
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE (a.fecha, a.monto) IS DISTINCT FROM (n.fecha, n.monto)
+                    UNION ALL
+                    SELECT n.fecha, n.monto
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE (a.fecha, a.monto) IS DISTINCT FROM (n.fecha, n.monto)) c
+              GROUP BY 1 ORDER BY 1) d;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pagos de miembros (altas y renovaciones): ingresos por fecha_pago.
+-- El libro es de solo inserción, así que no hay rama UPDATE.
+CREATE OR REPLACE FUNCTION estadisticas_pagos_cambio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM estadisticas_sumar(d.fecha, p_ingresos_miembros => d.monto)
+        FROM (SELECT fecha_pago AS fecha, SUM(monto) AS monto FROM nuevas GROUP BY 1 ORDER BY 1) d;
+    ELSE
+        PERFORM estadisticas_sumar(d.fecha, p_ingresos_miembros => -d.monto)
+        FROM (SELECT fecha_pago AS fecha, SUM(monto) AS monto FROM anteriores GROUP BY 1 ORDER BY 1) d;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Clientes: altas por día de created_at y conteo por vencimiento (los
+-- ingresos vienen de pagos_miembros). Los cambios que solo tocan
+-- estado_mensualidad u otros datos se ignoran.
+CREATE OR REPLACE FUNCTION estadisticas_clientes_cambio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO clientes_vencimientos AS v (fecha_fin_mensualidad, cantidad)
+        SELECT fecha_fin_mensualidad, COUNT(*) FROM nuevas GROUP BY 1 ORDER BY 1
+        ON CONFLICT (fecha_fin_mensualidad) DO UPDATE SET cantidad = v.cantidad + EXCLUDED.cantidad;
+        PERFORM estadisticas_sumar(d.fecha, p_nuevos_miembros => d.n)
+        FROM (SELECT created_at::date AS fecha, COUNT(*)::int AS n
+              FROM nuevas GROUP BY 1 ORDER BY 1) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE clientes_vencimientos v SET cantidad = v.cantidad - d.n
+        FROM (SELECT fecha_fin_mensualidad, COUNT(*) AS n FROM anteriores GROUP BY 1) d
+        WHERE v.fecha_fin_mensualidad = d.fecha_fin_mensualidad;
+        PERFORM estadisticas_sumar(d.fecha, p_nuevos_miembros => -d.n)
+        FROM (SELECT created_at::date AS fecha, COUNT(*)::int AS n
+              FROM anteriores GROUP BY 1 ORDER BY 1) d;
+    ELSE
+        INSERT INTO clientes_vencimientos AS v (fecha_fin_mensualidad, cantidad)
+        SELECT fecha_fin, SUM(n)
+        FROM (SELECT a.fecha_fin_mensualidad AS fecha_fin, -1 AS n
+              FROM anteriores a JOIN nuevas n USING (id)
+              WHERE a.fecha_fin_mensualidad IS DISTINCT FROM n.fecha_fin_mensualidad
+              UNION ALL
+              SELECT n.fecha_fin_mensualidad, 1
+              FROM anteriores a JOIN nuevas n USING (id)
+              WHERE a.fecha_fin_mensualidad IS DISTINCT FROM n.fecha_fin_mensualidad) c
+        GROUP BY 1 HAVING SUM(n) <> 0 ORDER BY 1
+        ON CONFLICT (fecha_fin_mensualidad) DO UPDATE SET cantidad = v.cantidad + EXCLUDED.cantidad;
+        PERFORM estadisticas_sumar(d.fecha, p_nuevos_miembros => d.n)
+        FROM (SELECT fecha, SUM(n)::int AS n
+              FROM (SELECT a.created_at::date AS fecha, -1 AS n
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE a.created_at::date IS DISTINCT FROM n.created_at::date
+                    UNION ALL
+                    SELECT n.created_at::date, 1
+                    FROM anteriores a JOIN nuevas n USING (id)
+                    WHERE a.created_at::date IS DISTINCT FROM n.created_at::date) c
+              GROUP BY 1 HAVING SUM(n) <> 0 ORDER BY 1) d;
+    END IF;
+    DELETE FROM clientes_vencimientos WHERE cantidad <= 0;
+
+    -- Foto del total de miembros en la fila de hoy
+    IF TG_OP <> 'UPDATE' THEN
+        PERFORM estadisticas_sumar(CURRENT_DATE);
+        UPDATE estadisticas_diarias
+        SET total_miembros = (SELECT COALESCE(SUM(cantidad), 0) FROM clientes_vencimientos)
+        WHERE fecha = CURRENT_DATE;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS estadisticas_ventas_insert ON ventas;
+DROP TRIGGER IF EXISTS estadisticas_ventas_update ON ventas;
+DROP TRIGGER IF EXISTS estadisticas_ventas_delete ON ventas;
+CREATE TRIGGER estadisticas_ventas_insert AFTER INSERT ON ventas
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_ventas_cambio();
+CREATE TRIGGER estadisticas_ventas_update AFTER UPDATE ON ventas
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_ventas_cambio();
+CREATE TRIGGER estadisticas_ventas_delete AFTER DELETE ON ventas
+    REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_ventas_cambio();
+
+DROP TRIGGER IF EXISTS estadisticas_usuarios_diarios_insert ON usuarios_diarios;
+DROP TRIGGER IF EXISTS estadisticas_usuarios_diarios_update ON usuarios_diarios;
+DROP TRIGGER IF EXISTS estadisticas_usuarios_diarios_delete ON usuarios_diarios;
+CREATE TRIGGER estadisticas_usuarios_diarios_insert AFTER INSERT ON usuarios_diarios
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_usuarios_diarios_cambio();
+CREATE TRIGGER estadisticas_usuarios_diarios_update AFTER UPDATE ON usuarios_diarios
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_usuarios_diarios_cambio();
+CREATE TRIGGER estadisticas_usuarios_diarios_delete AFTER DELETE ON usuarios_diarios
+    REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_usuarios_diarios_cambio();
+
+DROP TRIGGER IF EXISTS estadisticas_egresos_insert ON egresos;
+DROP TRIGGER IF EXISTS estadisticas_egresos_update ON egresos;
+DROP TRIGGER IF EXISTS estadisticas_egresos_delete ON egresos;
+CREATE TRIGGER estadisticas_egresos_insert AFTER INSERT ON egresos
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_egresos_cambio();
+CREATE TRIGGER estadisticas_egresos_update AFTER UPDATE ON egresos
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_egresos_cambio();
+CREATE TRIGGER estadisticas_egresos_delete AFTER DELETE ON egresos
+    REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_egresos_cambio();
+
+DROP TRIGGER IF EXISTS estadisticas_pagos_insert ON pagos_miembros;
+DROP TRIGGER IF EXISTS estadisticas_pagos_delete ON pagos_miembros;
+CREATE TRIGGER estadisticas_pagos_insert AFTER INSERT ON pagos_miembros
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_pagos_cambio();
+CREATE TRIGGER estadisticas_pagos_delete AFTER DELETE ON pagos_miembros
+    REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_pagos_cambio();
+
+DROP TRIGGER IF EXISTS estadisticas_clientes_insert ON clientes;
+DROP TRIGGER IF EXISTS estadisticas_clientes_update ON clientes;
+DROP TRIGGER IF EXISTS estadisticas_clientes_delete ON clientes;
+CREATE TRIGGER estadisticas_clientes_insert AFTER INSERT ON clientes
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_clientes_cambio();
+CREATE TRIGGER estadisticas_clientes_update AFTER UPDATE ON clientes
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_clientes_cambio();
+CREATE TRIGGER estadisticas_clientes_delete AFTER DELETE ON clientes
+    REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_clientes_cambio();
+
+-- Agregados mensuales para /api/estadisticas/rango. Solo guardan meses ya
+-- cerrados; el mes en curso (y cualquier mes aún sin calcular) se completa
+-- con las filas diarias al consultar.
+CREATE TABLE IF NOT EXISTS estadisticas_mensuales (
+    mes DATE PRIMARY KEY,
+    total_miembros INTEGER DEFAULT 0,
+    nuevos_miembros INTEGER DEFAULT 0,
+    ingresos_miembros DECIMAL(12,2) DEFAULT 0,
+    clientes_diarios INTEGER DEFAULT 0,
+    ingresos_diarios DECIMAL(12,2) DEFAULT 0,
+    ventas INTEGER DEFAULT 0,
+    ingresos_ventas DECIMAL(12,2) DEFAULT 0,
+    ingresos_totales DECIMAL(12,2) DEFAULT 0,
+    egresos_totales DECIMAL(12,2) DEFAULT 0,
+    ganancias DECIMAL(12,2) DEFAULT 0
+);
+
+-- Recalcula un mes cerrado desde estadisticas_diarias (el mes en curso se ignora)
+CREATE OR REPLACE FUNCTION estadisticas_mes_recalcular(p_mes DATE) RETURNS void AS $$
+    INSERT INTO estadisticas_mensuales AS m (
+        mes, total_miembros, nuevos_miembros, ingresos_miembros, clientes_diarios,
+        ingresos_diarios, ventas, ingresos_ventas, ingresos_totales, egresos_totales, ganancias
+    )
+    SELECT date_trunc('month', p_mes)::date,
+           COALESCE((array_agg(total_miembros ORDER BY fecha DESC))[1], 0),
+           COALESCE(SUM(nuevos_miembros), 0), COALESCE(SUM(ingresos_miembros), 0),
+           COALESCE(SUM(clientes_diarios), 0), COALESCE(SUM(ingresos_diarios), 0),
+           COALESCE(SUM(ventas), 0), COALESCE(SUM(ingresos_ventas), 0),
+           COALESCE(SUM(ingresos_totales), 0), COALESCE(SUM(egresos_totales), 0),
+           COALESCE(SUM(ganancias_diarias), 0)
+    FROM estadisticas_diarias
+    WHERE fecha >= date_trunc('month', p_mes)
+      AND fecha < date_trunc('month', p_mes) + interval '1 month'
+    HAVING date_trunc('month', p_mes) < date_trunc('month', CURRENT_DATE)
+    ON CONFLICT (mes) DO UPDATE SET
+        total_miembros = EXCLUDED.total_miembros,
+        nuevos_miembros = EXCLUDED.nuevos_miembros,
+        ingresos_miembros = EXCLUDED.ingresos_miembros,
+        clientes_diarios = EXCLUDED.clientes_diarios,
+        ingresos_diarios = EXCLUDED.ingresos_diarios,
+        ventas = EXCLUDED.ventas,
+        ingresos_ventas = EXCLUDED.ingresos_ventas,
+        ingresos_totales = EXCLUDED.ingresos_totales,
+        egresos_totales = EXCLUDED.egresos_totales,
+        ganancias = EXCLUDED.ganancias;
+$$ LANGUAGE sql;
+
+-- Un cambio en un día de un mes cerrado (registro con fecha atrasada) recalcula
+-- ese mes; la primera fila de un mes nuevo cierra el anterior.
+CREATE OR REPLACE FUNCTION estadisticas_mensuales_cambio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM estadisticas_mes_recalcular(c.mes)
+        FROM (SELECT date_trunc('month', fecha)::date AS mes FROM nuevas
+              WHERE fecha < date_trunc('month', CURRENT_DATE)
+              UNION
+              SELECT (date_trunc('month', CURRENT_DATE) - interval '1 month')::date
+              WHERE NOT EXISTS (
+                  SELECT 1 FROM estadisticas_mensuales
+                  WHERE mes = date_trunc('month', CURRENT_DATE) - interval '1 month'
+              )
+              ORDER BY 1) c;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM estadisticas_mes_recalcular(c.mes)
+        FROM (SELECT DISTINCT date_trunc('month', fecha)::date AS mes FROM anteriores
+              WHERE fecha < date_trunc('month', CURRENT_DATE) ORDER BY 1) c;
+    ELSE
+        PERFORM estadisticas_mes_recalcular(c.mes)
+        FROM (SELECT DISTINCT date_trunc('month', fecha)::date AS mes FROM nuevas
+              WHERE fecha < date_trunc('month', CURRENT_DATE) ORDER BY 1) c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS estadisticas_mensuales_insert ON estadisticas_diarias;
+DROP TRIGGER IF EXISTS estadisticas_mensuales_update ON estadisticas_diarias;
+DROP TRIGGER IF EXISTS estadisticas_mensuales_delete ON estadisticas_diarias;
+CREATE TRIGGER estadisticas_mensuales_insert AFTER INSERT ON estadisticas_diarias
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_mensuales_cambio();
+CREATE TRIGGER estadisticas_mensuales_update AFTER UPDATE ON estadisticas_diarias
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_mensuales_cambio();
+CREATE TRIGGER estadisticas_mensuales_delete AFTER DELETE ON estadisticas_diarias
+    REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION estadisticas_mensuales_cambio();
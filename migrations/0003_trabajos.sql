@@ -0,0 +1,41 @@
+-- ActiveGym - Cola de trabajos en segundo plano (ver jobs.py)
+-- Los trabajos los consume `python worker.py` (o un hilo dentro de cada worker
+-- web con JOBS_IN_PROCESS=1).
+
+-- Un trabajo por fila; los workers toman el siguiente con FOR UPDATE SKIP LOCKED
+CREATE TABLE IF NOT EXISTS trabajos (
+    id BIGSERIAL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    -- Clave de deduplicación: no se encola otro trabajo con la misma clave
+    -- mientras uno esté pendiente o en curso
+    clave VARCHAR(200),
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL DEFAULT 5,
+    ejecutar_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+    iniciado_en TIMESTAMPTZ,
+    terminado_en TIMESTAMPTZ,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT trabajos_estado_check CHECK (estado IN ('pendiente', 'en_curso', 'hecho', 'fallido'))
+);
+
+-- Siguiente trabajo listo para ejecutar (índice parcial: solo los pendientes)
+CREATE INDEX IF NOT EXISTS idx_trabajos_pendientes ON trabajos(ejecutar_en, id) WHERE estado = 'pendiente';
+-- Trabajos en curso cuyo worker murió (se devuelven a la cola al vencer su plazo)
+CREATE INDEX IF NOT EXISTS idx_trabajos_en_curso ON trabajos(iniciado_en) WHERE estado = 'en_curso';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_trabajos_clave ON trabajos(clave)
+    WHERE estado IN ('pendiente', 'en_curso');
+-- Limpieza de trabajos terminados
+CREATE INDEX IF NOT EXISTS idx_trabajos_terminados ON trabajos(terminado_en) WHERE estado IN ('hecho', 'fallido');
+
+-- Trabajos periódicos: la próxima ejecución de cada uno. El worker que logra
+-- adelantar `proxima` encola esa ejecución, así cada una se encola una sola vez
+-- aunque haya varios workers.
+CREATE TABLE IF NOT EXISTS trabajos_programados (
+    nombre VARCHAR(50) PRIMARY KEY,
+    expresion VARCHAR(100) NOT NULL,
+    proxima TIMESTAMPTZ NOT NULL,
+    ultima TIMESTAMPTZ
+);
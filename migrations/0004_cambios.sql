@@ -0,0 +1,60 @@
+-- ActiveGym - Registro de cambios para la sincronización incremental (/api/sync)
+-- Una fila por registro insertado, modificado o borrado en clientes, ventas,
+-- usuarios_diarios y egresos, con la transacción que lo escribió. El cursor
+-- de sync guarda el xmin del snapshot: todo lo anterior ya estaba confirmado.
+
+CREATE TABLE IF NOT EXISTS cambios (
+    id BIGSERIAL PRIMARY KEY,
+    tabla VARCHAR(50) NOT NULL,
+    -- NULL con operación 'T': la tabla entera cambió (TRUNCATE, archivado)
+    registro_id INTEGER,
+    operacion CHAR(1) NOT NULL CHECK (operacion IN ('I', 'U', 'D', 'T')),
+    txid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_cambios_txid ON cambios(txid);
+CREATE INDEX IF NOT EXISTS idx_cambios_created_at ON cambios(created_at);
+
+-- Un INSERT por sentencia a partir de las tablas de transición
+CREATE OR REPLACE FUNCTION cambios_registrar() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO cambios (tabla, registro_id, operacion)
+        SELECT TG_TABLE_NAME, id, 'I' FROM nuevas;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO cambios (tabla, registro_id, operacion)
+        SELECT TG_TABLE_NAME, id, 'U' FROM nuevas;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO cambios (tabla, registro_id, operacion)
+        SELECT TG_TABLE_NAME, id, 'D' FROM anteriores;
+    ELSE
+        INSERT INTO cambios (tabla, operacion) VALUES (TG_TABLE_NAME, 'T');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tabla TEXT;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['clientes', 'ventas', 'usuarios_diarios', 'egresos'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS cambios_%1$s_insert ON %1$I', tabla);
+        EXECUTE format('CREATE TRIGGER cambios_%1$s_insert AFTER INSERT ON %1$I
+                        REFERENCING NEW TABLE AS nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION cambios_registrar()', tabla);
+        EXECUTE format('DROP TRIGGER IF EXISTS cambios_%1$s_update ON %1$I', tabla);
+        EXECUTE format('CREATE TRIGGER cambios_%1$s_update AFTER UPDATE ON %1$I
+                        REFERENCING NEW TABLE AS nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION cambios_registrar()', tabla);
+        EXECUTE format('DROP TRIGGER IF EXISTS cambios_%1$s_delete ON %1$I', tabla);
+        EXECUTE format('CREATE TRIGGER cambios_%1$s_delete AFTER DELETE ON %1$I
+                        REFERENCING OLD TABLE AS anteriores
+                        FOR EACH STATEMENT EXECUTE FUNCTION cambios_registrar()', tabla);
+        EXECUTE format('DROP TRIGGER IF EXISTS cambios_%1$s_truncate ON %1$I', tabla);
+        EXECUTE format('CREATE TRIGGER cambios_%1$s_truncate AFTER TRUNCATE ON %1$I
+                        FOR EACH STATEMENT EXECUTE FUNCTION cambios_registrar()', tabla);
+    END LOOP;
+END;
+$$;
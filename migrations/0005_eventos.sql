@@ -0,0 +1,30 @@
+-- ActiveGym - Avisos en vivo para /api/events (ver events.py)
+-- Cada sentencia que registra cambios (los triggers de 0004_cambios.sql, o el
+-- archivado de particiones) envía un NOTIFY cambios por tabla y operación con
+-- el total de filas y los primeros ids. Se entregan al confirmar la transacción.
+
+CREATE OR REPLACE FUNCTION cambios_notificar() RETURNS trigger AS $$
+DECLARE
+    cambio RECORD;
+BEGIN
+    FOR cambio IN
+        SELECT tabla, operacion, COUNT(*) AS total,
+               (array_agg(registro_id ORDER BY registro_id) FILTER (WHERE registro_id IS NOT NULL))[1:20] AS ids
+        FROM nuevos
+        GROUP BY tabla, operacion
+    LOOP
+        PERFORM pg_notify('cambios', json_build_object(
+            'tabla', cambio.tabla,
+            'operacion', cambio.operacion,
+            'total', cambio.total,
+            'ids', COALESCE(cambio.ids, '{}')
+        )::text);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cambios_notificar ON cambios;
+CREATE TRIGGER cambios_notificar AFTER INSERT ON cambios
+    REFERENCING NEW TABLE AS nuevos
+    FOR EACH STATEMENT EXECUTE FUNCTION cambios_notificar();
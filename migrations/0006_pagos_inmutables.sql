@@ -0,0 +1,37 @@
+-- ActiveGym - El libro de pagos es de solo inserción también frente a borrados
+-- Borrar un miembro ya no borra sus pagos: quedan con cliente_id NULL y los
+-- ingresos de días pasados no cambian. Un DELETE directo sobre el libro se
+-- rechaza igual que un UPDATE; las correcciones se registran como pagos de ajuste.
+
+ALTER TABLE pagos_miembros DROP CONSTRAINT IF EXISTS pagos_miembros_cliente_id_fkey;
+ALTER TABLE pagos_miembros ADD CONSTRAINT pagos_miembros_cliente_id_fkey
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE SET NULL;
+
+-- Única modificación admitida: el ON DELETE SET NULL de la clave foránea,
+-- que se ejecuta cuando el cliente ya no existe
+CREATE OR REPLACE FUNCTION pagos_miembros_inmutable() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.cliente_id IS NULL
+       AND to_jsonb(NEW) - 'cliente_id' = to_jsonb(OLD) - 'cliente_id'
+       AND NOT EXISTS (SELECT 1 FROM clientes WHERE id = OLD.cliente_id) THEN
+        RETURN NEW;
+    END IF;
+    RAISE EXCEPTION 'pagos_miembros es de solo inserción; registre un pago de ajuste';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pagos_miembros_sin_update ON pagos_miembros;
+DROP TRIGGER IF EXISTS pagos_miembros_inmutable ON pagos_miembros;
+CREATE TRIGGER pagos_miembros_inmutable BEFORE UPDATE OR DELETE ON pagos_miembros
+    FOR EACH ROW EXECUTE FUNCTION pagos_miembros_inmutable();
+
+-- Sin borrados no hay ingresos que restar del historial
+DROP TRIGGER IF EXISTS estadisticas_pagos_delete ON pagos_miembros;
+
+CREATE OR REPLACE FUNCTION estadisticas_pagos_cambio() RETURNS trigger AS $$
+BEGIN
+    PERFORM estadisticas_sumar(d.fecha, p_ingresos_miembros => d.monto)
+    FROM (SELECT fecha_pago AS fecha, SUM(monto) AS monto FROM nuevas GROUP BY 1 ORDER BY 1) d;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
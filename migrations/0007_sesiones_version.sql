@@ -0,0 +1,7 @@
+-- ActiveGym - Revocación de sesiones por número de versión
+-- Los tokens llevan la versión de sesiones del usuario al emitirse; cerrar
+-- sesión o cambiar la contraseña la incrementa y todos los tokens anteriores
+-- dejan de valer, aunque se hayan emitido en el mismo segundo. sesiones_desde
+-- queda como registro de la última revocación.
+
+ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS sesiones_version INTEGER NOT NULL DEFAULT 0;
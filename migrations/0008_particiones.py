@@ -0,0 +1,12 @@
+"""Monthly partitions for ventas, usuarios_diarios and egresos (see partitions.py).
+
+Converts the tables that are not partitioned yet, copying each one in this
+migration's transaction, and adds the default partition to tables that
+were converted before every partitioned table had one.
+"""
+import partitions
+
+
+def upgrade(conn):
+    for table, rows in partitions.migrate(conn).items():
+        print(f"   {table}: {rows} filas en la tabla particionada")
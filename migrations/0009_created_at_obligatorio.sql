@@ -0,0 +1,19 @@
+-- ActiveGym - created_at obligatorio en las tablas paginadas por (created_at, id)
+-- Un created_at NULL no tiene lugar en el cursor de paginación y la condición
+-- (created_at, id) < (...) nunca lo incluye. Las filas antiguas sin valor toman
+-- la fecha propia del registro, o 'epoch' si no tienen ninguna.
+
+UPDATE clientes SET created_at = COALESCE(updated_at, fecha_inicio::timestamp, 'epoch')
+WHERE created_at IS NULL;
+UPDATE egresos SET created_at = COALESCE(fecha::timestamp, 'epoch') WHERE created_at IS NULL;
+UPDATE usuarios SET created_at = COALESCE(updated_at, 'epoch') WHERE created_at IS NULL;
+
+-- El libro de pagos es de solo inserción (0006_pagos_inmutables.sql)
+ALTER TABLE pagos_miembros DISABLE TRIGGER pagos_miembros_inmutable;
+UPDATE pagos_miembros SET created_at = fecha_pago::timestamp WHERE created_at IS NULL;
+ALTER TABLE pagos_miembros ENABLE TRIGGER pagos_miembros_inmutable;
+
+ALTER TABLE clientes ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE egresos ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE usuarios ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE pagos_miembros ALTER COLUMN created_at SET NOT NULL;
@@ -0,0 +1,6 @@
+-- ActiveGym - La lista de renovación sigue a los cambios de clientes
+-- Cada lista guarda la versión de clientes (versiones_recursos) con la que se
+-- generó; cuando un alta, renovación o borrado la supera, la siguiente consulta
+-- la regenera en lugar de servir la foto de la mañana todo el día.
+
+ALTER TABLE listas_renovacion ADD COLUMN IF NOT EXISTS version_clientes BIGINT NOT NULL DEFAULT 0;
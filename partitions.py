@@ -0,0 +1,420 @@
+"""Monthly range partitions for ventas, usuarios_diarios and egresos.
+
+The three tables only grow, so they are partitioned by month on the
+column their lists and statistics filter on; queries bounded by that
+column (the statistics backfill, exports, date-filtered lists) only read
+the months they cover. Reads and writes keep going through the parent
+table, so the endpoints do not change. The existing tables are converted
+by migration 0008 (python schema.py migrate), see migrate_table():
+
+    python partitions.py maintain             # partitions for the coming months
+    python partitions.py list
+    python partitions.py archive --keep-months 36 [--dry-run] [--detach-only]
+    python partitions.py restore archivo/ventas_p2021_01.csv.gz
+
+`maintain` also runs every night as a background job. Rows outside every
+monthly partition (egresos.fecha is typed in by hand; a backdated
+created_at, or months ahead left uncreated because `maintain` stopped
+running) land in <table>_default instead of failing, and get their own
+partition on the next `maintain`.
+
+`archive` copies every partition older than the kept months to a gzipped
+CSV in ARCHIVE_DIR and drops it; estadisticas_diarias keeps those months'
+figures, but do not run `stats.py backfill` over archived months without
+restoring them first.
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta
+
+import psycopg2.sql as sql
+
+import db
+from stats import month_start, next_month
+
+
+# table -> (partition column, fallback for rows where it is NULL); each
+# one also has a <table>_default partition
+PARTITIONED_TABLES = {
+    'ventas': ('created_at', 'fecha_venta'),
+    'usuarios_diarios': ('created_at', 'fecha_entrada'),
+    'egresos': ('fecha', None),
+}
+
+PARTITIONS_MONTHS_AHEAD = int(os.environ.get('PARTITIONS_MONTHS_AHEAD', 3))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archivo')
+
+# Rows moved straight between partitions skip the parent's triggers, so
+# the conditional-GET version is bumped by hand
+BUMP_VERSION_SQL = """
+    INSERT INTO versiones_recursos AS v (recurso, version, modificado)
+    VALUES (%s, 1, date_trunc('second', now() AT TIME ZONE 'UTC'))
+    ON CONFLICT (recurso) DO UPDATE SET version = v.version + 1, modificado = EXCLUDED.modificado
+"""
+# Archiving or restoring a month changes many rows at once: /api/sync
+# clients reload the table instead of receiving each one
+RELOAD_SQL = "INSERT INTO cambios (tabla, operacion) VALUES (%s, 'T')"
+
+PARTITION_NAME = re.compile(r'^(?P<table>[a-z_]+)_p(?P<year>\d{4})_(?P<month>\d{2})$')
+
+
+def partition_name(table, month):
+    return f'{table}_p{month.year:04d}_{month.month:02d}'
+
+
+def parse_partition(name):
+    """(table, first day of its month) of a monthly partition name, or None"""
+    match = PARTITION_NAME.match(name)
+    if not match or match['table'] not in PARTITIONED_TABLES:
+        return None
+    return match['table'], date(int(match['year']), int(match['month']), 1)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions(cursor, table):
+    """{name: first day of month} of the attached monthly partitions"""
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (table,))
+    found = {}
+    for (name,) in cursor.fetchall():
+        parsed = parse_partition(name)
+        if parsed is not None:
+            found[name] = parsed[1]
+    return found
+
+
+def create_partition(cursor, table, month, parent=None):
+    """Attach the month's partition, moving any of its rows out of the default one"""
+    parent = parent or table
+    column, _ = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    bounds = (month, next_month(month))
+    default = sql.Identifier(f'{table}_default')
+    cursor.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE {} >= %s AND {} < %s)").format(
+        default, sql.Identifier(column), sql.Identifier(column)), bounds)
+    if not cursor.fetchone()[0]:
+        cursor.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(
+            sql.Identifier(name), sql.Identifier(parent)), bounds)
+        return name
+    # Rows already in the default partition: move them, then attach
+    cursor.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(
+        sql.Identifier(name), sql.Identifier(parent)))
+    cursor.execute(sql.SQL("""
+        WITH movidas AS (DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *)
+        INSERT INTO {name} SELECT * FROM movidas
+    """).format(default=default, column=sql.Identifier(column), name=sql.Identifier(name)), bounds)
+    cursor.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(
+        sql.Identifier(parent), sql.Identifier(name)), bounds)
+    cursor.execute(BUMP_VERSION_SQL, (table,))
+    return name
+
+
+def ensure_partitions(cursor, table, first, last, parent=None):
+    """Monthly partitions for every month in [first, last]; returns the new ones"""
+    existing = set(partitions(cursor, parent or table).values())
+    created = []
+    month = month_start(first)
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(cursor, table, month, parent))
+        month = next_month(month)
+    return created
+
+
+def ensure_range(cursor, first, last):
+    """Partitions of every partitioned table for [first, last] (bulk loads of old rows)"""
+    created = []
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(cursor, table):
+            created += ensure_partitions(cursor, table, first, last)
+    return created
+
+
+def maintain(months_ahead=PARTITIONS_MONTHS_AHEAD, today=None, conn=None):
+    """Partitions for this month and the next ones, and for rows in default"""
+    today = today or datetime.now().date()
+    last = month_start(today)
+    for _ in range(months_ahead):
+        last = next_month(last)
+    own_conn = conn is None
+    if own_conn:
+        conn = db.connect_direct()
+    created = []
+    try:
+        cursor = conn.cursor()
+        created += ensure_range(cursor, month_start(today), last)
+        for table, (column, _) in PARTITIONED_TABLES.items():
+            if not is_partitioned(cursor, table):
+                continue
+            cursor.execute(sql.SQL("SELECT DISTINCT date_trunc('month', {})::date FROM {}").format(
+                sql.Identifier(column), sql.Identifier(f'{table}_default')))
+            for (month,) in cursor.fetchall():
+                created.append(create_partition(cursor, table, month))
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    return created
+
+
+# Conversion of an existing table
+
+def create_default(cursor, table, parent=None):
+    cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+        sql.Identifier(f'{table}_default'), sql.Identifier(parent or table)))
+
+
+def migrate_table(conn, table, months_ahead=PARTITIONS_MONTHS_AHEAD):
+    """Rebuild table as a partitioned one, in the caller's transaction.
+
+    Writes (and reads, at the very end) wait for it; expect about as long as
+    copying the table and building its indexes once. Columns, defaults,
+    the id sequence, indexes and triggers are carried over.
+    """
+    column, fallback = PARTITIONED_TABLES[table]
+    staging = f'{table}_particionada'
+    cursor = conn.cursor()
+    cursor.execute(sql.SQL("LOCK TABLE {} IN EXCLUSIVE MODE").format(sql.Identifier(table)))
+
+    cursor.execute("""
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = %s::regclass AND NOT tgisinternal ORDER BY tgname
+    """, (table,))
+    triggers = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = %s::regclass AND NOT indisprimary ORDER BY indexrelid
+    """, (table,))
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+    sequence = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position
+    """, (table,))
+    columns = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(sql.SQL("""
+        CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)
+        PARTITION BY RANGE ({column})
+    """).format(staging=sql.Identifier(staging), table=sql.Identifier(table), column=sql.Identifier(column)))
+    # The partition column has to be part of the primary key
+    cursor.execute(sql.SQL("ALTER TABLE {} ALTER COLUMN {} SET NOT NULL, ADD PRIMARY KEY (id, {})").format(
+        sql.Identifier(staging), sql.Identifier(column), sql.Identifier(column)))
+    create_default(cursor, table, parent=staging)
+
+    # Rows without a value in the partition column take their date column's
+    key = sql.Identifier(column)
+    if fallback:
+        key = sql.SQL("COALESCE({}, {}::timestamp)").format(sql.Identifier(column), sql.Identifier(fallback))
+    cursor.execute(sql.SQL("SELECT min({key})::date, max({key})::date FROM {table}").format(
+        key=key, table=sql.Identifier(table)))
+    first, last = cursor.fetchone()
+    today = datetime.now().date()
+    last = max(last or today, today)
+    for _ in range(months_ahead):
+        last = next_month(last)
+    ensure_partitions(cursor, table, first or today, last, parent=staging)
+
+    select = [key if name == column else sql.Identifier(name) for name in columns]
+    cursor.execute(sql.SQL("INSERT INTO {staging} ({columns}) SELECT {select} FROM {table}").format(
+        staging=sql.Identifier(staging), columns=sql.SQL(', ').join(map(sql.Identifier, columns)),
+        select=sql.SQL(', ').join(select), table=sql.Identifier(table)))
+    copied = cursor.rowcount
+
+    # Keep the id sequence: it is dropped with the table that owns it
+    if sequence:
+        cursor.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}.id").format(
+            sql.SQL(sequence), sql.Identifier(staging)))
+    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(table)))
+    cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(staging), sql.Identifier(table)))
+    cursor.execute(sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+        sql.Identifier(table), sql.Identifier(f'{staging}_pkey'), sql.Identifier(f'{table}_pkey')))
+    # Created on the parent, so every partition (present and future) gets them
+    for statement in indexes + triggers:
+        cursor.execute(statement)
+    cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+    return copied
+
+
+def migrate(conn):
+    """Convert the tables that are not partitioned yet and add any missing
+    default partition (migration 0008; the caller commits); {table: rows copied}"""
+    cursor = conn.cursor()
+    done = {}
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(cursor, table):
+            create_default(cursor, table)
+        else:
+            done[table] = migrate_table(conn, table)
+    return done
+
+
+# Archiving
+
+def archive_path(name):
+    return os.path.join(ARCHIVE_DIR, f'{name}.csv.gz')
+
+
+def archivable(cursor, keep_months, today=None):
+    """(table, partition) pairs entirely older than the kept months"""
+    today = today or datetime.now().date()
+    cutoff = month_start(today)
+    for _ in range(keep_months):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    found = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(cursor, table):
+            continue
+        found += [(table, name) for name, month in sorted(partitions(cursor, table).items())
+                  if next_month(month) <= cutoff]
+    return found
+
+
+def archive_partition(conn, table, name, detach_only=False):
+    """Copy a partition to ARCHIVE_DIR/<name>.csv.gz, then detach and drop it.
+
+    The file is complete and flushed to disk before the partition goes away;
+    if the row counts do not match nothing is detached.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = archive_path(name)
+    tmp = f'{path}.tmp'
+    cursor = conn.cursor()
+    try:
+        # No writes to the month while it is copied
+        cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(name)))
+        cursor.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(name)))
+        expected = cursor.fetchone()[0]
+        with open(tmp, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', filename=f'{name}.csv') as f:
+                cursor.copy_expert(sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(
+                    sql.Identifier(name)).as_string(conn), f)
+            raw.flush()
+            os.fsync(raw.fileno())
+        if cursor.rowcount != expected:
+            raise RuntimeError(f'{name}: se copiaron {cursor.rowcount} de {expected} filas')
+
+        cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(table), sql.Identifier(name)))
+        if not detach_only:
+            cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        cursor.execute(BUMP_VERSION_SQL, (table,))
+        cursor.execute(RELOAD_SQL, (table,))
+        os.replace(tmp, path)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return expected, path
+
+
+def restore(path):
+    """Load an archived month back as its partition; returns the rows loaded"""
+    name = os.path.basename(path).split('.', 1)[0]
+    parsed = parse_partition(name)
+    if parsed is None:
+        raise ValueError(f'{path} no es un archivo de partición (<tabla>_pAAAA_MM.csv.gz)')
+    table, month = parsed
+    conn = db.connect_direct()
+    try:
+        cursor = conn.cursor()
+        if name in partitions(cursor, table):
+            raise ValueError(f'La partición {name} ya existe')
+        create_partition(cursor, table, month)
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            header = f.readline().rstrip('\r\n').split(',')
+            # Straight into the partition: the statistics already count these rows
+            cursor.copy_expert(sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                sql.Identifier(name), sql.SQL(', ').join(map(sql.Identifier, header))).as_string(conn), f)
+        loaded = cursor.rowcount
+        cursor.execute(BUMP_VERSION_SQL, (table,))
+        cursor.execute(RELOAD_SQL, (table,))
+        conn.commit()
+        return loaded
+    finally:
+        conn.close()
+
+
+def describe():
+    """Partitions of every table with their estimated rows and size"""
+    conn = db.connect_direct()
+    try:
+        cursor = conn.cursor()
+        rows = []
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(cursor, table):
+                rows.append((table, None, None, None))
+                continue
+            cursor.execute("""
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+                       pg_size_pretty(pg_total_relation_size(c.oid))
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = %s::regclass ORDER BY c.relname
+            """, (table,))
+            rows += [(table, name, max(estimate, 0), size) for name, _, estimate, size in cursor.fetchall()]
+        return rows
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Particiones mensuales de ActiveGym')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ahead = commands.add_parser('maintain', help='Crear las particiones de los próximos meses')
+    ahead.add_argument('--months-ahead', type=int, default=PARTITIONS_MONTHS_AHEAD)
+    commands.add_parser('list', help='Mostrar las particiones')
+    old = commands.add_parser('archive', help='Archivar en ARCHIVE_DIR las particiones antiguas')
+    old.add_argument('--keep-months', type=int, required=True, help='meses completos que se conservan')
+    old.add_argument('--dry-run', action='store_true', help='solo mostrar qué se archivaría')
+    old.add_argument('--detach-only', action='store_true', help='desadjuntar sin borrar la tabla')
+    load = commands.add_parser('restore', help='Volver a cargar una partición archivada')
+    load.add_argument('archivo')
+    args = parser.parse_args(argv)
+
+    if args.command == 'maintain':
+        created = maintain(args.months_ahead)
+        print(f"✅ {len(created)} particiones creadas" + (f": {', '.join(created)}" if created else ''))
+    elif args.command == 'list':
+        for table, name, estimate, size in describe():
+            if name is None:
+                print(f"{table:<18} sin particionar (python schema.py migrate)")
+            else:
+                print(f"{table:<18} {name:<28} ~{estimate:>9} filas {size:>10}")
+    elif args.command == 'archive':
+        conn = db.connect_direct()
+        try:
+            pending = archivable(conn.cursor(), args.keep_months)
+            conn.rollback()
+            for table, name in pending:
+                if args.dry_run:
+                    print(f"{name} → {archive_path(name)}")
+                    continue
+                rows, path = archive_partition(conn, table, name, args.detach_only)
+                print(f"✅ {name}: {rows} filas en {path}")
+            if not pending:
+                print("✅ No hay particiones para archivar")
+        finally:
+            conn.close()
+    else:
+        try:
+            print(f"✅ {restore(args.archivo)} filas restauradas")
+        except ValueError as e:
+            parser.error(str(e))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,443 @@
+"""PDF payment receipts and monthly reports, rendered off the request path.
+
+Handlers read the figures a document shows (one payment, or the monthly
+rollup), hash them and look for REPORTS_DIR/<name>-<hash>.pdf. When it is
+there it is served as is; otherwise rendering is handed to a process pool
+and the client polls GET /api/reportes/<id> until the file exists. Since
+the key is the content hash, a document is reused until its data changes
+and every gunicorn worker finds the files written by the others.
+
+A <id>.lock file marks a document being rendered (so two workers do not
+render it twice) and <id>.error keeps the message of a failed render.
+Files not served in REPORTS_MAX_AGE_DAYS are removed when a pool starts.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, A5
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+import serialization
+import stats
+
+
+REPORTS_DIR = os.environ.get('REPORTS_DIR') or os.path.join(tempfile.gettempdir(), 'activegym-reports')
+# Rendering processes per gunicorn worker
+REPORTS_WORKERS = int(os.environ.get('REPORTS_WORKERS', 2))
+# Seconds after which a render that never finished is started again
+REPORTS_TIMEOUT = float(os.environ.get('REPORTS_TIMEOUT', 120))
+REPORTS_MAX_AGE_DAYS = float(os.environ.get('REPORTS_MAX_AGE_DAYS', 30))
+
+# Bump when the layout changes so cached documents are rendered again
+RENDER_VERSION = 1
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'active.jpg')
+
+REPORT_ID = re.compile(r'^[a-z0-9-]+-[0-9a-f]{16}$')
+
+TIPOS_PAGO = {
+    'mensualidad': 'Inscripción',
+    'renovacion': 'Renovación',
+}
+MESES = ('Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic')
+
+
+# Cache files
+
+def content_hash(kind, data):
+    payload = serialization.dumps([RENDER_VERSION, kind, data], sort_keys=True)
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def pdf_path(report_id):
+    return os.path.join(REPORTS_DIR, f'{report_id}.pdf')
+
+
+def lock_path(report_id):
+    return os.path.join(REPORTS_DIR, f'{report_id}.lock')
+
+
+def error_path(report_id):
+    return os.path.join(REPORTS_DIR, f'{report_id}.error')
+
+
+def download_name(report_id):
+    return report_id.rsplit('-', 1)[0] + '.pdf'
+
+
+def claim(report_id):
+    """Create the lock file; False when another render holds a fresh one"""
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = lock_path(report_id)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < REPORTS_TIMEOUT:
+                    return False
+                # Its process died or hung: take the render over
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def release(report_id):
+    try:
+        os.remove(lock_path(report_id))
+    except FileNotFoundError:
+        pass
+
+
+def status(report_id):
+    """('listo', path) | ('pendiente', None) | ('error', message) | (None, None)"""
+    path = pdf_path(report_id)
+    try:
+        # Served documents are kept by prune()
+        os.utime(path)
+        return 'listo', path
+    except FileNotFoundError:
+        pass
+    if os.path.exists(lock_path(report_id)):
+        return 'pendiente', None
+    try:
+        with open(error_path(report_id), encoding='utf-8') as f:
+            return 'error', f.read()
+    except FileNotFoundError:
+        return None, None
+
+
+def write_atomic(path, content, mode='wb'):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, mode) as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def prune(max_age_days=REPORTS_MAX_AGE_DAYS):
+    """Delete documents (and leftovers) not served in max_age_days"""
+    limit = time.time() - max_age_days * 86400
+    try:
+        names = os.listdir(REPORTS_DIR)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(REPORTS_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+# Process pool
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """This process's rendering pool, created lazily after gunicorn forks.
+
+    Rendering processes are spawned, not forked, so they start without
+    copies of the worker's threads and database connections.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                prune()
+                _pool = ProcessPoolExecutor(max_workers=REPORTS_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+                _pool_pid = pid
+    return _pool
+
+
+def _finished(report_id, future):
+    # render_file handles its own errors; this is a broken or shut down pool
+    global _pool
+    if future.exception() is not None:
+        release(report_id)
+        with _pool_lock:
+            _pool = None
+
+
+def request_document(kind, name, data):
+    """(id, estado) of the document for data, rendering it if needed"""
+    report_id = f'{name}-{content_hash(kind, data)}'
+    if status(report_id)[0] == 'listo':
+        return report_id, 'listo'
+    if claim(report_id):
+        try:
+            os.remove(error_path(report_id))
+        except FileNotFoundError:
+            pass
+        future = get_pool().submit(render_file, kind, data, report_id)
+        future.add_done_callback(lambda future: _finished(report_id, future))
+    return report_id, 'pendiente'
+
+
+def wait(report_id, timeout=REPORTS_TIMEOUT, interval=0.05):
+    """Block until the document is no longer pending (scripts and benchmarks)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        estado, value = status(report_id)
+        if estado != 'pendiente' or time.monotonic() >= deadline:
+            return estado, value
+        time.sleep(interval)
+
+
+# Data
+
+RECEIPT_SQL = """
+SELECT p.id, p.fecha_pago, p.monto, p.metodo_pago, p.tipo, p.fecha_inicio, p.fecha_fin,
+       p.duracion, p.cliente_id, c.nombre, c.apellido, c.telefono
+FROM pagos_miembros p
+JOIN clientes c ON c.id = p.cliente_id
+WHERE p.id = %s
+"""
+
+EGRESOS_CATEGORIA_SQL = """
+SELECT COALESCE(categoria, 'Sin categoría') AS categoria, SUM(monto) AS monto
+FROM egresos
+WHERE fecha >= %s AND fecha <= %s
+GROUP BY 1
+ORDER BY 2 DESC
+"""
+
+
+def receipt_data(cursor, pago_id):
+    """The payment and its member, or None (expects a RealDictCursor)"""
+    cursor.execute(RECEIPT_SQL, (pago_id,))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def monthly_data(cursor, desde, hasta, today=None):
+    """Monthly P&L from the statistics rollup plus expenses per category"""
+    periodos = stats.period_report(cursor, desde, hasta, 'mes', today)
+    cursor.execute(EGRESOS_CATEGORIA_SQL, (desde, hasta))
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'periodos': periodos,
+        'egresos_categoria': [dict(row) for row in cursor.fetchall()],
+    }
+
+
+# Rendering (runs in the pool's processes)
+
+def render_file(kind, data, report_id):
+    """Render into REPORTS_DIR, leaving either the PDF or an .error file"""
+    try:
+        content = RENDERERS[kind](data)
+        write_atomic(pdf_path(report_id), content)
+    except Exception as e:
+        write_atomic(error_path(report_id), f'{type(e).__name__}: {e}', 'w')
+    finally:
+        release(report_id)
+
+
+def money(value):
+    return f"${Decimal(value or 0):,.2f}"
+
+
+def fecha(value):
+    return value.strftime('%d/%m/%Y') if value else '-'
+
+
+def _styles():
+    styles = getSampleStyleSheet()
+    styles['Title'].fontSize = 16
+    styles['Title'].alignment = 0
+    return styles
+
+
+def _header(title, subtitle, styles):
+    text = [Paragraph('ActiveGym', styles['Title']), Paragraph(title, styles['Heading2']),
+            Paragraph(subtitle, styles['Normal'])]
+    header = Table([[Image(LOGO_PATH, 22 * mm, 22 * mm), text]], colWidths=[26 * mm, None])
+    header.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]))
+    return header
+
+
+def _table(rows, widths, header=True, align_right_from=1):
+    table = Table(rows, colWidths=widths, repeatRows=1 if header else 0)
+    style = [
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (align_right_from, 0), (-1, -1), 'RIGHT'),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+    ]
+    if header:
+        style += [('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+                  ('TEXTCOLOR', (0, 0), (-1, 0), colors.white)]
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def render_receipt(pago):
+    """PDF bytes of one payment receipt (A5)"""
+    styles = _styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A5, leftMargin=12 * mm, rightMargin=12 * mm,
+                            topMargin=12 * mm, bottomMargin=12 * mm,
+                            title=f"Recibo {pago['id']:06d}", author='ActiveGym')
+    cliente = ' '.join(part for part in (pago['nombre'], pago['apellido']) if part)
+    rows = [
+        ['Cliente', cliente],
+        ['Teléfono', pago['telefono'] or '-'],
+        ['Concepto', TIPOS_PAGO.get(pago['tipo'], pago['tipo'].capitalize())],
+        ['Plan', f"{pago['duracion']} días" if pago['duracion'] else '-'],
+        ['Período', f"{fecha(pago['fecha_inicio'])} al {fecha(pago['fecha_fin'])}"],
+        ['Fecha de pago', fecha(pago['fecha_pago'])],
+        ['Método de pago', (pago['metodo_pago'] or 'efectivo').capitalize()],
+        ['Total', money(pago['monto'])],
+    ]
+    story = [
+        _header(f"Recibo de pago N.º {pago['id']:06d}", f"Cliente N.º {pago['cliente_id']}", styles),
+        Spacer(1, 6 * mm),
+        _table(rows, [35 * mm, None], header=False, align_right_from=2),
+        Spacer(1, 8 * mm),
+        Paragraph('Gracias por entrenar con nosotros.', styles['Italic']),
+    ]
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _month_label(day):
+    return f"{MESES[day.month - 1]} {day.year % 100:02d}"
+
+
+def _bar_chart(periodos, width, height):
+    drawing = Drawing(width, height)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 40, 30
+    chart.width, chart.height = width - 60, height - 60
+    chart.data = [[float(p['ingresos']) for p in periodos], [float(p['egresos']) for p in periodos]]
+    chart.categoryAxis.categoryNames = [_month_label(p['periodo']) for p in periodos]
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.bars[0].fillColor = colors.HexColor('#16a34a')
+    chart.bars[1].fillColor = colors.HexColor('#dc2626')
+    chart.barSpacing = 1
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = 40, height - 8
+    legend.fontName = 'Helvetica'
+    legend.fontSize = 7
+    legend.columnMaximum = 1
+    legend.alignment = 'right'
+    legend.colorNamePairs = [(chart.bars[0].fillColor, 'Ingresos'), (chart.bars[1].fillColor, 'Egresos')]
+    drawing.add(legend)
+    return drawing
+
+
+def _line_chart(periodos, width, height):
+    drawing = Drawing(width, height)
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 40, 20
+    chart.width, chart.height = width - 60, height - 40
+    chart.data = [[float(p['ganancias']) for p in periodos]]
+    chart.categoryAxis.categoryNames = [_month_label(p['periodo']) for p in periodos]
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.labels.fontSize = 7
+    chart.lines[0].strokeColor = colors.HexColor('#2563eb')
+    chart.lines[0].strokeWidth = 1.5
+    drawing.add(chart)
+    drawing.add(String(40, height - 10, 'Ganancia por mes', fontName='Helvetica', fontSize=8))
+    return drawing
+
+
+def _pie_chart(categorias, size):
+    # The largest categories, the rest folded into one slice
+    shown = categorias[:6]
+    rest = sum(Decimal(c['monto']) for c in categorias[6:])
+    labels = [c['categoria'] for c in shown] + (['Otros'] if rest else [])
+    values = [float(c['monto']) for c in shown] + ([float(rest)] if rest else [])
+
+    drawing = Drawing(size, size)
+    pie = Pie()
+    pie.x = pie.y = 30
+    pie.width = pie.height = size - 60
+    pie.data = values or [1]
+    pie.labels = labels or ['Sin egresos']
+    pie.slices.fontName = 'Helvetica'
+    pie.slices.fontSize = 7
+    pie.sideLabels = True
+    drawing.add(pie)
+    return drawing
+
+
+def render_monthly(data):
+    """PDF bytes of the monthly report: table per month plus charts"""
+    styles = _styles()
+    periodos = data['periodos']
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=15 * mm, bottomMargin=15 * mm,
+                            title='Reporte mensual', author='ActiveGym')
+    width = A4[0] - 30 * mm
+
+    rows = [['Mes', 'Miembros', 'Nuevos', 'Diarios', 'Ventas', 'Ing. miembros', 'Ing. diarios',
+             'Ing. ventas', 'Egresos', 'Ganancia']]
+    for p in periodos:
+        rows.append([_month_label(p['periodo']), p['total_miembros'], p['nuevos_miembros'],
+                     p['clientes_diarios'], p['ventas'], money(p['ingresos_miembros']),
+                     money(p['ingresos_diarios']), money(p['ingresos_ventas']), money(p['egresos']),
+                     money(p['ganancias'])])
+    totales = {field: sum(Decimal(p[field]) for p in periodos)
+               for field in ('ingresos_miembros', 'ingresos_diarios', 'ingresos_ventas', 'egresos', 'ganancias')}
+    rows.append(['Total', '', sum(p['nuevos_miembros'] for p in periodos),
+                 sum(p['clientes_diarios'] for p in periodos), sum(p['ventas'] for p in periodos),
+                 money(totales['ingresos_miembros']), money(totales['ingresos_diarios']),
+                 money(totales['ingresos_ventas']), money(totales['egresos']), money(totales['ganancias'])])
+
+    categorias = [['Categoría', 'Monto']] + [[c['categoria'], money(c['monto'])]
+                                            for c in data['egresos_categoria']]
+    generado = datetime.now().strftime('%d/%m/%Y %H:%M')
+    story = [
+        _header('Estado de resultados mensual',
+                f"{fecha(data['desde'])} al {fecha(data['hasta'])} · generado el {generado}", styles),
+        Spacer(1, 5 * mm),
+        _bar_chart(periodos, width, 70 * mm),
+        _line_chart(periodos, width, 50 * mm),
+        Spacer(1, 4 * mm),
+        _table(rows, None),
+        PageBreak(),
+        Paragraph('Egresos por categoría', styles['Heading2']),
+        _pie_chart(data['egresos_categoria'], 90 * mm),
+        _table(categorias, [80 * mm, 35 * mm]),
+    ]
+    doc.build(story)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'recibo': render_receipt,
+    'reporte': render_monthly,
+}
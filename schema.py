@@ -0,0 +1,258 @@
+"""Versioned schema migrations: migrations/NNNN_nombre.sql, applied in order.
+
+Each file runs once, in its own transaction, and is recorded in
+migraciones_esquema with the SHA-256 of its contents, so a file edited
+after it was applied is reported instead of silently diverging (add a new
+migration instead). A change plain SQL cannot express (the partition
+conversion) is a NNNN_nombre.py file whose upgrade(conn) runs in that
+transaction without committing:
+
+    python schema.py migrate      # apply the pending ones (runs before gunicorn on each start)
+    python schema.py status
+    python schema.py verify       # exit 1 if the database is behind or a checksum differs
+
+The app never runs DDL. Each worker compares the recorded versions with the
+files once, with a single query, and SCHEMA_CHECK decides what happens when
+they differ: `warn` logs it, `error` answers 503 until `migrate` runs, `off`
+skips the check.
+"""
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import threading
+import time
+
+import psycopg2
+import psycopg2.errors
+from flask import jsonify
+
+import db
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(?P<version>\d{4})_(?P<nombre>[a-z0-9_]+)\.(?:sql|py)$')
+SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', 'warn')
+# Concurrent `migrate` runs (several instances starting at once) take turns
+MIGRATION_LOCK_KEY = 720002
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS migraciones_esquema (
+        version INTEGER PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        aplicada_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+        duracion_ms INTEGER
+    )
+"""
+
+
+class SchemaError(Exception):
+    pass
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Migration files sorted by version, with their checksum"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(('.sql', '.py')):
+            continue
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            raise SchemaError(f'{filename}: el nombre debe ser NNNN_nombre.sql o NNNN_nombre.py')
+        path = os.path.join(directory, filename)
+        with open(path, 'rb') as f:
+            content = f.read()
+        migrations.append({
+            'version': int(match['version']),
+            'nombre': filename,
+            'checksum': hashlib.sha256(content).hexdigest(),
+            'sql': content.decode('utf-8') if filename.endswith('.sql') else None,
+            'path': path,
+        })
+    versions = [m['version'] for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise SchemaError('Hay dos migraciones con el mismo número de versión')
+    return migrations
+
+
+def applied_versions(cursor):
+    """{version: checksum} recorded in the database; empty before the first migrate"""
+    try:
+        cursor.execute("SELECT version, checksum FROM migraciones_esquema ORDER BY version")
+    except psycopg2.errors.UndefinedTable:
+        cursor.connection.rollback()
+        return {}
+    return dict(cursor.fetchall())
+
+
+def compare(migrations, applied):
+    """(pending, changed, unknown): files not applied yet, files edited since
+    they were applied, and versions in the database this code does not have"""
+    known = {m['version'] for m in migrations}
+    pending = [m for m in migrations if m['version'] not in applied]
+    changed = [m for m in migrations if m['version'] in applied and applied[m['version']] != m['checksum']]
+    unknown = sorted(set(applied) - known)
+    return pending, changed, unknown
+
+
+def run_migration(conn, migration):
+    """Execute one migration in conn's open transaction"""
+    if migration['sql'] is not None:
+        conn.cursor().execute(migration['sql'])
+        return
+    spec = importlib.util.spec_from_file_location(f"migracion_{migration['version']:04d}", migration['path'])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+
+def migrate(conn=None, migrations=None):
+    """Apply the pending migrations in order; returns the names applied"""
+    migrations = load_migrations() if migrations is None else migrations
+    own_conn = conn is None
+    if own_conn:
+        conn = db.connect_direct()
+    done = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        try:
+            cursor.execute(CREATE_TABLE_SQL)
+            conn.commit()
+            pending, changed, _ = compare(migrations, applied_versions(cursor))
+            if changed:
+                raise SchemaError('Migraciones modificadas después de aplicarse: '
+                                  + ', '.join(m['nombre'] for m in changed)
+                                  + ' (agregar una migración nueva en vez de editarlas)')
+            for migration in pending:
+                start = time.perf_counter()
+                try:
+                    run_migration(conn, migration)
+                    cursor.execute("""
+                        INSERT INTO migraciones_esquema (version, nombre, checksum, duracion_ms)
+                        VALUES (%s, %s, %s, %s)
+                    """, (migration['version'], migration['nombre'], migration['checksum'],
+                          round((time.perf_counter() - start) * 1000)))
+                    conn.commit()
+                    for notice in conn.notices:
+                        if notice.startswith('WARNING'):
+                            print(f"⚠️  {migration['nombre']}: {notice.strip()}")
+                    del conn.notices[:]
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    raise SchemaError(f"{migration['nombre']}: {e}") from e
+                done.append(migration['nombre'])
+        finally:
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    return done
+
+
+def describe(migrations, applied):
+    """Why the database does not match this code, or None"""
+    pending, changed, _ = compare(migrations, applied)
+    if changed:
+        return ('Las migraciones ' + ', '.join(m['nombre'] for m in changed)
+                + ' cambiaron después de aplicarse')
+    if pending:
+        current = max(applied, default=0)
+        return (f"El esquema de la base está en la versión {current} y el código espera la "
+                f"{migrations[-1]['version']}: ejecutar python schema.py migrate")
+    return None
+
+
+# Startup check: one query per worker process, no DDL
+
+_checked_pid = None
+_problem = None
+_check_lock = threading.Lock()
+_migrations = None
+
+
+def check_schema():
+    """Compare the database with the migration files once per process"""
+    global _checked_pid, _problem, _migrations
+    pid = os.getpid()
+    if _checked_pid != pid:
+        with _check_lock:
+            if _checked_pid != pid:
+                if _migrations is None:
+                    _migrations = load_migrations()
+                conn = None
+                try:
+                    conn = db.get_db_connection()
+                    applied = applied_versions(conn.cursor())
+                    conn.rollback()
+                except psycopg2.Error as e:
+                    # Database unreachable: try again on the next request
+                    print(f"⚠️  No se pudo verificar el esquema: {e}")
+                    return None
+                finally:
+                    if conn is not None:
+                        conn.close()
+                _problem = describe(_migrations, applied)
+                _checked_pid = pid
+                if _problem:
+                    print(f"⚠️  {_problem}")
+    if _problem and SCHEMA_CHECK == 'error':
+        return jsonify({'error': _problem}), 503
+    return None
+
+
+def init_app(app):
+    if SCHEMA_CHECK != 'off':
+        app.before_request(check_schema)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migraciones del esquema de ActiveGym')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('migrate', help='Aplicar las migraciones pendientes')
+    commands.add_parser('status', help='Mostrar el estado de cada migración')
+    commands.add_parser('verify', help='Salir con código 1 si la base no coincide con las migraciones')
+    args = parser.parse_args(argv)
+
+    migrations = load_migrations()
+    if args.command == 'migrate':
+        try:
+            done = migrate(migrations=migrations)
+        except SchemaError as e:
+            print(f"❌ {e}")
+            return 1
+        for nombre in done:
+            print(f"✅ {nombre}")
+        print(f"✅ Esquema en la versión {migrations[-1]['version']}" if migrations else "✅ Sin migraciones")
+        return 0
+
+    conn = db.connect_direct()
+    try:
+        applied = applied_versions(conn.cursor())
+    finally:
+        conn.close()
+    if args.command == 'status':
+        pending, changed, unknown = compare(migrations, applied)
+        for migration in migrations:
+            estado = ('pendiente' if migration in pending else
+                      'modificada' if migration in changed else 'aplicada')
+            print(f"{migration['nombre']:<32} {estado}")
+        for version in unknown:
+            print(f"{version:04d} (desconocida)            aplicada, sin archivo en migrations/")
+        return 0
+
+    problem = describe(migrations, applied)
+    if problem:
+        print(f"❌ {problem}")
+        return 1
+    print(f"✅ Esquema en la versión {migrations[-1]['version']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
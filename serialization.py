@@ -0,0 +1,66 @@
+"""JSON encoding of database rows.
+
+Dates, datetimes and Decimals are encoded by the app's JSON provider, so
+handlers return rows as fetched instead of rewriting every field first.
+Rows can be read from plain tuple cursors (one dict per row zipped against
+the column names of the result), which is cheaper than RealDictCursor.
+orjson is used for encoding when it is installed.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder is used
+    orjson = None
+
+
+def to_json(value):
+    """default= hook: ISO dates/times and Decimals as numbers"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Tipo no serializable: {type(value).__name__}')
+
+
+def column_names(cursor):
+    """Names of the current result's columns, read once per result set"""
+    return [column.name for column in cursor.description]
+
+
+def fetch_dicts(cursor, rows=None):
+    """Rows of a plain (tuple) cursor as dicts keyed by column name"""
+    if rows is None:
+        rows = cursor.fetchall()
+    columns = column_names(cursor)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def dumps(obj, sort_keys=False):
+    """Encode to JSON bytes with the fastest available encoder"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=to_json, option=option)
+    return json.dumps(obj, default=to_json, ensure_ascii=False, sort_keys=sort_keys,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class RowJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that understands row values (see to_json)"""
+
+    default = staticmethod(to_json)
+    ensure_ascii = False
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with metrics.Timer('serialize'):
+            body = dumps(obj, self.sort_keys)
+        return self._app.response_class(body, mimetype=self.mimetype)
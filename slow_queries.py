@@ -0,0 +1,264 @@
+"""Slow-query log: statements over a threshold, with their EXPLAIN plan.
+
+Timed cursors (see metrics.py) report every statement slower than
+SLOW_QUERY_MS here. It is printed and kept in a per-worker ring buffer
+with the SQL normalized (literals and parameters replaced by ?, repeated
+VALUES rows folded), the parameter types instead of their values, and the
+route that ran it. With SLOW_QUERY_EXPLAIN=1 the first occurrence of each
+normalized read-only statement is run again under
+EXPLAIN (ANALYZE, BUFFERS) on a separate connection, in a read-only
+transaction, from a background thread. The parameters are passed to a
+prepared statement with a generic plan, so the plan shows $1, $2... rather
+than the values, and any string literal left in the plan text is replaced
+by ?. Statements on usuarios (password hashes) are never explained.
+
+Each worker writes its buffer and plans to METRICS_DIR/slow-<pid>.json so
+the admin endpoint can show every worker's entries.
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import psycopg2
+import psycopg2.sql
+from flask import has_request_context, request
+
+import db
+import metrics
+
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_BUFFER = int(os.environ.get('SLOW_QUERY_BUFFER', 200))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '').lower() in ('1', 'true', 'si')
+# Upper bound for re-running a statement under EXPLAIN ANALYZE
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.environ.get('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 5000))
+
+FILE_PREFIX = 'slow-'
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"[EeBbXx]?'(?:''|[^'])*'")
+_PLACEHOLDERS = re.compile(r'%(?:\([^)]*\))?s')
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_ROWS = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_SPACES = re.compile(r'\s+')
+_PARAMETERS = re.compile(r'%%|%\((\w+)\)s|%s')
+_SENSITIVE = re.compile(r'\busuarios\b', re.I)
+_WRITES = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|COPY|LOCK|CALL)\b|\bFOR\s+(UPDATE|SHARE)\b', re.I)
+
+
+def query_text(cursor, query):
+    """SQL of whatever execute() was given: str, bytes or a psycopg2.sql object"""
+    if isinstance(query, psycopg2.sql.Composable):
+        return query.as_string(cursor)
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    return query
+
+
+def normalize(sql):
+    """Statement shape without literals, so the same query always matches"""
+    sql = _COMMENTS.sub(' ', sql)
+    sql = _STRINGS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _SPACES.sub(' ', sql).strip()
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _ROWS.sub(r'\1, ...', sql)
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def redact(params):
+    """Parameter types only; values may be names, phones or passwords"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def is_read_only(normalized):
+    start = normalized.split(' ', 1)[0].upper()
+    return start in ('SELECT', 'WITH', 'VALUES', 'TABLE') and not _WRITES.search(normalized)
+
+
+def can_explain(normalized):
+    return is_read_only(normalized) and not _SENSITIVE.search(normalized)
+
+
+def server_parameters(sql, params):
+    """(SQL with $1, $2... instead of psycopg2 placeholders, values in that order)"""
+    if params is None:
+        return sql, []
+    values = []
+    positions = {}
+
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        if match.group(1) is None:
+            values.append(params[len(values)])
+            return f'${len(values)}'
+        name = match.group(1)
+        if name not in positions:
+            values.append(params[name])
+            positions[name] = len(values)
+        return f'${positions[name]}'
+
+    return _PARAMETERS.sub(replace, sql), values
+
+
+class SlowQueryLog:
+    """This worker's ring buffer and captured plans"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=SLOW_QUERY_BUFFER)
+        self.plans = {}
+        self.path = os.path.join(metrics.METRICS_DIR, f'{FILE_PREFIX}{self.pid}.json')
+        self.jobs = queue.Queue()
+        metrics.remove_dead_workers(FILE_PREFIX)
+        threading.Thread(target=self._run, name='slow-queries', daemon=True).start()
+
+    def record(self, cursor, query, params, ms):
+        sql = query_text(cursor, query)
+        normalized = normalize(sql)
+        huella = fingerprint(normalized)
+        entry = {
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'ms': round(ms, 2),
+            'sql': normalized,
+            'huella': huella,
+            'parametros': redact(params),
+            'ruta': f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+                    if has_request_context() else None,
+            'filas': cursor.rowcount,
+            'pid': self.pid,
+        }
+        print(f"⚠️  Consulta lenta ({entry['ms']} ms) en {entry['ruta'] or 'script'}: {normalized[:300]}")
+
+        explain = None
+        with self.lock:
+            self.entries.append(entry)
+            if SLOW_QUERY_EXPLAIN and huella not in self.plans and can_explain(normalized):
+                # Reserved now so concurrent occurrences are not explained twice
+                self.plans[huella] = {'sql': normalized, 'plan': None, 'error': None, 'fecha': entry['fecha']}
+                try:
+                    explain = server_parameters(sql, params)
+                except (IndexError, KeyError, TypeError) as e:
+                    self.plans[huella]['error'] = f'parámetros: {e}'
+        self.jobs.put((huella, explain))
+
+    def _run(self):
+        while True:
+            huella, explain = self.jobs.get()
+            if explain is not None:
+                plan, error = capture_plan(*explain)
+                with self.lock:
+                    self.plans[huella].update(plan=plan, error=error)
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def save(self):
+        with self.lock:
+            data = {'consultas': list(self.entries),
+                    'planes': {huella: dict(plan) for huella, plan in self.plans.items()}}
+        os.makedirs(metrics.METRICS_DIR, exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def capture_plan(statement, values=()):
+    """(plan text, error) of EXPLAIN (ANALYZE, BUFFERS), never committing anything
+
+    statement uses $n placeholders for values. It runs as a prepared
+    statement forced onto its generic plan, which shows the placeholders
+    where a custom plan would show the values.
+    """
+    try:
+        conn = db.connect_direct()
+    except psycopg2.Error as e:
+        return None, str(e).strip()
+    try:
+        conn.set_session(readonly=True)
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL statement_timeout = %s", (SLOW_QUERY_EXPLAIN_TIMEOUT_MS,))
+        cursor.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+        cursor.execute(f"PREPARE slow_query AS {statement}")
+        arguments = f"({', '.join(['%s'] * len(values))})" if values else ''
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) EXECUTE slow_query{arguments}", values or None)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        # Literals written into the SQL itself (not parameters) show up here
+        return _STRINGS.sub('?', plan), None
+    except psycopg2.Error as e:
+        # e.g. a temporary table that only existed on the original connection
+        return None, str(e).strip()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_log():
+    """This process's log, created lazily after gunicorn forks"""
+    global _log
+    pid = os.getpid()
+    if _log is None or _log.pid != pid:
+        with _log_lock:
+            if _log is None or _log.pid != pid:
+                _log = SlowQueryLog()
+    return _log
+
+
+def record(cursor, query, params, ms):
+    get_log().record(cursor, query, params, ms)
+
+
+def collect(limit=None):
+    """Entries of every worker, newest first, with the plans they refer to"""
+    log = get_log()
+    log.save()
+    entries = []
+    plans = {}
+    try:
+        names = os.listdir(metrics.METRICS_DIR)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not (name.startswith(FILE_PREFIX) and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(metrics.METRICS_DIR, name), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entries.extend(data['consultas'])
+        for huella, plan in data['planes'].items():
+            if plans.get(huella, {}).get('plan') is None:
+                plans[huella] = plan
+    entries.sort(key=lambda entry: entry['fecha'], reverse=True)
+    if limit is not None:
+        entries = entries[:limit]
+    used = {entry['huella'] for entry in entries}
+    return {
+        'umbral_ms': SLOW_QUERY_MS,
+        'explain': SLOW_QUERY_EXPLAIN,
+        'consultas': entries,
+        'planes': {huella: plan for huella, plan in plans.items() if huella in used},
+    }
@@ -0,0 +1,297 @@
+"""Daily statistics rollup (estadisticas_diarias) and period reports.
+
+The rollup and its closed-month aggregates (estadisticas_mensuales) are kept
+current by the triggers in migrations/0002_estadisticas.sql; this module
+rebuilds them from the base tables when needed:
+
+    python stats.py backfill 2024-01-01 2026-10-18
+
+backfill is a manual repair: it blocks writes to the base tables while it
+runs. The nightly estadisticas-rollup job uses rollup() instead, which only
+locks the estadisticas_diarias rows of the days it rebuilds.
+
+Every write adds its delta to the estadisticas_diarias row of its day (and
+bumps its versiones_recursos row), so concurrent writes of the same day
+take turns on that row until they commit. At a gym's write rate that wait
+is a row update long; a bulk import holds the row for its whole transaction.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+import db
+
+
+def day_range(day):
+    """Half-open [start, end) timestamp range covering a calendar day"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+# One pass over each base table for the whole range. Days without activity
+# still get a row so the history has no gaps.
+BACKFILL_SQL = """
+WITH dias AS (
+    SELECT generate_series(%(desde)s::date, %(hasta)s::date, interval '1 day')::date AS fecha
+), m AS (
+    SELECT created_at::date AS fecha, COUNT(*) AS n
+    FROM clientes WHERE created_at >= %(inicio)s AND created_at < %(fin)s GROUP BY 1
+), p AS (
+    SELECT fecha_pago AS fecha, SUM(monto) AS ingresos
+    FROM pagos_miembros WHERE fecha_pago >= %(desde)s AND fecha_pago <= %(hasta)s GROUP BY 1
+), d AS (
+    SELECT created_at::date AS fecha, COALESCE(SUM(cantidad_clientes), 0) AS n, COALESCE(SUM(total), 0) AS ingresos
+    FROM usuarios_diarios WHERE created_at >= %(inicio)s AND created_at < %(fin)s GROUP BY 1
+), v AS (
+    SELECT created_at::date AS fecha, COUNT(*) AS n, COALESCE(SUM(total), 0) AS ingresos
+    FROM ventas WHERE created_at >= %(inicio)s AND created_at < %(fin)s GROUP BY 1
+), e AS (
+    SELECT fecha, COALESCE(SUM(monto), 0) AS monto
+    FROM egresos WHERE fecha >= %(desde)s AND fecha <= %(hasta)s GROUP BY 1
+), filas AS (
+    SELECT dias.fecha,
+           (SELECT COUNT(*) FROM clientes WHERE created_at < %(inicio)s)
+               + SUM(COALESCE(m.n, 0)) OVER (ORDER BY dias.fecha) AS total_miembros,
+           COALESCE(m.n, 0) AS nuevos_miembros,
+           COALESCE(p.ingresos, 0) AS ingresos_miembros,
+           COALESCE(d.n, 0) AS clientes_diarios,
+           COALESCE(d.ingresos, 0) AS ingresos_diarios,
+           COALESCE(v.n, 0) AS ventas,
+           COALESCE(v.ingresos, 0) AS ingresos_ventas,
+           COALESCE(e.monto, 0) AS egresos_totales
+    FROM dias
+    LEFT JOIN m ON m.fecha = dias.fecha
+    LEFT JOIN p ON p.fecha = dias.fecha
+    LEFT JOIN d ON d.fecha = dias.fecha
+    LEFT JOIN v ON v.fecha = dias.fecha
+    LEFT JOIN e ON e.fecha = dias.fecha
+)
+INSERT INTO estadisticas_diarias (
+    fecha, total_miembros, nuevos_miembros, ingresos_miembros, clientes_diarios,
+    ingresos_diarios, ventas, ingresos_ventas, egresos_totales,
+    usuarios_diarios, ingresos_totales, ganancias_diarias
+)
+SELECT fecha, total_miembros, nuevos_miembros, ingresos_miembros, clientes_diarios,
+       ingresos_diarios, ventas, ingresos_ventas, egresos_totales,
+       nuevos_miembros + clientes_diarios,
+       ingresos_miembros + ingresos_diarios + ingresos_ventas,
+       ingresos_miembros + ingresos_diarios + ingresos_ventas - egresos_totales
+FROM filas
+ON CONFLICT (fecha) DO UPDATE SET
+    total_miembros = EXCLUDED.total_miembros,
+    nuevos_miembros = EXCLUDED.nuevos_miembros,
+    ingresos_miembros = EXCLUDED.ingresos_miembros,
+    clientes_diarios = EXCLUDED.clientes_diarios,
+    ingresos_diarios = EXCLUDED.ingresos_diarios,
+    ventas = EXCLUDED.ventas,
+    ingresos_ventas = EXCLUDED.ingresos_ventas,
+    egresos_totales = EXCLUDED.egresos_totales,
+    usuarios_diarios = EXCLUDED.usuarios_diarios,
+    ingresos_totales = EXCLUDED.ingresos_totales,
+    ganancias_diarias = EXCLUDED.ganancias_diarias
+"""
+
+VENCIMIENTOS_SQL = """
+DELETE FROM clientes_vencimientos;
+INSERT INTO clientes_vencimientos (fecha_fin_mensualidad, cantidad)
+SELECT fecha_fin_mensualidad, COUNT(*) FROM clientes GROUP BY 1;
+"""
+
+
+def backfill(desde, hasta, conn=None):
+    """Rebuild estadisticas_diarias for [desde, hasta] and the expiry counts"""
+    own_conn = conn is None
+    if own_conn:
+        conn = db.connect_direct()
+    try:
+        cursor = conn.cursor()
+        # Block writers briefly so trigger deltas cannot interleave with the rebuild
+        cursor.execute("LOCK TABLE clientes, pagos_miembros, usuarios_diarios, ventas, egresos IN SHARE MODE")
+        cursor.execute(VENCIMIENTOS_SQL)
+        inicio, _ = day_range(desde)
+        _, fin = day_range(hasta)
+        cursor.execute(BACKFILL_SQL, {'desde': desde, 'hasta': hasta, 'inicio': inicio, 'fin': fin})
+        rows = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def rollup(desde, hasta, conn=None):
+    """Rebuild the estadisticas_diarias rows of [desde, hasta] without blocking writers.
+
+    The days' rows are locked first: a write of those days waits in its
+    trigger, so it is either committed before the rebuild reads the base
+    tables or adds its delta on top of the rebuilt row afterwards.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = db.connect_direct()
+    try:
+        cursor = conn.cursor()
+        # Every day gets its row first, in a transaction of its own
+        cursor.execute("""
+            INSERT INTO estadisticas_diarias (fecha)
+            SELECT generate_series(%s::date, %s::date, interval '1 day')::date
+            ON CONFLICT (fecha) DO NOTHING
+        """, (desde, hasta))
+        conn.commit()
+        # In date order, like the triggers, and before anything that bumps
+        # versiones_recursos (which the triggers lock after the day's row)
+        cursor.execute("""
+            SELECT fecha FROM estadisticas_diarias WHERE fecha >= %s AND fecha <= %s
+            ORDER BY fecha FOR UPDATE
+        """, (desde, hasta))
+        inicio, _ = day_range(desde)
+        _, fin = day_range(hasta)
+        cursor.execute(BACKFILL_SQL, {'desde': desde, 'hasta': hasta, 'inicio': inicio, 'fin': fin})
+        rows = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+
+# Report buckets accepted by /api/estadisticas/rango (and date_trunc units)
+GRANULARIDADES = {'dia': 'day', 'semana': 'week', 'mes': 'month', 'anio': 'year'}
+
+# Whole closed months come from estadisticas_mensuales; the edges of the range,
+# the current month and any month not materialized yet are summed from the
+# daily rows. Every bucket in the range is returned, even without activity.
+RANGE_SQL = """
+WITH faltantes AS (
+    SELECT mes::date AS mes
+    FROM generate_series(%(meses_desde)s::date, %(meses_hasta)s::date - 1, interval '1 month') AS mes
+    EXCEPT
+    SELECT mes FROM estadisticas_mensuales
+), filas AS (
+    SELECT mes AS fecha, total_miembros, nuevos_miembros, clientes_diarios, ventas,
+           ingresos_miembros, ingresos_diarios, ingresos_ventas, ingresos_totales,
+           egresos_totales, ganancias
+    FROM estadisticas_mensuales
+    WHERE mes >= %(meses_desde)s AND mes < %(meses_hasta)s
+    UNION ALL
+    SELECT fecha, total_miembros, nuevos_miembros, clientes_diarios, ventas,
+           ingresos_miembros, ingresos_diarios, ingresos_ventas, ingresos_totales,
+           egresos_totales, ganancias_diarias
+    FROM estadisticas_diarias
+    WHERE fecha >= %(desde)s AND fecha <= %(hasta)s
+      AND (fecha < %(meses_desde)s OR fecha >= %(meses_hasta)s
+           OR date_trunc('month', fecha)::date IN (SELECT mes FROM faltantes))
+), grupos AS (
+    SELECT date_trunc(%(unidad)s, fecha::timestamp) AS inicio,
+           (array_agg(total_miembros ORDER BY fecha DESC))[1] AS total_miembros,
+           SUM(nuevos_miembros) AS nuevos_miembros,
+           SUM(clientes_diarios) AS clientes_diarios,
+           SUM(ventas) AS ventas,
+           SUM(ingresos_miembros) AS ingresos_miembros,
+           SUM(ingresos_diarios) AS ingresos_diarios,
+           SUM(ingresos_ventas) AS ingresos_ventas,
+           SUM(ingresos_totales) AS ingresos,
+           SUM(egresos_totales) AS egresos,
+           SUM(ganancias) AS ganancias
+    FROM filas
+    GROUP BY 1
+)
+SELECT periodos.inicio::date AS periodo,
+       grupos.total_miembros,
+       COALESCE(grupos.nuevos_miembros, 0)::int AS nuevos_miembros,
+       COALESCE(grupos.clientes_diarios, 0)::int AS clientes_diarios,
+       COALESCE(grupos.ventas, 0)::int AS ventas,
+       COALESCE(grupos.ingresos_miembros, 0) AS ingresos_miembros,
+       COALESCE(grupos.ingresos_diarios, 0) AS ingresos_diarios,
+       COALESCE(grupos.ingresos_ventas, 0) AS ingresos_ventas,
+       COALESCE(grupos.ingresos, 0) AS ingresos,
+       COALESCE(grupos.egresos, 0) AS egresos,
+       COALESCE(grupos.ganancias, 0) AS ganancias
+FROM generate_series(date_trunc(%(unidad)s, %(desde)s::timestamp), %(hasta)s::timestamp,
+                     ('1 ' || %(unidad)s)::interval) AS periodos(inicio)
+LEFT JOIN grupos ON grupos.inicio = periodos.inicio
+ORDER BY 1
+"""
+
+PREVIOUS_TOTAL_SQL = """
+SELECT total_miembros FROM estadisticas_diarias
+WHERE fecha < %s ORDER BY fecha DESC LIMIT 1
+"""
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def closed_months(desde, hasta, today):
+    """[first, end) of the whole, already finished months inside [desde, hasta]"""
+    first = desde if desde.day == 1 else next_month(desde)
+    end = next_month(hasta) if next_month(hasta) - timedelta(days=1) == hasta else month_start(hasta)
+    end = min(end, month_start(today))
+    return (first, end) if first < end else (first, first)
+
+
+def period_report(cursor, desde, hasta, granularidad='mes', today=None):
+    """Income, expenses, profit and member/visitor counts per bucket of [desde, hasta].
+
+    Expects a RealDictCursor.
+    """
+    today = today or datetime.now().date()
+    unidad = GRANULARIDADES[granularidad]
+    if unidad in ('month', 'year'):
+        meses_desde, meses_hasta = closed_months(desde, hasta, today)
+    else:
+        meses_desde = meses_hasta = desde
+
+    cursor.execute(RANGE_SQL, {
+        'desde': desde, 'hasta': hasta, 'unidad': unidad,
+        'meses_desde': meses_desde, 'meses_hasta': meses_hasta
+    })
+    periodos = [dict(row) for row in cursor.fetchall()]
+
+    # Buckets without activity keep the last known member total
+    cursor.execute(PREVIOUS_TOTAL_SQL, (desde,))
+    row = cursor.fetchone()
+    total = row['total_miembros'] if row else 0
+    for periodo in periodos:
+        if periodo['total_miembros'] is None:
+            periodo['total_miembros'] = total
+        total = periodo['total_miembros']
+    return periodos
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estadísticas diarias de ActiveGym')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rebuild = commands.add_parser('backfill', help='Reconstruir un rango de fechas desde las tablas base')
+    rebuild.add_argument('desde', type=parse_date, help='YYYY-MM-DD')
+    rebuild.add_argument('hasta', type=parse_date, nargs='?', default=datetime.now().date(),
+                         help='YYYY-MM-DD (por defecto hoy)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'backfill':
+        if args.hasta < args.desde:
+            parser.error('hasta debe ser posterior a desde')
+        rows = backfill(args.desde, args.hasta)
+        print(f"✅ {rows} días reconstruidos ({args.desde} a {args.hasta})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
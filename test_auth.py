@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+import auth
+
+
+@pytest.fixture(autouse=True)
+def signing_key(monkeypatch):
+    monkeypatch.setenv('SECRET_KEY', 'clave-de-pruebas')
+    # Tokens verified by an earlier test are not trusted from the cache
+    monkeypatch.setattr(auth, '_tokens', auth.LRUCache(1024))
+    auth.serializer.cache_clear()
+    yield
+    auth.serializer.cache_clear()
+
+
+@pytest.fixture
+def users(monkeypatch):
+    """In-memory usuarios rows: id -> (rol, activo, sesiones_version)"""
+    rows = {}
+
+    def load_user(user_id):
+        return rows.get(user_id, (None, False, None)) + (time.monotonic(),)
+
+    monkeypatch.setattr(auth, 'load_user', load_user)
+    return rows
+
+
+def test_valid_token(users):
+    users[1] = ('admin', True, 0)
+    token = auth.issue_token({'id': 1, 'rol': 'admin', 'sesiones_version': 0})
+    assert auth.authenticate(token) == {'id': 1, 'rol': 'admin'}
+
+
+def test_current_rol_wins_over_the_token(users):
+    users[2] = ('socio', True, 0)
+    token = auth.issue_token({'id': 2, 'rol': 'admin', 'sesiones_version': 0})
+    assert auth.authenticate(token)['rol'] == 'socio'
+
+
+def test_tampered_token(users):
+    users[1] = ('admin', True, 0)
+    token = auth.issue_token({'id': 1, 'rol': 'admin', 'sesiones_version': 0})
+    with pytest.raises(auth.AuthError, match='Token inválido'):
+        auth.authenticate(token[:-2] + ('AA' if not token.endswith('AA') else 'BB'))
+
+
+def test_token_signed_with_another_key(users, monkeypatch):
+    users[1] = ('admin', True, 0)
+    token = auth.issue_token({'id': 1, 'rol': 'admin', 'sesiones_version': 0})
+    monkeypatch.setenv('SECRET_KEY', 'otra-clave')
+    auth.serializer.cache_clear()
+    with pytest.raises(auth.AuthError, match='Token inválido'):
+        auth.authenticate(token)
+
+
+def test_expired_token(users, monkeypatch):
+    users[1] = ('admin', True, 0)
+    token = auth.issue_token({'id': 1, 'rol': 'admin', 'sesiones_version': 0})
+    assert auth.authenticate(token)
+    # Also once the verified token is cached
+    monkeypatch.setattr(auth, 'AUTH_TOKEN_HOURS', -1)
+    with pytest.raises(auth.AuthError, match='expiró'):
+        auth.authenticate(token)
+
+
+def test_revoked_sessions(users):
+    users[3] = ('admin', True, 0)
+    old = auth.issue_token({'id': 3, 'rol': 'admin', 'sesiones_version': 0})
+    assert auth.authenticate(old)
+    # Logout in the same second the token was issued
+    users[3] = ('admin', True, 1)
+    with pytest.raises(auth.AuthError, match='ya no es válida'):
+        auth.authenticate(old)
+    assert auth.authenticate(auth.issue_token({'id': 3, 'rol': 'admin', 'sesiones_version': 1}))
+
+
+def test_tokens_without_version_count_as_zero(users):
+    users[4] = ('admin', True, 0)
+    legacy = auth.serializer().dumps({'id': 4, 'rol': 'admin'})
+    assert auth.authenticate(legacy)['id'] == 4
+    users[4] = ('admin', True, 1)
+    with pytest.raises(auth.AuthError):
+        auth.authenticate(legacy)
+
+
+def test_inactive_or_deleted_user(users):
+    users[5] = ('admin', False, 0)
+    with pytest.raises(auth.AuthError):
+        auth.authenticate(auth.issue_token({'id': 5, 'rol': 'admin', 'sesiones_version': 0}))
+    with pytest.raises(auth.AuthError):
+        auth.authenticate(auth.issue_token({'id': 6, 'rol': 'admin', 'sesiones_version': 0}))
+
+
+def test_passwords():
+    stored = auth.hash_password('secreto')
+    assert auth.is_hashed(stored) and not auth.needs_rehash(stored)
+    assert auth.check_password(stored, 'secreto')
+    assert not auth.check_password(stored, 'otro')
+    # Legacy plaintext rows still log in once, then get rehashed
+    assert auth.check_password('secreto', 'secreto') and auth.needs_rehash('secreto')
+    assert not auth.check_password(None, 'secreto')
+
+
+def test_generated_key_is_private_and_stable(tmp_path, monkeypatch):
+    monkeypatch.delenv('SECRET_KEY')
+    monkeypatch.setattr(auth, 'SECRET_KEY_FILE', str(tmp_path / 'clave'))
+    key = auth.secret_key()
+    assert len(key) == 64
+    assert (tmp_path / 'clave').stat().st_mode & 0o777 == 0o600
+    assert auth.secret_key() == key
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['clave']
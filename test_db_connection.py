@@ -1,14 +1,9 @@
 import psycopg2
-import os
 
-# Configuración de la base de datos
-DB_CONFIG = {
-    'host': 'dpg-d2b7fsruibrs73fbmm5g-a.oregon-postgres.render.com',
-    'user': 'activegym_db_user',
-    'password': 'yVsyXoWBw9jX4CmmidgJJ2DvWQtjbyyJ',
-    'dbname': 'activegym_db',
-    'port': 5432
-}
+from db import get_db_config
+
+# Configuración de la base de datos (variables DB_*, por defecto la local)
+DB_CONFIG = get_db_config()
 
 def test_connection():
     try:
@@ -0,0 +1,140 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import events
+
+
+@pytest.fixture
+def fast_pings(monkeypatch):
+    # Pings also wake the reader below and trigger the revocation check
+    monkeypatch.setattr(events, 'EVENTS_PING_SECONDS', 0.2)
+
+
+def parse(chunk):
+    found = []
+    for block in chunk.decode('utf-8').split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            found.append((fields['event'], json.loads(fields['data'])))
+    return found
+
+
+def read_until(chunks, done, timeout=10):
+    """Events read until done(events) or the stream ends; None on timeout"""
+    found = []
+    deadline = time.monotonic() + timeout
+    for chunk in chunks:
+        found += parse(chunk)
+        if done(found):
+            return found
+        if time.monotonic() > deadline:
+            return None
+    return found
+
+
+def test_stream_delivers_changes_and_closes_on_logout(client, admin, fast_pings):
+    headers = {'Authorization': f"Bearer {admin['token']}"}
+    response = client.get('/api/events', query_string={'token': admin['token']}, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    venta_id = None
+    try:
+        assert read_until(chunks, lambda found: ('sincronizar', {}) in found)
+
+        created = client.post('/api/ventas', json={'producto': 'Agua', 'cantidad': 1, 'precio_unitario': 1},
+                              headers=headers)
+        venta_id = created.get_json()['id']
+
+        def delivered(found):
+            return any(event == 'cambio' and data['tabla'] == 'ventas' and venta_id in data['ids']
+                       for event, data in found)
+        found = read_until(chunks, lambda found: delivered(found) and ('estadisticas' in dict(found)))
+        assert found is not None and delivered(found)
+
+        assert client.delete(f'/api/ventas/{venta_id}', headers=headers).status_code == 200
+        venta_id = None
+        # The revoked session's stream ends at the next ping
+        assert client.post('/api/logout', headers=headers).status_code == 200
+        assert read_until(chunks, lambda found: False) is not None
+    finally:
+        response.close()
+        if venta_id is not None:
+            client.delete(f'/api/ventas/{venta_id}', headers=headers)
+
+
+def test_stream_without_token(client, database):
+    assert client.get('/api/events').status_code == 401
+
+
+@pytest.fixture
+def events_service(database):
+    """events_server.py under gunicorn's gevent worker, as deployed; yields its port"""
+    pytest.importorskip('gevent')
+    pytest.importorskip('psycogreen')
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'gevent', '--workers', '1',
+         '--bind', f'127.0.0.1:{port}', 'events_server:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, EVENTS_PING_SECONDS='0.2'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except ConnectionRefusedError:
+                assert time.monotonic() < deadline, 'events_server no arrancó'
+                time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def open_stream(port, path, origin=None):
+    sock = socket.create_connection(('127.0.0.1', port), timeout=10)
+    headers = f'Origin: {origin}\r\n' if origin else ''
+    sock.sendall(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n'.encode())
+    return sock
+
+
+def read_response(sock, done):
+    data = b''
+    while not done(data):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def test_events_service(events_service, client, admin):
+    headers = {'Authorization': f"Bearer {admin['token']}"}
+    other = read_response(open_stream(events_service, '/api/ventas'), lambda data: b'solo sirve' in data)
+    assert other.startswith(b'HTTP/1.1 404')
+
+    streams = [open_stream(events_service, f"/api/events?token={admin['token']}", 'https://activegym.onrender.com')
+               for _ in range(50)]
+    heads = [read_response(sock, lambda data: b'event: sincronizar' in data) for sock in streams]
+    assert all(head.startswith(b'HTTP/1.1 200') for head in heads)
+    assert b'Access-Control-Allow-Origin: https://activegym.onrender.com' in heads[0]
+
+    venta_id = client.post('/api/ventas', json={'producto': 'Agua', 'cantidad': 1, 'precio_unitario': 1},
+                           headers=headers).get_json()['id']
+    try:
+        marker = f'"ids":[{venta_id}]'.encode()
+        assert all(marker in read_response(sock, lambda data: marker in data) for sock in streams)
+    finally:
+        client.delete(f'/api/ventas/{venta_id}', headers=headers)
+        for sock in streams:
+            sock.close()
@@ -0,0 +1,56 @@
+import os
+import re
+import subprocess
+import sys
+from datetime import date, datetime
+
+import pytest
+
+import db
+from benchmarks import bench_export
+
+
+EXPORT_ROWS = 1000000
+# Seeded over the five years before this, where there are no real sales
+SEED_UNTIL = datetime(1999, 12, 31, 12)
+SEED_FROM = date(1995, 1, 1)
+EXPORT_MAX_RSS_MB = 64
+
+COUNT_SQL = "SELECT COUNT(*) FROM ventas WHERE created_at >= %s AND created_at < %s"
+
+
+@pytest.fixture(scope='module')
+def seeded_ventas(database):
+    """Seed a million ventas (bench_export.seed); yields how many rows the window holds"""
+    window = (SEED_FROM, date(SEED_UNTIL.year + 1, 1, 1))
+    bench_export.seed(EXPORT_ROWS, SEED_UNTIL)
+    conn = db.connect_direct()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(COUNT_SQL, window)
+        yield cursor.fetchone()[0]
+    finally:
+        cursor.execute("""
+            DELETE FROM ventas
+            WHERE created_at >= %s AND created_at < %s AND observaciones LIKE 'Venta sintética %%'
+        """, window)
+        conn.commit()
+        conn.close()
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_export_streams_in_bounded_memory(seeded_ventas, admin, fmt):
+    assert seeded_ventas >= EXPORT_ROWS
+    # A fresh process, so its peak RSS only reflects this export
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_export', '--formato', fmt,
+         '--desde', SEED_FROM.isoformat(), '--hasta', SEED_UNTIL.date().isoformat(),
+         '--usuario', admin['usuario'], '--max-rss-mb', str(EXPORT_MAX_RSS_MB)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, LOADTEST_PASSWORD=admin['password'], JOBS_IN_PROCESS='0'),
+        capture_output=True, text=True, timeout=600)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    lines = int(re.search(r'rows=\s*(\d+)', result.stdout).group(1))
+    # Every row is one line; the CSV also has its header
+    assert lines == seeded_ventas + (1 if fmt == 'csv' else 0)
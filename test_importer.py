@@ -0,0 +1,56 @@
+import csv
+
+from app import IMPORT_VALIDATORS
+from importer import read_csv, to_copy, validate_rows
+
+
+CLIENTES_CSV = """Nombre,Apellido,Telefono,Precio_Mensualidad,Fecha_Inicio,Duracion,Peso
+Ana,Paz,0991234567,30,2026-10-01,30,
+Luis,Mora,0997654321,abc,2026-10-01,30,
+Eva,Sol,,25,2026-10-01,30,
+Ana,Paz,0991234567,30,2026-10-05,30,
+Rita,Vera,0990000000,20,01/10/2026,7,
+Juan,Ruiz,0991111111,20,2026-10-01,7.5,
+Sara,León,0992222222,20,2026-10-01,7,-3
+"""
+
+
+def validate(table, text):
+    buffer, valid, rejected = validate_rows(table, read_csv(text), IMPORT_VALIDATORS[table])
+    return list(csv.reader(buffer)), valid, rejected
+
+
+def test_read_csv_normalizes_headers_and_counts_lines():
+    rows = list(read_csv('﻿Nombre , APELLIDO\n Ana ,Paz\n'.encode('utf-8')))
+    assert rows == [(2, {'nombre': 'Ana', 'apellido': 'Paz'})]
+
+
+def test_clientes_are_validated_row_by_row():
+    rows, valid, rejected = validate('clientes', CLIENTES_CSV)
+    assert valid == 1
+    assert rows == [['2', 'Ana', 'Paz', '\\N', '0991234567', '30', '2026-10-01', '2026-11-01', '30', rows[0][-1]]]
+    assert {item['fila']: item['error'] for item in rejected} == {
+        3: 'Valor numérico inválido en precio_mensualidad',
+        4: 'Campo requerido: telefono',
+        5: 'Registro duplicado en el archivo',
+        6: 'Fecha inválida en fecha_inicio, use YYYY-MM-DD',
+        7: 'Valor numérico inválido en duracion',
+        8: 'peso debe ser mayor que cero',
+    }
+
+
+def test_ventas_total():
+    rows, valid, rejected = validate('ventas', 'producto,cantidad,precio_unitario\nAgua,3,1.50\nBarra,0,2\n')
+    assert valid == 1 and rows == [['2', 'Agua', '3', '1.50', '4.50']]
+    assert rejected == [{'fila': 3, 'error': 'cantidad debe ser mayor que cero'}]
+
+
+def test_egresos_without_date_get_today():
+    rows, valid, rejected = validate('egresos', 'descripcion,monto,fecha\nLuz,10,\nAgua,,2026-10-01\n')
+    assert valid == 1 and rows[0][2:] == ['Luz', '10']
+    assert rejected == [{'fila': 3, 'error': 'Descripción y monto son requeridos'}]
+
+
+def test_to_copy():
+    assert to_copy(None) == '\\N'
+    assert to_copy('') == ''
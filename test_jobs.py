@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from jobs import CronExpression
+
+
+def test_every_minute():
+    assert CronExpression('* * * * *').next_after(datetime(2026, 10, 18, 9, 30, 45)) == \
+        datetime(2026, 10, 18, 9, 31)
+
+
+def test_strictly_after():
+    cron = CronExpression('0 3 * * *')
+    assert cron.next_after(datetime(2026, 10, 18, 3, 0)) == datetime(2026, 10, 19, 3, 0)
+    assert cron.next_after(datetime(2026, 10, 18, 2, 59)) == datetime(2026, 10, 18, 3, 0)
+
+
+def test_steps_ranges_and_lists():
+    cron = CronExpression('*/15 8-9 * * *')
+    assert cron.next_after(datetime(2026, 10, 18, 9, 50)) == datetime(2026, 10, 19, 8, 0)
+    assert CronExpression('5,35 * * * *').next_after(datetime(2026, 10, 18, 9, 10)) == \
+        datetime(2026, 10, 18, 9, 35)
+
+
+def test_weekday_starts_on_sunday():
+    # 2026-10-18 is a Sunday
+    assert CronExpression('0 6 * * 1').next_after(datetime(2026, 10, 18, 12, 0)) == \
+        datetime(2026, 10, 19, 6, 0)
+    assert CronExpression('0 6 * * 0').next_after(datetime(2026, 10, 17, 12, 0)) == \
+        datetime(2026, 10, 18, 6, 0)
+
+
+def test_day_or_weekday_when_both_are_restricted():
+    # Like cron: the 1st of the month or any Monday
+    cron = CronExpression('0 0 1 * 1')
+    assert cron.next_after(datetime(2026, 10, 18)) == datetime(2026, 10, 19)
+    assert cron.next_after(datetime(2026, 10, 27)) == datetime(2026, 11, 1)
+
+
+def test_month_rollover():
+    assert CronExpression('0 0 1 1 *').next_after(datetime(2026, 10, 18)) == datetime(2027, 1, 1)
+
+
+@pytest.mark.parametrize('text', ['* * * *', '60 * * * *', '* 24 * * *', '0 0 0 * *', '5-1 * * * *', 'a * * * *'])
+def test_invalid_expression(text):
+    with pytest.raises(ValueError):
+        CronExpression(text)
+
+
+def test_never_matching_expression():
+    with pytest.raises(ValueError, match='nunca se cumple'):
+        CronExpression('0 0 31 2 *').next_after(datetime(2026, 10, 18))
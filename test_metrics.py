@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_registry', None)
+    return metrics.get_registry()
+
+
+def lines(text, name):
+    return [line for line in text.splitlines() if line.startswith('activegym_' + name)]
+
+
+def test_counters_and_histograms(registry):
+    registry.inc('http_requests_total', ('/api/ventas', 'GET', '200'))
+    registry.inc('http_requests_total', ('/api/ventas', 'GET', '200'))
+    registry.observe('db_queries', ('/api/ventas',), 3)
+    registry.observe('db_queries', ('/api/ventas',), 500)
+    text = metrics.render()
+
+    assert '# TYPE activegym_http_requests_total counter' in text
+    assert lines(text, 'http_requests_total') == [
+        'activegym_http_requests_total{endpoint="/api/ventas",method="GET",status="200"} 2']
+    buckets = lines(text, 'db_queries_bucket')
+    assert 'activegym_db_queries_bucket{endpoint="/api/ventas",le="2"} 0' in buckets
+    assert 'activegym_db_queries_bucket{endpoint="/api/ventas",le="3"} 1' in buckets
+    assert buckets[-1] == 'activegym_db_queries_bucket{endpoint="/api/ventas",le="+Inf"} 2'
+    assert 'activegym_db_queries_sum{endpoint="/api/ventas"} 503' in text
+    assert 'activegym_db_queries_count{endpoint="/api/ventas"} 2' in text
+
+
+def test_workers_are_added_up(registry, tmp_path):
+    registry.inc('jobs_total', ('purga', 'ok'), 2)
+    (tmp_path / 'worker-1.json').write_text(json.dumps([['jobs_total', ['purga', 'ok'], 3]]))
+    assert lines(metrics.render(), 'jobs_total') == ['activegym_jobs_total{tipo="purga",resultado="ok"} 5']
+
+
+def test_label_values_are_escaped(registry):
+    registry.inc('http_requests_total', ('/a"b\\c\nd', 'GET', '404'))
+    assert 'endpoint="/a\\"b\\\\c\\nd"' in metrics.render()
+
+
+def test_remove_dead_workers(registry, tmp_path):
+    for name in ('worker-999999999.json', f'worker-{os.getpid()}.json', 'worker-copia.json', 'otro.json'):
+        (tmp_path / name).write_text('[]')
+    metrics.remove_dead_workers()
+    assert sorted(os.listdir(tmp_path)) == sorted(['otro.json', f'worker-{os.getpid()}.json', 'worker-copia.json'])
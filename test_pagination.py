@@ -0,0 +1,27 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip_datetime():
+    created_at = datetime(2026, 10, 18, 9, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_date_cursor_comes_back_as_date():
+    value, row_id = decode_cursor(encode_cursor(date(2026, 2, 28), 7))
+    assert type(value) is date
+    assert (value, row_id) == (date(2026, 2, 28), 7)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2026, 1, 1, 23, 59, 59, 999999), 10 ** 9)
+    assert all(ch.isalnum() or ch in '-_' for ch in cursor)
+
+
+@pytest.mark.parametrize('cursor', ['', 'no-es-un-cursor', 'MjAyNi0xMC0xOA', '////'])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError, match='Cursor inválido'):
+        decode_cursor(cursor)
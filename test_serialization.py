@@ -0,0 +1,57 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+import serialization
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.json = serialization.RowJSONProvider(app)
+    return app
+
+
+def test_row_values(app):
+    row = {'id': 1, 'fecha': date(2026, 10, 18), 'creado': datetime(2026, 10, 18, 9, 30, 5),
+           'hora': time(7, 15), 'monto': Decimal('12.50'), 'nombre': 'Martínez', 'nota': None}
+    with app.app_context():
+        response = jsonify([row])
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == [{
+        'id': 1, 'fecha': '2026-10-18', 'creado': '2026-10-18T09:30:05', 'hora': '07:15:00',
+        'monto': 12.5, 'nombre': 'Martínez', 'nota': None}]
+    # ensure_ascii is off: non-ASCII text is sent as UTF-8
+    assert 'Martínez'.encode('utf-8') in response.get_data()
+
+
+def test_keyword_arguments(app):
+    with app.app_context():
+        response = jsonify(error='Cursor inválido')
+    assert json.loads(response.get_data()) == {'error': 'Cursor inválido'}
+
+
+def test_unknown_types_are_rejected(app):
+    with app.app_context(), pytest.raises(TypeError):
+        jsonify({'valor': object()})
+
+
+def test_dumps_sort_keys():
+    assert serialization.dumps({'b': 1, 'a': Decimal('2')}, sort_keys=True) == b'{"a":2.0,"b":1}'
+
+
+def test_fetch_dicts():
+    class Column:
+        def __init__(self, name):
+            self.name = name
+
+    class Cursor:
+        description = [Column('id'), Column('nombre')]
+
+        def fetchall(self):
+            return [(1, 'Ana'), (2, 'Luis')]
+
+    assert serialization.fetch_dicts(Cursor()) == [{'id': 1, 'nombre': 'Ana'}, {'id': 2, 'nombre': 'Luis'}]
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from slow_queries import can_explain, fingerprint, normalize, redact, server_parameters
+
+
+def test_literals_and_parameters_become_placeholders():
+    sql = """
+        SELECT * FROM clientes  -- búsqueda
+        WHERE nombre = 'Ana' AND peso > 70.5 AND id = %s AND telefono LIKE %(prefix)s
+    """
+    assert normalize(sql) == 'SELECT * FROM clientes WHERE nombre = ? AND peso > ? AND id = ? AND telefono LIKE ?'
+
+
+def test_quoted_literals_and_comments():
+    assert normalize("SELECT /* x */ 'O''Brien', X'1F' -- fin") == 'SELECT ?, ?'
+
+
+def test_in_lists_and_values_rows_are_folded():
+    assert normalize('SELECT 1 FROM ventas WHERE id IN (%s, %s, %s)') == 'SELECT ? FROM ventas WHERE id IN (...)'
+    assert normalize('INSERT INTO ventas (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)') == \
+        'INSERT INTO ventas (a, b) VALUES (?, ?), ...'
+
+
+def test_same_shape_same_fingerprint():
+    first = normalize("SELECT * FROM ventas WHERE id = 1")
+    second = normalize("SELECT *   FROM ventas\nWHERE id = 2")
+    assert fingerprint(first) == fingerprint(second)
+
+
+def test_identifiers_with_digits_are_kept():
+    assert normalize('SELECT col1 FROM ventas_2026_10') == 'SELECT col1 FROM ventas_2026_10'
+
+
+def test_redact_keeps_only_types():
+    assert redact(('Ana', 3, Decimal('1.5'), None)) == ['str', 'int', 'Decimal', 'NoneType']
+    assert redact({'password': 'secreto'}) == {'password': 'str'}
+    assert redact(None) is None
+
+
+def test_only_reads_outside_usuarios_are_explained():
+    assert can_explain(normalize('SELECT * FROM ventas WHERE id = 1'))
+    assert not can_explain(normalize('SELECT * FROM ventas FOR UPDATE'))
+    assert not can_explain(normalize("UPDATE ventas SET total = 1"))
+    assert not can_explain(normalize("WITH x AS (DELETE FROM ventas RETURNING *) SELECT * FROM x"))
+    assert not can_explain(normalize("SELECT password FROM usuarios WHERE usuario = 'admin'"))
+
+
+def test_server_parameters():
+    assert server_parameters('SELECT %s, %s', ('a', 1)) == ('SELECT $1, $2', ['a', 1])
+    sql, values = server_parameters("SELECT %(x)s, %(y)s, %(x)s WHERE a LIKE 'b%%'", {'x': 1, 'y': 2})
+    assert (sql, values) == ("SELECT $1, $2, $1 WHERE a LIKE 'b%'", [1, 2])
+    assert server_parameters('SELECT 1', None) == ('SELECT 1', [])
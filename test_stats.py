@@ -0,0 +1,28 @@
+from datetime import date
+
+from stats import closed_months, next_month
+
+
+def test_next_month():
+    assert next_month(date(2026, 1, 31)) == date(2026, 2, 1)
+    assert next_month(date(2026, 12, 5)) == date(2027, 1, 1)
+
+
+def test_whole_months_inside_the_range():
+    assert closed_months(date(2026, 1, 1), date(2026, 3, 31), date(2026, 10, 18)) == \
+        (date(2026, 1, 1), date(2026, 4, 1))
+
+
+def test_partial_months_at_both_ends_are_left_out():
+    assert closed_months(date(2026, 1, 15), date(2026, 4, 10), date(2026, 10, 18)) == \
+        (date(2026, 2, 1), date(2026, 4, 1))
+
+
+def test_current_month_is_not_closed():
+    assert closed_months(date(2026, 9, 1), date(2026, 10, 31), date(2026, 10, 18)) == \
+        (date(2026, 9, 1), date(2026, 10, 1))
+
+
+def test_no_closed_month_is_an_empty_range():
+    first, end = closed_months(date(2026, 10, 3), date(2026, 10, 20), date(2026, 10, 18))
+    assert first == end
@@ -0,0 +1,68 @@
+"""Background job worker (see jobs.py).
+
+    python worker.py run                 # until SIGTERM, e.g. a Render worker
+    python worker.py run-once            # due jobs now, then exit (cron)
+    python worker.py enqueue estado-miembros --payload '{}'
+    python worker.py status
+
+Run the web service with JOBS_IN_PROCESS=0 when this runs separately.
+Its job metrics are served at http://<host>:WORKER_METRICS_PORT/ when that
+is set, since a separate service does not share the web's METRICS_DIR.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+
+import app  # registers the job handlers and schedules
+import jobs
+import metrics
+import serialization
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cola de trabajos de ActiveGym')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='Procesar trabajos hasta recibir SIGTERM')
+    run.add_argument('--metrics-port', type=int, default=os.environ.get('WORKER_METRICS_PORT'),
+                     help='puerto donde servir las métricas Prometheus de los trabajos')
+    commands.add_parser('run-once', help='Procesar los trabajos pendientes y salir')
+    add = commands.add_parser('enqueue', help='Encolar un trabajo')
+    add.add_argument('tipo', choices=sorted(jobs.HANDLERS))
+    add.add_argument('--payload', type=jobs.parse_payload, default={}, help='objeto JSON')
+    add.add_argument('--clave', help='clave de deduplicación')
+    commands.add_parser('status', help='Mostrar el estado de la cola')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        worker = jobs.Worker()
+        # Finish the current job, then exit
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+            print(f"✅ Métricas en el puerto {args.metrics_port}")
+        print(f"✅ Worker de trabajos iniciado ({len(jobs.HANDLERS)} tipos, {len(jobs.SCHEDULES)} programados)")
+        worker.run_forever()
+    elif args.command == 'run-once':
+        worker = jobs.Worker()
+        with worker.connection():
+            cursor = worker.cursor()
+            jobs.register_schedules(cursor)
+            jobs.enqueue_due(cursor)
+        print(f"✅ {worker.run_pending()} trabajos procesados")
+        worker.close()
+    elif args.command == 'enqueue':
+        job_id = jobs.enqueue(args.tipo, args.payload, clave=args.clave)
+        if job_id is None:
+            print(f"Ya hay un trabajo pendiente con la clave {args.clave}")
+        else:
+            print(f"✅ Trabajo {job_id} encolado")
+    else:
+        print(json.dumps(jobs.queue_stats(), default=serialization.to_json, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())